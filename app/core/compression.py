@@ -0,0 +1,164 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import COMPRESSION_MINIMUM_SIZE, GZIP_COMPRESSLEVEL, BROTLI_QUALITY
+
+try:  # brotli — опционально: без него отдаём только gzip
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Уже сжатые форматы (аватарки, превью) повторно не жмём
+EXCLUDED_CONTENT_TYPE_PREFIXES = (
+    "image/",
+    "audio/",
+    "video/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "text/event-stream",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Выбирает кодировку по заголовку Accept-Encoding: br (если есть brotli), иначе gzip.
+    Токены с q=0 считаются запрещёнными.
+    """
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(token.strip())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if final:
+            return self._obj.compress(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if final:
+            return self._obj.process(data) + self._obj.finish()
+        return self._obj.process(data) + self._obj.flush()
+
+
+class CompressionMiddleware:
+    """
+    gzip/brotli-сжатие ответов больше minimum_size байт.
+    Маленькие ответы, уже закодированные и бинарные (картинки) пропускаются как есть.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        gzip_level: int = GZIP_COMPRESSLEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def make_compressor(self, encoding: str):
+        if encoding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.initial_message: Message = {}
+        self.passthrough = False
+        self.started = False
+        self.compressor = None
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Заголовки отправим, когда станет ясно, сжимаем ли тело
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "").lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 206, 304)
+                or content_type.startswith(EXCLUDED_CONTENT_TYPE_PREFIXES)
+            )
+            if self.passthrough:
+                await self.downstream(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            if not self.passthrough and not self.started and self.initial_message:
+                await self.downstream(self.initial_message)
+                self.started = True
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body and len(body) < self.middleware.minimum_size:
+                await self.downstream(self.initial_message)
+                await self.downstream(message)
+                return
+
+            self.compressor = self.middleware.make_compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                del headers["Content-Length"]
+            message["body"] = self.compressor.compress(body, final=not more_body)
+            if not more_body:
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.downstream(self.initial_message)
+            await self.downstream(message)
+            return
+
+        if self.compressor is not None:
+            message["body"] = self.compressor.compress(body, final=not more_body)
+        await self.downstream(message)
@@ -1,10 +1,55 @@
+import os
 import secrets
 from datetime import timedelta
+from pathlib import Path
 
 # В реальном проекте SECRET_KEY храним в .env
 SECRET_KEY = secrets.token_hex(32)  # временно сгенерируем
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60  # 1 час
+# Потоки для хеширования паролей (регистрация, вход, массовое заведение учеников)
+PASSWORD_HASH_WORKERS = int(os.getenv("QUIZOGRAM_PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Токен для POST /api/v1/users/bulk (заголовок X-Provisioning-Token); пусто — эндпоинт выключен
+PROVISIONING_TOKEN = os.getenv("QUIZOGRAM_PROVISIONING_TOKEN", "")
+
+# Сжатие ответов: тела меньше порога уходят как есть
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("QUIZOGRAM_COMPRESSION_MINIMUM_SIZE", "1024"))  # байт
+GZIP_COMPRESSLEVEL = int(os.getenv("QUIZOGRAM_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("QUIZOGRAM_BROTLI_QUALITY", "5"))
+# create_all + докатка индексов/колонок на старте. На автоскейлящихся воркерах
+# лучше выключить и запускать один раз при деплое: python -m app.database
+SCHEMA_SYNC_ON_STARTUP = os.getenv("QUIZOGRAM_SYNC_SCHEMA", "1") == "1"
+# Фоновые задачи (пересчёт рекомендаций и т.п.) в процессе API.
+# При нескольких воркерах включать только на одном.
+BACKGROUND_JOBS_ENABLED = os.getenv("QUIZOGRAM_BACKGROUND_JOBS", "1") == "1"
+RECOMMENDATIONS_REFRESH_SECONDS = int(os.getenv("QUIZOGRAM_RECOMMENDATIONS_REFRESH_SECONDS", "600"))
+FOLLOW_GRAPH_REBUILD_SECONDS = int(os.getenv("QUIZOGRAM_FOLLOW_GRAPH_REBUILD_SECONDS", "900"))
+# Воркер без фоновых задач сам пересобирает граф подписок, если он старше этого
+FOLLOW_GRAPH_MAX_AGE_SECONDS = int(os.getenv("QUIZOGRAM_FOLLOW_GRAPH_MAX_AGE_SECONDS", "900"))
+TRENDING_REFRESH_SECONDS = int(os.getenv("QUIZOGRAM_TRENDING_REFRESH_SECONDS", "300"))
+NOTIFICATIONS_FANOUT_SECONDS = int(os.getenv("QUIZOGRAM_NOTIFICATIONS_FANOUT_SECONDS", "10"))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("QUIZOGRAM_TRENDING_HALF_LIFE_HOURS", "24"))
+# Загрузки картинок (обложки квизов, аватарки) и их уменьшенные копии.
+# Файлы называются по sha256 содержимого и отдаются с вечным кэшем.
+MEDIA_DIR = Path(os.getenv("QUIZOGRAM_MEDIA_DIR", "./media"))
+MEDIA_MAX_UPLOAD_BYTES = int(os.getenv("QUIZOGRAM_MEDIA_MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+MEDIA_UPLOAD_CHUNK_BYTES = 64 * 1024
+MEDIA_WORKERS = int(os.getenv("QUIZOGRAM_MEDIA_WORKERS", "2"))  # процессы для ресайза
+MEDIA_RESCAN_SECONDS = int(os.getenv("QUIZOGRAM_MEDIA_RESCAN_SECONDS", "60"))
+# Импорт банков вопросов (CSV / JSON Lines): файл ждёт фоновую задачу в IMPORT_DIR
+IMPORT_DIR = Path(os.getenv("QUIZOGRAM_IMPORT_DIR", "./imports"))
+IMPORT_MAX_UPLOAD_BYTES = int(os.getenv("QUIZOGRAM_IMPORT_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+IMPORT_MAX_QUESTIONS = int(os.getenv("QUIZOGRAM_IMPORT_MAX_QUESTIONS", "20000"))
+IMPORT_CHUNK_ROWS = int(os.getenv("QUIZOGRAM_IMPORT_CHUNK_ROWS", "500"))
+IMPORT_RESCAN_SECONDS = int(os.getenv("QUIZOGRAM_IMPORT_RESCAN_SECONDS", "60"))
+# running-импорт без продления аренды дольше этого считается брошенным (процесс умер)
+IMPORT_LEASE_SECONDS = int(os.getenv("QUIZOGRAM_IMPORT_LEASE_SECONDS", "300"))
+# Попытки с таймингом: незавершённая сессия живёт столько, потом выселяется
+ATTEMPT_SESSION_TTL_SECONDS = int(os.getenv("QUIZOGRAM_ATTEMPT_SESSION_TTL_SECONDS", "3600"))
+ATTEMPT_SESSION_SWEEP_SECONDS = int(os.getenv("QUIZOGRAM_ATTEMPT_SESSION_SWEEP_SECONDS", "300"))
+# Удалённые квизы: надгробие сразу, зависимые строки — фоном, пакетами
+QUIZ_CLEANUP_SECONDS = int(os.getenv("QUIZOGRAM_QUIZ_CLEANUP_SECONDS", "60"))
+QUIZ_CLEANUP_BATCH_SIZE = int(os.getenv("QUIZOGRAM_QUIZ_CLEANUP_BATCH_SIZE", "500"))
 
 def get_access_token_timedelta() -> timedelta:
     return timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -0,0 +1,65 @@
+import importlib
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import BaseRoute, Match, NoMatchFound, get_route_path
+from starlette.types import Receive, Scope, Send
+
+
+class DeferredRouter(BaseRoute):
+    """
+    Заглушка на месте роутера, модуль которого импортируется при первом
+    запросе под его префиксом (или заранее, фоном после старта — preload).
+
+    Подключение заменяет заглушку маршрутами роутера на той же позиции в
+    app.router.routes, так что порядок сопоставления не меняется. Замена идёт
+    в потоке event loop без await, поэтому другие запросы не видят
+    полуподключённый список; в пул уходит только сам импорт.
+    """
+
+    def __init__(self, app: FastAPI, module: str, prefix: str):
+        self.app = app
+        self.module = module
+        self.prefix = prefix
+
+    def matches(self, scope: Scope):
+        if scope["type"] == "http":
+            path = get_route_path(scope)
+            if path == self.prefix or path.startswith(self.prefix + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await run_in_threadpool(importlib.import_module, self.module)
+        self.include()
+        # маршрутизируем заново: запрос мог принадлежать и другому роутеру с тем же префиксом
+        await self.app.router(scope, receive, send)
+
+    def include(self) -> None:
+        routes = self.app.router.routes
+        if self not in routes:
+            return  # уже подключён параллельным запросом
+        router = importlib.import_module(self.module).router
+        at, end = routes.index(self), len(routes)
+        self.app.include_router(router)
+        routes[at:] = routes[end:] + routes[at + 1:end]
+
+
+def include_deferred(app: FastAPI, module: str, prefix: str) -> None:
+    app.router.routes.append(DeferredRouter(app, module, prefix))
+
+
+def include_all(app: FastAPI) -> None:
+    """Подключает все отложенные роутеры (нужно, например, для полной OpenAPI-схемы)."""
+    for route in list(app.router.routes):
+        if isinstance(route, DeferredRouter):
+            route.include()
+
+
+def preload(app: FastAPI) -> None:
+    """Импортирует модули отложенных роутеров (из фонового потока); подключение — при первом запросе."""
+    for module in [r.module for r in app.router.routes if isinstance(r, DeferredRouter)]:
+        importlib.import_module(module)
@@ -1,23 +1,80 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
-from passlib.context import CryptContext
-from jose import jwt
 
-from .config import SECRET_KEY, ALGORITHM, get_access_token_timedelta
+from .config import PASSWORD_HASH_WORKERS, SECRET_KEY, ALGORITHM, get_access_token_timedelta
+
+# passlib и jose (а с ним cryptography) импортируются при первом использовании:
+# на холодном старте воркера это заметная доля времени импорта приложения.
+
+
+@lru_cache(maxsize=1)
+def _pwd_context():
+    from passlib.context import CryptContext
+
+    # Без проблем с bcrypt
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+
+def _jwt():
+    from jose import jwt
+
+    return jwt
+
+
+def warm_up() -> None:
+    """Загружает хеширование и JWT заранее (фоном после старта)."""
+    _pwd_context()
+    _jwt()
 
-# Без проблем с bcrypt
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
+
+
+# pbkdf2 считается в hashlib без GIL, так что потоки дают реальный параллелизм.
+# Отдельный пул по числу ядер: всплеск регистраций встаёт в очередь здесь,
+# а не занимает общий threadpool, на котором крутятся все sync-эндпоинты.
+_hash_pool: Optional[ThreadPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+
+def hash_executor() -> ThreadPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+        return _hash_pool
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(hash_executor(), get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(
+        hash_executor(), verify_password, plain_password, hashed_password,
+    )
+
 
 def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
     if expires_delta is None:
         expires_delta = get_access_token_timedelta()
     expire = datetime.now(tz=timezone.utc) + expires_delta
     to_encode = {"sub": subject, "exp": expire}
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = _jwt().encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Payload токена или None, если подпись/срок не прошли проверку."""
+    from jose import JWTError
+
+    try:
+        return _jwt().decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
@@ -0,0 +1,27 @@
+import os
+
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+from starlette.types import Scope
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles с Cache-Control. Range-запросы и условные запросы
+    (If-None-Match / If-Modified-Since → 304) обрабатывает сам Starlette.
+    """
+
+    def __init__(self, *, cache_control: str, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_control = cache_control
+
+    def file_response(
+        self,
+        full_path: "os.PathLike[str] | str",
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["cache-control"] = self.cache_control
+        return response
@@ -1,8 +1,11 @@
+import os
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-# Используем SQLite (файл будет создан автоматически)
-DATABASE_URL = "sqlite:///./quizogram.db"
+# Используем SQLite (файл будет создан автоматически).
+# QUIZOGRAM_DATABASE_URL позволяет подменить базу (бенчмарки, отдельные окружения).
+DATABASE_URL = os.getenv("QUIZOGRAM_DATABASE_URL", "sqlite:///./quizogram.db")
 
 engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
@@ -10,3 +13,48 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+def sync_schema(bind=engine) -> None:
+    """
+    create_all + докатка того, чего create_all не умеет на уже существующей базе:
+    недостающие индексы и nullable-колонки (ALTER TABLE ... ADD COLUMN).
+    Полноценных миграций в проекте нет, этого хватает для аддитивных изменений.
+    """
+    from sqlalchemy import inspect
+
+    Base.metadata.create_all(bind=bind)
+
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=bind.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}')
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def main() -> None:
+    # под `python -m` этот файл исполняется как __main__; таблицы регистрируются в app.database.Base
+    from . import database, models  # noqa: F401
+
+    from .services import quiz_versions
+
+    database.sync_schema()
+    print(f"schema is up to date: {DATABASE_URL}")
+    db = database.SessionLocal()
+    try:
+        done = quiz_versions.backfill_missing(db)
+    finally:
+        db.close()
+    print(f"published versions for {done} legacy quizzes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,11 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from .database import SessionLocal
 from . import models
 from .schemas import TokenPayload
-from .core.config import SECRET_KEY, ALGORITHM
+from .core.security import decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
@@ -29,12 +28,11 @@ def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        data = TokenPayload.model_validate(payload)
-        username = data.sub
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None:
         raise credentials_exception
+    data = TokenPayload.model_validate(payload)
+    username = data.sub
 
     user = get_user_by_username(db, username)
     if not user:
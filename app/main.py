@@ -1,40 +1,207 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+"""
+Точка входа: фабрика приложения.
+
+    uvicorn app.main:app                      # как раньше
+    uvicorn --factory app.main:create_app     # то же, без модульного синглтона
+
+Импорт этого модуля ничего не делает с базой и не тянет роутеры: всё собирается
+в create_app(), а схема БД, каталог медиа и фоновые задачи поднимаются в lifespan.
+Тяжёлые роутеры (прохождения, импорт, медиа, тренировка, рекомендации — numpy,
+python-multipart, статистика) create_app() не импортирует: на их месте стоят
+заглушки DeferredRouter, модули импортируются фоном после старта или первым
+запросом под их префиксом.
+Проверку схемы (и публикацию версий старых квизов) на старте можно отключить
+(QUIZOGRAM_SYNC_SCHEMA=0) и выполнять один раз при деплое:
+    python -m app.database
+"""
+import logging
+import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 
-from . import models
-from .database import engine
-from .routers import auth, users, quizzes, attempts, social, profile
-from .routers import follow as follow_router
+from .core.config import BACKGROUND_JOBS_ENABLED, MEDIA_DIR, SCHEMA_SYNC_ON_STARTUP
 
 BASE_DIR = Path(__file__).resolve().parent  # app/
 STATIC_DIR = BASE_DIR / "static"
 WEB_DIR = BASE_DIR / "web"
 
-app = FastAPI(
-    title="Quizogram API",
-    version="0.6.0",
-    description="Соцсеть с квизами вместо фото и видео — с квизами!"
-)
+logger = logging.getLogger("quizogram")
+
+
+def _register_jobs() -> None:
+    from .core.config import (
+        ATTEMPT_SESSION_SWEEP_SECONDS,
+        FOLLOW_GRAPH_REBUILD_SECONDS,
+        IMPORT_RESCAN_SECONDS,
+        MEDIA_RESCAN_SECONDS,
+        NOTIFICATIONS_FANOUT_SECONDS,
+        QUIZ_CLEANUP_SECONDS,
+        RECOMMENDATIONS_REFRESH_SECONDS,
+        TRENDING_REFRESH_SECONDS,
+    )
+    from .services import (
+        attempt_sessions, jobs, media, notifications, question_import, quiz_cleanup, recommendations,
+        social_graph, trending,
+    )
+
+    jobs.runner.register("recommendations", RECOMMENDATIONS_REFRESH_SECONDS, recommendations.refresh)
+    jobs.runner.register("follow_graph", FOLLOW_GRAPH_REBUILD_SECONDS, social_graph.rebuild)
+    jobs.runner.register("trending", TRENDING_REFRESH_SECONDS, trending.refresh)
+    jobs.runner.register("media", MEDIA_RESCAN_SECONDS, media.process_pending)
+    jobs.runner.register("quiz_cleanup", QUIZ_CLEANUP_SECONDS, quiz_cleanup.purge_deleted)
+    jobs.runner.register("notifications", NOTIFICATIONS_FANOUT_SECONDS, notifications.fan_out)
+    jobs.runner.register("attempt_sessions", ATTEMPT_SESSION_SWEEP_SECONDS, attempt_sessions.purge_expired)
+    jobs.runner.register("question_import", IMPORT_RESCAN_SECONDS, question_import.process_pending)
+
+
+def _warm_imports(app: FastAPI) -> None:
+    # криптобэкенды и отложенные роутеры грузятся лениво; прогреваем их фоном,
+    # пока воркер уже принимает запросы
+    from .core import deferred, security
+
+    security.warm_up()
+    deferred.preload(app)
+
+
+def _publish_missing_versions() -> None:
+    from .database import SessionLocal
+    from .services import quiz_versions
+
+    db = SessionLocal()
+    try:
+        done = quiz_versions.backfill_missing(db)
+    finally:
+        db.close()
+    if done:
+        logger.info("published versions for %d legacy quizzes", done)
+
+
+def _load_follow_graph() -> None:
+    from .database import SessionLocal
+    from .services import social_graph
+
+    db = SessionLocal()
+    try:
+        social_graph.graph.ensure_loaded(db)
+    except Exception:
+        # не критично: загрузится первым запросом, которому нужен граф
+        logger.exception("follow graph preload failed")
+    finally:
+        db.close()
+
+
+def create_app(sync_db: Optional[bool] = None, start_jobs: Optional[bool] = None) -> FastAPI:
+    from fastapi.staticfiles import StaticFiles
+
+    from .core.compression import CompressionMiddleware
+    from .core.deferred import include_all, include_deferred
+    from .core.static import CachedStaticFiles
+    from .routers import auth, follow, notifications, profile, quizzes, social, users
+
+    sync_db = SCHEMA_SYNC_ON_STARTUP if sync_db is None else sync_db
+    start_jobs = BACKGROUND_JOBS_ENABLED if start_jobs is None else start_jobs
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        from .services import jobs
+
+        if sync_db:
+            from .database import engine, sync_schema
+
+            await run_in_threadpool(sync_schema, engine)
+            # квизы без версии публикуются здесь, а не первым GET (там гонка за номер версии)
+            await run_in_threadpool(_publish_missing_versions)
+        MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+        warm = threading.Thread(target=_warm_imports, args=(app,), name="warm-imports", daemon=True)
+        warm.start()
+        if start_jobs:
+            _register_jobs()
+            jobs.runner.start()
+        else:
+            # без фоновых задач граф подписок грузится здесь, а не первым запросом
+            threading.Thread(target=_load_follow_graph, name="follow-graph-load", daemon=True).start()
+        yield
+        # импорт, прерванный выходом интерпретатора, роняет процесс (abort в numpy)
+        warm.join()
+        jobs.runner.stop()
+        # сервисы отложенных роутеров на старте не импортируем; к остановке их уже загрузил прогрев
+        from .services import media, question_import
+
+        media.pipeline.shutdown()
+        question_import.runner.shutdown()
+
+    app = FastAPI(
+        title="Quizogram API",
+        version="0.6.0",
+        description="Соцсеть с квизами вместо фото и видео — с квизами!",
+        lifespan=lifespan,
+    )
+
+    # gzip/brotli для больших ответов (QuizOut, лента); порог — COMPRESSION_MINIMUM_SIZE
+    app.add_middleware(CompressionMiddleware)
+
+    # встроенные картинки могут поменяться с релизом — кэш на час;
+    # /media — имена по хешу содержимого, кэш вечный
+    app.mount(
+        "/static",
+        CachedStaticFiles(directory=str(STATIC_DIR), html=False, cache_control="public, max-age=3600"),
+        name="static",
+    )
+    app.mount(
+        "/media",
+        CachedStaticFiles(
+            directory=str(MEDIA_DIR), check_dir=False, cache_control="public, max-age=31536000, immutable",
+        ),
+        name="media",
+    )
+    app.mount("/web", StaticFiles(directory=str(WEB_DIR), html=True), name="web")
+
+    app.include_router(auth.router)
+    app.include_router(users.router)
+    app.include_router(quizzes.router)
+    include_deferred(app, "app.routers.attempts", "/api/v1/attempts")
+    app.include_router(social.router)
+    app.include_router(profile.router)
+    app.include_router(follow.router)
+    include_deferred(app, "app.routers.recommendations", "/api/v1/recommendations")
+    include_deferred(app, "app.routers.media", "/api/v1/media")
+    include_deferred(app, "app.routers.practice", "/api/v1/practice")
+    app.include_router(notifications.router)
+    # префикс общий с quizzes: заглушка стоит после его маршрутов и ловит только остальное
+    include_deferred(app, "app.routers.imports", "/api/v1/quizzes")
+
+    def openapi():
+        # схема строится один раз и должна видеть все маршруты
+        include_all(app)
+        return FastAPI.openapi(app)
+
+    app.openapi = openapi
+
+    @app.get("/health", tags=["system"])
+    def health():
+        return {"status": "ok"}
 
+    @app.get("/", tags=["system"])
+    def root():
+        return {"message": "Welcome to Quizogram API"}
 
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR), html=False), name="static")
-app.mount("/web", StaticFiles(directory=str(WEB_DIR), html=True), name="web")
+    return app
 
-models.Base.metadata.create_all(bind=engine)
 
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(quizzes.router)
-app.include_router(attempts.router)
-app.include_router(social.router)
-app.include_router(profile.router)
-app.include_router(follow_router.router)
+_app: Optional[FastAPI] = None
+_app_lock = threading.Lock()
 
-@app.get("/health", tags=["system"])
-def health():
-    return {"status": "ok"}
 
-@app.get("/", tags=["system"])
-def root():
-    return {"message": "Welcome to Quizogram API"}
\ No newline at end of file
+def __getattr__(name: str):
+    # `app` собирается при первом обращении (uvicorn app.main:app, тесты), а не при импорте модуля
+    global _app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+    return _app
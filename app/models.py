@@ -1,6 +1,9 @@
 
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, func, UniqueConstraint
+from sqlalchemy import (
+    Column, Integer, String, ForeignKey, Text, DateTime, Float, LargeBinary, func, text, Index,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -18,24 +21,113 @@ class Quiz(Base):
     title = Column(String(200), nullable=False, index=True)
     description = Column(Text, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # опубликованная версия (снимок), которую отдаёт get_quiz и по которой считаются попытки
+    current_version_id = Column(Integer, ForeignKey("quiz_versions.id", use_alter=True), nullable=True)
+    # последний выданный номер версии; UPDATE ... RETURNING по нему сериализует публикации квиза
+    version_seq = Column(Integer, nullable=True)
+    # обложка: встроенная картинка из app/static/thumbs или загруженный файл
+    thumbnail_key = Column(String(100), nullable=True)
+    thumbnail_media_id = Column(Integer, ForeignKey("media_assets.id"), nullable=True)
+    # мягкое удаление: строка-надгробие остаётся, зависимые данные чистит services/quiz_cleanup.py
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
 
     owner = relationship("User", backref="quizzes")
-    questions = relationship("Question", cascade="all, delete-orphan", back_populates="quiz")
+    thumbnail = relationship("MediaAsset", lazy="joined")
+    # только актуальные вопросы; выведенные из оборота остаются в базе ради старых ответов
+    questions = relationship(
+        "Question",
+        cascade="all, delete-orphan",
+        back_populates="quiz",
+        primaryjoin="and_(Quiz.id == Question.quiz_id, Question.retired_at.is_(None))",
+        order_by="Question.id",
+    )
+    tags = relationship("Tag", secondary="quiz_tags", lazy="selectin", order_by="Tag.slug")
+
+    __table_args__ = (
+        # частичный индекс по живым квизам: лента и профиль (owner_id IN ... ORDER BY id DESC)
+        # и общий список не спотыкаются о надгробия
+        Index("ix_quizzes_live_owner_id", "owner_id", "id", sqlite_where=text("deleted_at IS NULL")),
+        # и наоборот — только надгробия, для фоновой очистки
+        Index("ix_quizzes_deleted_at", "deleted_at", sqlite_where=text("deleted_at IS NOT NULL")),
+    )
+
+class Tag(Base):
+    """Тема квиза. quiz_count — число живых квизов с тегом, ведётся инкрементально (services/tags.py)."""
+    __tablename__ = "tags"
+    id = Column(Integer, primary_key=True)
+    slug = Column(String(50), unique=True, nullable=False)  # нормализованное имя, по нему ищут
+    name = Column(String(50), nullable=False)               # как написал первый автор
+    quiz_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+class QuizTag(Base):
+    """Связь квиз—тег. Строки удаляются вместе с мягким удалением квиза."""
+    __tablename__ = "quiz_tags"
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
+
+    __table_args__ = (
+        # покрывающий: квизы тега от новых к старым — диапазон по индексу без обращения к таблице
+        Index("ix_quiz_tags_tag_quiz", "tag_id", text("quiz_id DESC")),
+    )
+
+class QuizVersion(Base):
+    """
+    Неизменяемый снимок опубликованной версии квиза: весь QuizOut одним
+    JSON-блобом (orjson). Читается и оценивается без join'ов, id — готовый ключ кэша.
+    """
+    __tablename__ = "quiz_versions"
+    id = Column(Integer, primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False, index=True)
+    version = Column(Integer, nullable=False)  # 1, 2, ... в пределах квиза
+    snapshot = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (UniqueConstraint("quiz_id", "version", name="uq_quiz_version"),)
 
 class Question(Base):
     __tablename__ = "questions"
     id = Column(Integer, primary_key=True)
-    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False, index=True)
     text = Column(Text, nullable=False)
     correct_option_index = Column(Integer, nullable=False)  # индекс правильного варианта (0..n-1)
+    # вопросы не редактируются на месте: при правке набор заменяется новыми строками,
+    # старые помечаются retired_at и навсегда сохраняют смысл для attempt_answers
+    retired_at = Column(DateTime(timezone=True), nullable=True)
+    # пришёл из импорта банка вопросов; пока импорт не завершён, вопрос скрыт через retired_at
+    import_id = Column(Integer, ForeignKey("question_imports.id"), nullable=True, index=True)
 
     quiz = relationship("Quiz", back_populates="questions")
-    options = relationship("AnswerOption", cascade="all, delete-orphan", back_populates="question")
+    options = relationship(
+        "AnswerOption", cascade="all, delete-orphan", back_populates="question", order_by="AnswerOption.id",
+    )
+
+class QuestionImport(Base):
+    """Загрузка банка вопросов в квиз (app/services/question_import.py); строка — её прогресс и итог."""
+    __tablename__ = "question_imports"
+    id = Column(Integer, primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    format = Column(String(8), nullable=False)      # "csv" | "jsonl"
+    mode = Column(String(8), nullable=False)        # "append" | "replace"
+    filename = Column(String(255), nullable=True)   # как назывался у автора
+    path = Column(String(255), nullable=False)      # файл в IMPORT_DIR, удаляется по завершении
+    status = Column(String(16), nullable=False, default="pending", index=True)  # pending | running | done | failed
+    claimed_at = Column(Integer, nullable=True)     # unix-секунды: аренда running, продлевается с каждым пакетом
+    bytes_total = Column(Integer, nullable=False, default=0)
+    bytes_done = Column(Integer, nullable=False, default=0)
+    rows_done = Column(Integer, nullable=False, default=0)     # прочитано строк с вопросами
+    imported = Column(Integer, nullable=False, default=0)      # записано вопросов
+    error_count = Column(Integer, nullable=False, default=0)
+    errors = Column(Text, nullable=True)            # JSON: первые ошибки [{"line", "error"}]
+    version_id = Column(Integer, ForeignKey("quiz_versions.id"), nullable=True)  # опубликованная импортом
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
 
 class AnswerOption(Base):
     __tablename__ = "answer_options"
     id = Column(Integer, primary_key=True)
-    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False, index=True)
     text = Column(Text, nullable=False)
 
     question = relationship("Question", back_populates="options")
@@ -49,6 +141,8 @@ class Attempt(Base):
     score = Column(Integer, nullable=False)            # сколько правильных
     total = Column(Integer, nullable=False)            # всего вопросов
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    quiz_version_id = Column(Integer, ForeignKey("quiz_versions.id"), nullable=True)  # по какой версии считали
+    duration_ms = Column(Integer, nullable=True)  # сумма задержек ответов; только у попыток через сессию
 
     user = relationship("User")
     quiz = relationship("Quiz")
@@ -61,16 +155,48 @@ class AttemptAnswer(Base):
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
     selected_option_index = Column(Integer, nullable=False)
     is_correct = Column(Integer, nullable=False)  # 1 или 0
+    latency_ms = Column(Integer, nullable=True)   # от показа (предыдущего ответа) до ответа
 
     attempt = relationship("Attempt", back_populates="answers")
 
+class AttemptSession(Base):
+    """
+    Попытка в процессе (POST /attempts/{quiz_id}/start). Ответы — упакованный
+    массив (app/services/attempt_sessions.py), строка удаляется при завершении
+    или по истечении expires_at.
+    """
+    __tablename__ = "attempt_sessions"
+    id = Column(String(32), primary_key=True)  # случайный токен
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    quiz_version_id = Column(Integer, ForeignKey("quiz_versions.id"), nullable=False)
+    started_ms = Column(Integer, nullable=False)    # unix-миллисекунды
+    last_ms = Column(Integer, nullable=False)       # последнее событие; он же версия строки
+    expires_at = Column(Integer, nullable=False, index=True)  # unix-секунды
+    answers = Column(LargeBinary, nullable=False, default=b"")
+
+class AttemptIdempotencyKey(Base):
+    """Ключ идемпотентности пакетной отправки попыток: повтор с тем же ключом не создаёт дубль."""
+    __tablename__ = "attempt_idempotency_keys"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(100), nullable=False)
+    attempt_id = Column(Integer, ForeignKey("attempts.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_attempt_idempotency_user_key"),)
+
 class Follow(Base):
     __tablename__ = "follows"
     id = Column(Integer, primary_key=True)
     follower_id = Column(Integer, ForeignKey("users.id"), nullable=False)   # кто подписывается
     following_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # на кого
 
-    __table_args__ = (UniqueConstraint("follower_id", "following_id", name="uq_follow_pair"),)
+    __table_args__ = (
+        UniqueConstraint("follower_id", "following_id", name="uq_follow_pair"),
+        # подписчики автора по порядку id — для рассылки уведомлений пакетами
+        Index("ix_follows_following_follower", "following_id", "follower_id"),
+    )
 
     follower = relationship("User", foreign_keys=[follower_id])
     following = relationship("User", foreign_keys=[following_id])
@@ -97,8 +223,160 @@ class Profile(Base):
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
     bio = Column(Text, nullable=True)
     avatar_key = Column(String(100), nullable=False, default="8bit_default.png")
+    avatar_media_id = Column(Integer, ForeignKey("media_assets.id"), nullable=True)  # загруженная аватарка
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", backref="profile")
+    avatar_media = relationship("MediaAsset")
+
+
+# ----- МЕДИА -----
+
+class MediaAsset(Base):
+    """
+    Загруженная картинка. Оригинал и все варианты лежат в MEDIA_DIR под
+    именами sha256(содержимое).ext — одинаковые файлы хранятся один раз,
+    а URL никогда не меняет содержимое.
+    """
+    __tablename__ = "media_assets"
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String(16), nullable=False)          # "thumb" | "avatar"
+    sha256 = Column(String(64), nullable=False)
+    filename = Column(String(80), nullable=False)      # оригинал
+    content_type = Column(String(32), nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    status = Column(String(16), nullable=False, default="pending", index=True)  # pending | ready | failed
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    variants = relationship(
+        "MediaVariant", cascade="all, delete-orphan", lazy="selectin",
+        order_by="MediaVariant.size",
+    )
+
+    __table_args__ = (UniqueConstraint("owner_id", "kind", "sha256", name="uq_media_owner_kind_sha"),)
+
+class MediaVariant(Base):
+    __tablename__ = "media_variants"
+    asset_id = Column(Integer, ForeignKey("media_assets.id"), primary_key=True)
+    size = Column(Integer, primary_key=True)           # сторона квадрата, px
+    format = Column(String(8), primary_key=True)       # "webp" | "png"
+    filename = Column(String(80), nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+
+
+# ----- АГРЕГАТЫ СТАТИСТИКИ -----
+# Обновляются инкрементально в attempt_quiz, пересобираются app/services/quiz_stats.py.
+
+class QuizStat(Base):
+    __tablename__ = "quiz_stats"
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    attempts_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)   # для среднего балла
+
+class QuestionStat(Base):
+    __tablename__ = "question_stats"
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False, index=True)
+    answered_count = Column(Integer, nullable=False, default=0)
+    correct_count = Column(Integer, nullable=False, default=0)
+
+class QuestionOptionStat(Base):
+    __tablename__ = "question_option_stats"
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    option_index = Column(Integer, primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False, index=True)
+    picks = Column(Integer, nullable=False, default=0)
+
+
+# ----- ПОВТОРЕНИЕ -----
+
+class ReviewState(Base):
+    """
+    Очередь повторения (SM-2) одного пользователя по одному квизу.
+    cards — упакованный массив карточек (см. app/services/review_queue.py),
+    next_due — ближайший срок среди них, unix-секунды: выборка «что повторить»
+    идёт диапазоном по индексу (user_id, next_due).
+    """
+    __tablename__ = "review_states"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True, index=True)
+    cards = Column(LargeBinary, nullable=False)
+    next_due = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (Index("ix_review_states_user_due", "user_id", "next_due"),)
+
+
+# ----- УВЕДОМЛЕНИЯ -----
+# Роутеры пишут события в той же транзакции, что и действие; фоновая задача
+# (app/services/notifications.py) раскладывает их по получателям.
+
+class NotificationEvent(Base):
+    __tablename__ = "notification_events"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # quiz_published | quiz_liked | followed
+    actor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # адресат; у quiz_published — подписчики автора
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class Notification(Base):
+    """Только добавляется. Повторные события одного пакета сгруппированы: actor_count."""
+    __tablename__ = "notifications"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(20), nullable=False)
+    actor_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # последний из группы
+    actor_count = Column(Integer, nullable=False, default=1)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("ix_notifications_user_created", "user_id", "created_at"),)
+
+class NotificationCounter(Base):
+    """Счётчик непрочитанного: увеличивается рассылкой, обнуляется «прочитать всё»."""
+    __tablename__ = "notification_counters"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
+    last_read_id = Column(Integer, nullable=False, default=0)  # всё с id <= прочитано
+
+
+# ----- РЕКОМЕНДАЦИИ -----
+
+class QuizNeighbor(Base):
+    """Top-K похожих квизов (item-item косинус по лайкам и попыткам), считается офлайн."""
+    __tablename__ = "quiz_neighbors"
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True, index=True)
+    score = Column(Float, nullable=False)
+
+
+# ----- TRENDING -----
+
+class QuizTrending(Base):
+    """Экспоненциально затухающий счёт квиза; затухание применяется на каждом пересчёте."""
+    __tablename__ = "quiz_trending"
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    score = Column(Float, nullable=False, index=True)
+
+class TrendingTop(Base):
+    """Готовый top-K для выдачи, перезаписывается пересчётом целиком."""
+    __tablename__ = "trending_top"
+    rank = Column(Integer, primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    score = Column(Float, nullable=False)
+
+
+# ----- ФОНОВЫЕ ЗАДАЧИ -----
+
+class JobCursor(Base):
+    """Водяные знаки фоновых задач: до какого id уже обработана таблица."""
+    __tablename__ = "job_cursors"
+    job = Column(String(50), primary_key=True)
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
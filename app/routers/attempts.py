@@ -1,14 +1,375 @@
+from datetime import datetime, timezone
+
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional
 
 from .. import models, schemas
 from ..deps import get_db, get_current_user
-from ..schemas import AttemptCreate, AttemptOut, AttemptAnswerOut, LeaderboardRow
+from ..schemas import (
+    AttemptCreate, AttemptOut, AttemptAnswerIn, AttemptAnswerOut, AttemptSessionOut, LeaderboardRow,
+    BatchAttemptCreate, BatchAttemptOut, BatchAttemptResult, SessionAnswerOut,
+)
+from ..services import attempt_sessions, quiz_stats, quiz_versions, review_queue
 
 router = APIRouter(prefix="/api/v1/attempts", tags=["attempts"])
 
+
+def _load_attempts_out(db: Session, attempt_ids: Iterable[int]) -> Dict[int, AttemptOut]:
+    """Попытки с ответами двумя запросами (по PK и по индексу attempt_id)."""
+    ids = list(attempt_ids)
+    if not ids:
+        return {}
+    answers: Dict[int, List[AttemptAnswerOut]] = {i: [] for i in ids}
+    for ra in (
+        db.query(models.AttemptAnswer)
+          .filter(models.AttemptAnswer.attempt_id.in_(ids))
+          .order_by(models.AttemptAnswer.id)
+    ):
+        answers[ra.attempt_id].append(AttemptAnswerOut(
+            question_id=ra.question_id,
+            selected_option_index=ra.selected_option_index,
+            is_correct=bool(ra.is_correct),
+            latency_ms=ra.latency_ms,
+        ))
+    return {
+        at.id: AttemptOut(
+            id=at.id,
+            quiz_id=at.quiz_id,
+            user_id=at.user_id,
+            score=at.score,
+            total=at.total,
+            created_at=str(at.created_at) if at.created_at else None,
+            quiz_version_id=at.quiz_version_id,
+            duration_ms=at.duration_ms,
+            answers=answers[at.id],
+        )
+        for at in db.query(models.Attempt).filter(models.Attempt.id.in_(ids))
+    }
+
+
+def _process_batch(db: Session, payload: BatchAttemptCreate, user_id: int) -> BatchAttemptOut:
+    items = payload.items
+    results: List[Optional[BatchAttemptResult]] = [None] * len(items)
+
+    def fail(i: int, detail: str):
+        results[i] = BatchAttemptResult(
+            index=i, idempotency_key=items[i].idempotency_key, status="error", error=detail,
+        )
+
+    # 1) Идемпотентность: уже записанные ключи отдаём как duplicate
+    keys = {it.idempotency_key for it in items if it.idempotency_key}
+    existing: Dict[str, int] = {}
+    if keys:
+        existing = dict(
+            db.query(models.AttemptIdempotencyKey.key, models.AttemptIdempotencyKey.attempt_id)
+              .filter(models.AttemptIdempotencyKey.user_id == user_id,
+                      models.AttemptIdempotencyKey.key.in_(keys))
+              .all()
+        )
+    stored = _load_attempts_out(db, set(existing.values()))
+    seen_keys = set()
+    for i, it in enumerate(items):
+        key = it.idempotency_key
+        if key is None:
+            continue
+        if key in existing:
+            results[i] = BatchAttemptResult(index=i, idempotency_key=key, status="duplicate",
+                                            attempt=stored.get(existing[key]))
+        elif key in seen_keys:
+            fail(i, f"Duplicate idempotency_key {key!r} in batch")
+        seen_keys.add(key)
+
+    # 2) Ключи ответов: версии квизов одним запросом, снимки — из кэша или одним запросом по PK
+    pending = [i for i in range(len(items)) if results[i] is None]
+    quizzes: Dict[int, models.Quiz] = {}
+    quiz_ids = {items[i].quiz_id for i in pending}
+    if quiz_ids:
+        quizzes = {
+            q.id: q
+            for q in db.query(models.Quiz).filter(models.Quiz.id.in_(quiz_ids), models.Quiz.deleted_at.is_(None))
+        }
+    version_of: Dict[int, int] = {}
+    for i in pending:
+        quiz = quizzes.get(items[i].quiz_id)
+        if quiz is None:
+            fail(i, "Quiz not found")
+            continue
+        version_id = items[i].version_id or quiz.current_version_id
+        if version_id is None:
+            fail(i, "Quiz has no published version")
+            continue
+        version_of[i] = version_id
+    keys_by_version = quiz_versions.answer_keys(db, set(version_of.values()))
+
+    for i, version_id in version_of.items():
+        key = keys_by_version.get(version_id)
+        if key is None or key.quiz_id != items[i].quiz_id:
+            fail(i, f"Version {version_id} doesn't belong to quiz {items[i].quiz_id}")
+        elif not key.total:
+            fail(i, "Quiz has no questions")
+    pending = [i for i in pending if results[i] is None]
+
+    keyed = sorted(
+        (vid, qid, key.correct[qid], key.options[qid])
+        for vid, key in keys_by_version.items()
+        for qid in key.correct
+    )
+    key_ver = np.array([k[0] for k in keyed], dtype=np.int64)
+    key_qid = np.array([k[1] for k in keyed], dtype=np.int64)
+    key_correct = np.array([k[2] for k in keyed], dtype=np.int64)
+    key_nopts = np.array([k[3] for k in keyed], dtype=np.int64)
+
+    # 3) Валидация и подсчёт векторно по всем ответам пакета
+    item_idx = np.array([i for i in pending for _ in items[i].answers], dtype=np.int64)
+    qids = np.array([a.question_id for i in pending for a in items[i].answers], dtype=np.int64)
+    sels = np.array([a.selected_option_index for i in pending for a in items[i].answers], dtype=np.int64)
+    item_version = np.array([version_of.get(i, 0) for i in range(len(items))], dtype=np.int64)
+
+    if len(key_qid) and len(qids):
+        # ключи отсортированы по (версия, вопрос): ищем пару составным ключом
+        composite = key_ver * (int(key_qid.max()) + 1) + key_qid
+        wanted = item_version[item_idx] * (int(key_qid.max()) + 1) + qids
+        pos = np.minimum(np.searchsorted(composite, wanted), len(composite) - 1)
+        belongs = composite[pos] == wanted
+        in_range = belongs & (sels < key_nopts[pos])
+        is_correct = in_range & (sels == key_correct[pos])
+    else:
+        pos = np.zeros(len(qids), dtype=np.int64)
+        belongs = in_range = is_correct = np.zeros(len(qids), dtype=bool)
+
+    duplicate = np.zeros(len(qids), dtype=bool)
+    if len(qids) > 1:
+        order = np.lexsort((np.arange(len(qids)), qids, item_idx))
+        same = (item_idx[order][1:] == item_idx[order][:-1]) & (qids[order][1:] == qids[order][:-1])
+        duplicate[order[1:][same]] = True
+
+    bad = ~in_range | duplicate
+    for j in np.flatnonzero(bad):
+        i = int(item_idx[j])
+        if results[i] is not None:
+            continue  # сообщаем первую ошибку попытки
+        qid = int(qids[j])
+        if not belongs[j]:
+            fail(i, f"Question {qid} doesn't belong to quiz {items[i].quiz_id}")
+        elif not in_range[j]:
+            fail(i, f"Question {qid}: selected_option_index out of range")
+        else:
+            fail(i, f"Duplicate answer for question {qid}")
+
+    scores = np.bincount(item_idx, weights=is_correct, minlength=len(items)).astype(np.int64)
+
+    # 4) Всё валидное — одной транзакцией
+    now = datetime.now(timezone.utc)
+    accepted = [i for i in pending if results[i] is None]
+    attempts = []
+    for i in accepted:
+        it = items[i]
+        created_at = now
+        if it.completed_at is not None:
+            done = it.completed_at if it.completed_at.tzinfo else it.completed_at.replace(tzinfo=timezone.utc)
+            created_at = min(done.astimezone(timezone.utc), now)
+        attempts.append(models.Attempt(
+            user_id=user_id,
+            quiz_id=it.quiz_id,
+            score=int(scores[i]),
+            total=keys_by_version[version_of[i]].total,
+            created_at=created_at,
+            quiz_version_id=version_of[i],
+        ))
+    db.add_all(attempts)
+    db.flush()
+
+    attempt_by_item = dict(zip(accepted, attempts))
+    answer_rows = [
+        {
+            "attempt_id": attempt_by_item[int(item_idx[j])].id,
+            "question_id": int(qids[j]),
+            "selected_option_index": int(sels[j]),
+            "is_correct": int(is_correct[j]),
+        }
+        for j in range(len(qids))
+        if int(item_idx[j]) in attempt_by_item
+    ]
+    if answer_rows:
+        db.execute(models.AttemptAnswer.__table__.insert(), answer_rows)
+    key_rows = [
+        {"user_id": user_id, "key": items[i].idempotency_key, "attempt_id": at.id}
+        for i, at in attempt_by_item.items()
+        if items[i].idempotency_key
+    ]
+    if key_rows:
+        db.execute(models.AttemptIdempotencyKey.__table__.insert(), key_rows)
+    answers_for_stats: Dict[int, list] = {}
+    for r in answer_rows:
+        answers_for_stats.setdefault(r["attempt_id"], []).append(
+            (r["question_id"], r["selected_option_index"], r["is_correct"])
+        )
+    quiz_stats.record_attempts(db, (
+        (at.quiz_id, at.score, answers_for_stats.get(at.id, [])) for at in attempts
+    ))
+    review_queue.record_attempts(db, user_id, (
+        (at.quiz_id, at.created_at, [(qid, ok) for qid, _, ok in answers_for_stats.get(at.id, [])])
+        for at in attempts
+    ))
+
+    # ответ собираем до commit: после него атрибуты попыток истекут и потянут SELECT на каждую
+    answers_by_attempt: Dict[int, List[AttemptAnswerOut]] = {}
+    for r in answer_rows:
+        answers_by_attempt.setdefault(r["attempt_id"], []).append(AttemptAnswerOut(
+            question_id=r["question_id"],
+            selected_option_index=r["selected_option_index"],
+            is_correct=bool(r["is_correct"]),
+        ))
+    for i, at in attempt_by_item.items():
+        results[i] = BatchAttemptResult(
+            index=i,
+            idempotency_key=items[i].idempotency_key,
+            status="created",
+            attempt=AttemptOut(
+                id=at.id,
+                quiz_id=at.quiz_id,
+                user_id=at.user_id,
+                score=at.score,
+                total=at.total,
+                created_at=str(at.created_at.replace(tzinfo=None)),
+                quiz_version_id=at.quiz_version_id,
+                answers=answers_by_attempt.get(at.id, []),
+            ),
+        )
+    db.commit()
+
+    return BatchAttemptOut(
+        created=sum(r.status == "created" for r in results),
+        duplicates=sum(r.status == "duplicate" for r in results),
+        errors=sum(r.status == "error" for r in results),
+        results=results,
+    )
+
+
+@router.post("/batch", response_model=BatchAttemptOut)
+def attempt_batch(
+    payload: BatchAttemptCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Пакетная отправка попыток (офлайн-клиенты, планшеты в классе).
+    Одна авторизация, ключи ответов всех квизов из снимков версий, векторный
+    подсчёт и одна транзакция. Ошибка в отдельной попытке не валит пакет —
+    она возвращается в results со status="error".
+    С idempotency_key повторная отправка вернёт уже сохранённую попытку (status="duplicate").
+    Объявлен до /{quiz_id}, чтобы не перехватывался им.
+    """
+    user_id = current_user.id
+    try:
+        return _process_batch(db, payload, user_id)
+    except IntegrityError:
+        # параллельный повтор успел записать тот же ключ — второй проход увидит его как duplicate
+        db.rollback()
+        return _process_batch(db, payload, user_id)
+
+
+def _get_session(db: Session, session_id: str, user_id: int) -> models.AttemptSession:
+    try:
+        session = attempt_sessions.get(db, session_id, user_id)
+    except attempt_sessions.SessionExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Attempt session not found")
+    return session
+
+
+@router.post("/sessions/{session_id}/answer", response_model=SessionAnswerOut)
+def session_answer(
+    session_id: str,
+    payload: AttemptAnswerIn,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Ответ на один вопрос сессии: проверка по кэшированному ключу версии,
+    задержка — от старта или предыдущего ответа по часам сервера.
+    """
+    session = _get_session(db, session_id, current_user.id)
+    try:
+        is_correct, latency_ms, answered, total = attempt_sessions.answer(
+            db, session, payload.question_id, payload.selected_option_index,
+        )
+    except attempt_sessions.InvalidAnswer as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except attempt_sessions.SessionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return SessionAnswerOut(
+        question_id=payload.question_id,
+        is_correct=is_correct,
+        latency_ms=latency_ms,
+        answered=answered,
+        total=total,
+    )
+
+
+@router.post("/sessions/{session_id}/finish", response_model=AttemptOut, status_code=status.HTTP_201_CREATED)
+def session_finish(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Завершает сессию: попытка и все ответы с задержками — одной транзакцией."""
+    session = _get_session(db, session_id, current_user.id)
+    try:
+        attempt, answers = attempt_sessions.finish(db, session)
+    except attempt_sessions.SessionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return AttemptOut(
+        id=attempt.id,
+        quiz_id=attempt.quiz_id,
+        user_id=attempt.user_id,
+        score=attempt.score,
+        total=attempt.total,
+        created_at=str(attempt.created_at) if attempt.created_at else None,
+        quiz_version_id=attempt.quiz_version_id,
+        duration_ms=attempt.duration_ms,
+        answers=[
+            AttemptAnswerOut(question_id=qid, selected_option_index=opt, is_correct=bool(ok), latency_ms=latency)
+            for qid, opt, ok, latency in answers.tolist()
+        ],
+    )
+
+
+@router.post("/{quiz_id}/start", response_model=AttemptSessionOut, status_code=status.HTTP_201_CREATED)
+def start_attempt(
+    quiz_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Начинает попытку с таймингом (services/attempt_sessions.py). Дальше —
+    POST /sessions/{session_id}/answer на каждый вопрос и /finish в конце.
+    Брошенная сессия истекает через ATTEMPT_SESSION_TTL_SECONDS (410).
+    """
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id, models.Quiz.deleted_at.is_(None)).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    version_id = quiz.current_version_id
+    if version_id is None:
+        raise HTTPException(status_code=409, detail="Quiz has no published version")
+    try:
+        session = attempt_sessions.start(db, current_user.id, quiz_id, version_id)
+    except attempt_sessions.InvalidAnswer as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return AttemptSessionOut(
+        session_id=session.id,
+        quiz_id=quiz_id,
+        quiz_version_id=version_id,
+        started_at=datetime.fromtimestamp(session.started_ms / 1000, tz=timezone.utc),
+        expires_at=datetime.fromtimestamp(session.expires_at, tz=timezone.utc),
+    )
+
+
 @router.post("/{quiz_id}", response_model=AttemptOut, status_code=status.HTTP_201_CREATED)
 def attempt_quiz(
     quiz_id: int,
@@ -17,24 +378,22 @@ def attempt_quiz(
     current_user: models.User = Depends(get_current_user),
 ):
     # 1) Проверим, что квиз существует
-    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id, models.Quiz.deleted_at.is_(None)).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
 
-    # 2) Подтянем все вопросы и их правильные ответы
-    questions = (
-        db.query(models.Question)
-          .filter(models.Question.quiz_id == quiz_id)
-          .all()
-    )
-    if not questions:
+    # 2) Ключ ответов из снимка версии (кэшируется в процессе), без запросов по вопросам
+    version_id = payload.version_id or quiz.current_version_id
+    if version_id is None:
+        raise HTTPException(status_code=409, detail="Quiz has no published version")
+    key = quiz_versions.answer_key(db, version_id)
+    if key is None or key.quiz_id != quiz_id:
+        raise HTTPException(status_code=400, detail=f"Version {version_id} doesn't belong to quiz {quiz_id}")
+    if not key.total:
         raise HTTPException(status_code=400, detail="Quiz has no questions")
 
-    correct_by_qid: Dict[int, int] = {q.id: q.correct_option_index for q in questions}
-    options_count_by_qid: Dict[int, int] = {}
-    # заранее подготовим кол-во опций на вопрос, чтобы валидировать индекс
-    for q in questions:
-        options_count_by_qid[q.id] = db.query(models.AnswerOption).filter(models.AnswerOption.question_id == q.id).count()
+    correct_by_qid: Dict[int, int] = key.correct
+    options_count_by_qid: Dict[int, int] = key.options
 
     # 3) Валидация входных ответов
     seen = set()
@@ -59,7 +418,7 @@ def attempt_quiz(
             is_correct=bool(is_correct),
         ))
 
-    total = len(questions)
+    total = key.total
 
     # 5) Сохраняем попытку
     attempt = models.Attempt(
@@ -67,6 +426,7 @@ def attempt_quiz(
         quiz_id=quiz_id,
         score=score,
         total=total,
+        quiz_version_id=version_id,
     )
     db.add(attempt)
     db.flush()
@@ -79,6 +439,16 @@ def attempt_quiz(
             is_correct=1 if ans.is_correct else 0
         ))
 
+    # агрегаты статистики — в той же транзакции
+    quiz_stats.record_attempt(
+        db, quiz_id, score,
+        ((a.question_id, a.selected_option_index, a.is_correct) for a in answers_out),
+    )
+    # ошибки — в очередь повторения (одна строка на пользователя и квиз)
+    review_queue.record_attempt(
+        db, current_user.id, quiz_id, ((a.question_id, a.is_correct) for a in answers_out),
+    )
+
     db.commit()
     db.refresh(attempt)
 
@@ -90,6 +460,7 @@ def attempt_quiz(
         score=attempt.score,
         total=attempt.total,
         created_at=str(attempt.created_at) if attempt.created_at else None,
+        quiz_version_id=attempt.quiz_version_id,
         answers=answers_out
     )
 
@@ -100,7 +471,8 @@ def my_attempts(
 ):
     attempts = (
         db.query(models.Attempt)
-          .filter(models.Attempt.user_id == current_user.id)
+          .join(models.Quiz, models.Quiz.id == models.Attempt.quiz_id)
+          .filter(models.Attempt.user_id == current_user.id, models.Quiz.deleted_at.is_(None))
           .order_by(models.Attempt.created_at.desc())
           .all()
     )
@@ -115,11 +487,13 @@ def my_attempts(
             score=at.score,
             total=at.total,
             created_at=str(at.created_at) if at.created_at else None,
+            duration_ms=at.duration_ms,
             answers=[
                 AttemptAnswerOut(
                     question_id=ra.question_id,
                     selected_option_index=ra.selected_option_index,
                     is_correct=bool(ra.is_correct),
+                    latency_ms=ra.latency_ms,
                 ) for ra in raw_answers
             ]
         ))
@@ -130,22 +504,35 @@ def leaderboard(
     quiz_id: int,
     db: Session = Depends(get_db),
 ):
-    # Возвращаем лучший результат каждого пользователя по этому квизу
+    # Лучшая попытка каждого пользователя: больше баллов, при равенстве — быстрее.
+    # Попытки без тайминга (старый POST /{quiz_id}, батчи) уступают любым с ним.
+    a = models.Attempt
+    rank = func.row_number().over(
+        partition_by=a.user_id,
+        order_by=(a.score.desc(), a.duration_ms.is_(None), a.duration_ms, a.id),
+    )
     subq = (
         db.query(
-            models.Attempt.user_id.label("user_id"),
-            func.max(models.Attempt.score).label("best_score"),
-            func.max(models.Attempt.total).label("total"),
+            a.user_id.label("user_id"),
+            a.score.label("best_score"),
+            a.total.label("total"),
+            a.duration_ms.label("duration_ms"),
+            rank.label("rank"),
         )
-        .filter(models.Attempt.quiz_id == quiz_id)
-        .group_by(models.Attempt.user_id)
+        .join(models.Quiz, models.Quiz.id == a.quiz_id)
+        .filter(a.quiz_id == quiz_id, models.Quiz.deleted_at.is_(None))
         .subquery()
     )
 
-    rows = db.query(subq.c.user_id, subq.c.best_score, subq.c.total)\
-             .order_by(subq.c.best_score.desc()).all()
+    rows = db.query(subq.c.user_id, subq.c.best_score, subq.c.total, subq.c.duration_ms)\
+             .filter(subq.c.rank == 1)\
+             .order_by(subq.c.best_score.desc(), subq.c.duration_ms.is_(None), subq.c.duration_ms,
+                       subq.c.user_id).all()
 
-    return [LeaderboardRow(user_id=r.user_id, best_score=r.best_score, total=r.total) for r in rows]
+    return [
+        LeaderboardRow(user_id=r.user_id, best_score=r.best_score, total=r.total, duration_ms=r.duration_ms)
+        for r in rows
+    ]
 
 class CheckPayload(schemas.BaseModel):  # если нет BaseModel — импортни из pydantic
     question_id: int
@@ -158,13 +545,12 @@ def check_answer(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    # убедимся, что вопрос принадлежит этому квизу
-    q = db.query(models.Question).filter(
-        models.Question.id == payload.question_id,
-        models.Question.quiz_id == quiz_id,
-    ).first()
-    if not q:
+    # ключ ответов текущей версии — из кэша quiz_versions, без запроса по вопросам
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id, models.Quiz.deleted_at.is_(None)).first()
+    version_id = quiz.current_version_id if quiz else None
+    key = quiz_versions.answer_key(db, version_id) if version_id else None
+    if key is None or payload.question_id not in key.correct:
         raise HTTPException(status_code=404, detail="Question not found")
 
-    correct = (payload.selected_option_index == q.correct_option_index)
+    correct = (payload.selected_option_index == key.correct[payload.question_id])
     return {"correct": bool(correct)}
\ No newline at end of file
@@ -1,43 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from .. import models
 from ..deps import get_db, get_user_by_username
 from ..schemas import UserCreate, UserOut, Token
-from ..core.security import get_password_hash, verify_password, create_access_token
+from ..core.security import create_access_token, hash_password_async, verify_password_async
+from ..services import accounts
 
 router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
-    exists = db.query(models.User).filter(
-        (models.User.username == payload.username) | (models.User.email == payload.email)
-    ).first()
-    if exists:
-        if exists.username == payload.username:
-            raise HTTPException(status_code=400, detail="Username already taken")
-        else:
-            raise HTTPException(status_code=400, detail="Email already registered")
+async def register(payload: UserCreate, db: Session = Depends(get_db)):
+    """
+    Без предварительного SELECT: вставка, а занятый username/email ловится
+    по IntegrityError (services/accounts.py). Хеш — в пуле хеширования,
+    запись — в threadpool, event loop свободен.
+    """
+    hashed = await hash_password_async(payload.password)
 
-    user = models.User(
-        username=payload.username,
-        email=payload.email,
-        hashed_password=get_password_hash(payload.password),
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    def insert() -> UserOut:
+        user = accounts.create_user(db, payload.username, payload.email, hashed)
+        return UserOut.model_validate(user)
+
+    try:
+        return await run_in_threadpool(insert)
+    except accounts.AccountExists as e:
+        detail = "Username already taken" if e.field == "username" else "Email already registered"
+        raise HTTPException(status_code=400, detail=detail)
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
     # OAuth2PasswordRequestForm передает поля: username, password
-    user = get_user_by_username(db, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user: models.User = await run_in_threadpool(get_user_by_username, db, form_data.username)
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
     access_token = create_access_token(subject=user.username)
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 
 from ..deps import get_db, get_current_user
 from .. import models
+from ..services import notifications
+from ..services.social_graph import graph as follow_graph
 
 router = APIRouter(prefix="/api/v1/follow", tags=["follow"])
 
@@ -30,7 +32,9 @@ def follow_user(
 
     link = models.Follow(follower_id=current_user.id, following_id=target.id)
     db.add(link)
+    notifications.emit(db, notifications.FOLLOWED, current_user.id, user_id=target.id)
     db.commit()
+    follow_graph.add_edge(current_user.id, target.id)
     return {"status": "ok"}
 
 @router.delete("/{username}")
@@ -53,4 +57,5 @@ def unfollow_user(
 
     q.delete()
     db.commit()
+    follow_graph.remove_edge(current_user.id, target.id)
     return {"status": "ok"}
@@ -0,0 +1,113 @@
+import json
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from ..core.config import IMPORT_MAX_UPLOAD_BYTES
+from ..deps import get_db, get_current_user
+from ..schemas import ImportRowError, QuestionImportOut
+from ..services import question_import
+
+router = APIRouter(prefix="/api/v1/quizzes", tags=["imports"])
+
+
+def _out(job: models.QuestionImport) -> QuestionImportOut:
+    return QuestionImportOut(
+        id=job.id,
+        quiz_id=job.quiz_id,
+        format=job.format,
+        mode=job.mode,
+        filename=job.filename,
+        status=job.status,
+        bytes_total=job.bytes_total,
+        bytes_done=job.bytes_done,
+        rows_done=job.rows_done,
+        imported=job.imported,
+        error_count=job.error_count,
+        errors=[ImportRowError(**e) for e in json.loads(job.errors or "[]")],
+        version_id=job.version_id,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
+
+
+def _owned_quiz(db: Session, quiz_id: int, user_id: int) -> models.Quiz:
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id, models.Quiz.deleted_at.is_(None)).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if quiz.owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Only owner can modify this quiz")
+    return quiz
+
+
+@router.post("/{quiz_id}/imports", response_model=QuestionImportOut, status_code=status.HTTP_202_ACCEPTED)
+async def import_questions(
+    quiz_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Банк вопросов из CSV или JSON Lines, multipart/form-data: часть file и
+    поля mode (append | replace) и format (csv | jsonl). Без format формат
+    берётся по расширению имени файла, затем по Content-Type части.
+    Форма разбирается потоком, файл пишется на диск по кускам с проверкой
+    лимита и ставится в очередь; разбор, проверка по строкам и запись
+    пакетами идут фоном (services/question_import.py). Прогресс и ошибки с
+    номерами строк — GET /{quiz_id}/imports/{import_id}.
+    mode=replace заменяет вопросы квиза, append — добавляет к ним.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > question_import.MAX_REQUEST_BYTES:
+        raise HTTPException(status_code=413, detail=f"File is larger than {IMPORT_MAX_UPLOAD_BYTES} bytes")
+    user_id = current_user.id
+    await run_in_threadpool(_owned_quiz, db, quiz_id, user_id)
+    try:
+        upload = await question_import.receive(request.headers.get("content-type"), request.stream())
+    except question_import.UnsupportedFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except question_import.ImportTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except question_import.InvalidUpload as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    def enqueue() -> QuestionImportOut:
+        job = question_import.create(
+            db, quiz_id, user_id, upload.format, upload.mode, upload.filename, upload.path, upload.size,
+        )
+        question_import.runner.submit(job.id)
+        return _out(job)
+
+    return await run_in_threadpool(enqueue)
+
+
+@router.get("/{quiz_id}/imports", response_model=List[QuestionImportOut])
+def list_imports(
+    quiz_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    _owned_quiz(db, quiz_id, current_user.id)
+    jobs = (
+        db.query(models.QuestionImport)
+          .filter(models.QuestionImport.quiz_id == quiz_id)
+          .order_by(models.QuestionImport.id.desc())
+          .limit(20).all()
+    )
+    return [_out(j) for j in jobs]
+
+
+@router.get("/{quiz_id}/imports/{import_id}", response_model=QuestionImportOut)
+def get_import(
+    quiz_id: int,
+    import_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    job = db.get(models.QuestionImport, import_id)
+    if job is None or job.quiz_id != quiz_id or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return _out(job)
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from ..core.config import MEDIA_MAX_UPLOAD_BYTES
+from ..deps import get_db, get_current_user
+from ..schemas import MediaOut
+from ..services import media
+
+router = APIRouter(prefix="/api/v1/media", tags=["media"])
+
+
+@router.post("", response_model=MediaOut, status_code=status.HTTP_201_CREATED)
+async def upload_media(
+    request: Request,
+    kind: str = Query(..., pattern="^(thumb|avatar)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Загрузка картинки телом запроса (Content-Type: image/*, не multipart).
+    Тело пишется на диск по кускам, не накапливаясь в памяти; формат
+    определяется по сигнатуре. Варианты (WebP/PNG фиксированных размеров)
+    готовятся фоном — пока status="pending", отдаётся оригинал.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MEDIA_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File is larger than {MEDIA_MAX_UPLOAD_BYTES} bytes")
+    try:
+        stored = await media.save_stream(request.stream())
+    except media.MediaTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except media.UnsupportedMedia as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    def register() -> MediaOut:
+        asset, created = media.register(db, current_user.id, kind, stored)
+        if created:
+            media.pipeline.submit(asset)
+        return MediaOut.model_validate(asset)
+
+    return await run_in_threadpool(register)
+
+
+@router.get("/{media_id}", response_model=MediaOut)
+def get_media(media_id: int, db: Session = Depends(get_db)):
+    asset = db.get(models.MediaAsset, media_id)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return asset
@@ -0,0 +1,74 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..deps import get_db, get_current_user
+from ..schemas import NotificationOut, NotificationPage
+from ..services import notifications
+
+router = APIRouter(prefix="/api/v1/notifications", tags=["notifications"])
+
+
+@router.get("/", response_model=NotificationPage)
+def list_notifications(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    before: Optional[int] = Query(None, ge=1, description="курсор: id последнего уведомления с прошлой страницы"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Входящие, новые сверху. Рассылает их фон (services/notifications.py),
+    поэтому уведомление появляется через несколько секунд после события.
+    """
+    rows = notifications.page(db, current_user.id, before, limit)
+    last_read = notifications.last_read_id(db, current_user.id)
+
+    names = dict(
+        db.query(models.User.id, models.User.username)
+          .filter(models.User.id.in_({r.actor_id for r in rows}))
+          .all()
+    ) if rows else {}
+    quiz_ids = {r.quiz_id for r in rows if r.quiz_id is not None}
+    titles = dict(
+        db.query(models.Quiz.id, models.Quiz.title)
+          .filter(models.Quiz.id.in_(quiz_ids), models.Quiz.deleted_at.is_(None))
+          .all()
+    ) if quiz_ids else {}
+
+    return NotificationPage(
+        items=[
+            NotificationOut(
+                id=r.id,
+                kind=r.kind,
+                actor_id=r.actor_id,
+                actor_username=names.get(r.actor_id),
+                actor_count=r.actor_count,
+                quiz_id=r.quiz_id,
+                quiz_title=titles.get(r.quiz_id),
+                created_at=r.created_at,
+                is_read=r.id <= last_read,
+            )
+            for r in rows
+        ],
+        unread=notifications.unread_count(db, current_user.id),
+        next_before=rows[-1].id if len(rows) == limit else None,
+    )
+
+
+@router.get("/unread_count")
+def unread_count(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Счётчик для бейджа: одно чтение по первичному ключу."""
+    return {"unread": notifications.unread_count(db, current_user.id)}
+
+
+@router.post("/read", status_code=status.HTTP_204_NO_CONTENT)
+def mark_all_read(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    notifications.mark_all_read(db, current_user.id)
@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, selectinload
+
+from .. import models
+from ..deps import get_db, get_current_user
+from ..schemas import AnswerOptionOut, PracticeAnswer, PracticeAnswerOut, PracticeCard
+from ..services import review_queue
+
+router = APIRouter(prefix="/api/v1/practice", tags=["practice"])
+
+
+def _as_datetime(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+@router.get("/next", response_model=List[PracticeCard])
+def next_cards(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Следующие вопросы на повторение (SM-2, services/review_queue.py): те, где
+    ошибался, по сроку. Очередь — диапазон по индексу (user_id, next_due),
+    тексты вопросов — одним запросом по id.
+    """
+    cards = review_queue.due(db, current_user.id, limit)
+    if not cards:
+        return []
+
+    # карточки снятых правкой вопросов чистит сама правка (review_queue.prune_retired);
+    # здесь их только отфильтровываем — GET ничего не пишет
+    questions = {
+        q.id: q
+        for q in db.query(models.Question)
+                   .options(selectinload(models.Question.options), selectinload(models.Question.quiz))
+                   .filter(models.Question.id.in_([c.question_id for c in cards]),
+                           models.Question.retired_at.is_(None))
+    }
+
+    return [
+        PracticeCard(
+            quiz_id=c.quiz_id,
+            quiz_title=questions[c.question_id].quiz.title,
+            question_id=c.question_id,
+            text=questions[c.question_id].text,
+            options=[AnswerOptionOut.model_validate(o) for o in questions[c.question_id].options],
+            due_at=_as_datetime(c.due),
+            reps=c.reps,
+            lapses=c.lapses,
+        )
+        for c in cards
+        if c.question_id in questions
+    ]
+
+
+@router.post("/answer", response_model=PracticeAnswerOut)
+def answer_card(
+    payload: PracticeAnswer,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Ответ в режиме практики: попытку не создаёт, только двигает карточку по SM-2."""
+    q = (
+        db.query(models.Question)
+          .join(models.Quiz, models.Quiz.id == models.Question.quiz_id)
+          .options(selectinload(models.Question.options))
+          .filter(
+              models.Question.id == payload.question_id,
+              models.Question.retired_at.is_(None),
+              models.Quiz.deleted_at.is_(None),
+          )
+          .first()
+    )
+    if not q:
+        raise HTTPException(status_code=404, detail="Question not found")
+    if payload.selected_option_index >= len(q.options):
+        raise HTTPException(status_code=400, detail="selected_option_index out of range")
+
+    is_correct = payload.selected_option_index == q.correct_option_index
+    review_queue.record_attempt(db, current_user.id, q.quiz_id, [(q.id, is_correct)])
+    db.commit()
+
+    next_due_at = None
+    state = db.get(models.ReviewState, (current_user.id, q.quiz_id))
+    if state is not None:
+        cards = review_queue.decode(state.cards)
+        hit = cards[cards["question_id"] == q.id]
+        if len(hit):
+            next_due_at = _as_datetime(int(hit["due"][0]))
+    return PracticeAnswerOut(
+        question_id=q.id,
+        is_correct=is_correct,
+        correct_option_index=q.correct_option_index,
+        next_due_at=next_due_at,
+    )
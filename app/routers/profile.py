@@ -5,6 +5,7 @@ from typing import List
 from .. import models
 from ..deps import get_db, get_current_user
 from ..schemas import ProfileOut, ProfileUpdate, AvatarOption
+from ..services.social_graph import graph as follow_graph
 
 router = APIRouter(prefix="/api/v1/profile", tags=["profile"])
 
@@ -24,6 +25,16 @@ def avatar_url(request: Request, key: str) -> str:
     return f"{base}/static/avatars/{key}"
 
 
+def profile_avatar_url(request: Request, prof: models.Profile) -> str:
+    """Загруженная аватарка (крупнейший PNG-вариант или оригинал), иначе встроенная."""
+    media = prof.avatar_media
+    if media is None:
+        return avatar_url(request, prof.avatar_key)
+    base = str(request.base_url).rstrip("/")
+    png = [v for v in media.variants if v.format == "png"]
+    return f"{base}/media/{png[-1].filename if png else media.filename}"
+
+
 def get_or_create_profile(db: Session, user_id: int) -> models.Profile:
     prof = db.query(models.Profile).filter(models.Profile.user_id == user_id).first()
     if prof:
@@ -47,7 +58,7 @@ def get_my_profile(
     - bio
     - avatar_url
     - quiz_count
-    - followers / following (пока заглушки = 0)
+    - followers / following (из графа подписок в памяти)
     - quizzes: список моих квизов (id, title, description)
     """
     prof = get_or_create_profile(db, current_user.id)
@@ -55,17 +66,17 @@ def get_my_profile(
     # Кол-во созданных квизов
     quiz_count = (
         db.query(models.Quiz)
-        .filter(models.Quiz.owner_id == current_user.id)
+        .filter(models.Quiz.owner_id == current_user.id, models.Quiz.deleted_at.is_(None))
         .count()
     )
 
-    followers = db.query(models.Follow).filter(models.Follow.following_id == current_user.id).count()
-    following = db.query(models.Follow).filter(models.Follow.follower_id == current_user.id).count()
+    follow_graph.ensure_loaded(db)
+    followers, following = follow_graph.counts(current_user.id)
 
     # Список моих квизов
     my_quizzes = (
         db.query(models.Quiz)
-        .filter(models.Quiz.owner_id == current_user.id)
+        .filter(models.Quiz.owner_id == current_user.id, models.Quiz.deleted_at.is_(None))
         .order_by(models.Quiz.id.desc())
         .all()
     )
@@ -73,7 +84,7 @@ def get_my_profile(
     return {
         "username": current_user.username,
         "bio": prof.bio,
-        "avatar_url": avatar_url(request, prof.avatar_key),
+        "avatar_url": profile_avatar_url(request, prof),
         "quiz_count": quiz_count,
         "followers": followers,
         "following": following,
@@ -96,7 +107,7 @@ def update_my_profile(
     current_user: models.User = Depends(get_current_user),
 ):
     """
-    Обновление био и аватарки (из ALLOWED_AVATARS).
+    Обновление био и аватарки (из ALLOWED_AVATARS или загруженной, avatar_media_id).
     Возвращает компактную модель ProfileOut, которую уже использует фронт.
     """
     prof = get_or_create_profile(db, current_user.id)
@@ -108,6 +119,13 @@ def update_my_profile(
         if payload.avatar_key not in ALLOWED_AVATARS:
             raise HTTPException(status_code=400, detail="Invalid avatar_key")
         prof.avatar_key = payload.avatar_key
+        prof.avatar_media_id = None
+
+    if payload.avatar_media_id is not None:
+        media = db.get(models.MediaAsset, payload.avatar_media_id)
+        if media is None or media.owner_id != current_user.id or media.kind != "avatar":
+            raise HTTPException(status_code=400, detail="Invalid avatar_media_id")
+        prof.avatar_media_id = media.id
 
     db.add(prof)
     db.commit()
@@ -116,7 +134,7 @@ def update_my_profile(
     return ProfileOut(
         user_id=current_user.id,
         bio=prof.bio,
-        avatar_url=avatar_url(request, prof.avatar_key),
+        avatar_url=profile_avatar_url(request, prof),
     )
 
 
@@ -147,7 +165,7 @@ def search_users(
         p = get_or_create_profile(db, u.id)
         results.append({
             "username": u.username,
-            "avatar_url": avatar_url(request, p.avatar_key),
+            "avatar_url": profile_avatar_url(request, p),
         })
     return {"results": results}
 
@@ -164,28 +182,29 @@ def get_user_profile_public(
 
     prof = get_or_create_profile(db, user.id)
 
-    quiz_count = db.query(models.Quiz).filter(models.Quiz.owner_id == user.id).count()
-    followers = db.query(models.Follow).filter(models.Follow.following_id == user.id).count()
-    following = db.query(models.Follow).filter(models.Follow.follower_id == user.id).count()
+    quiz_count = (
+        db.query(models.Quiz)
+        .filter(models.Quiz.owner_id == user.id, models.Quiz.deleted_at.is_(None))
+        .count()
+    )
+    follow_graph.ensure_loaded(db)
+    followers, following = follow_graph.counts(user.id)
 
     quizzes = (
         db.query(models.Quiz)
-        .filter(models.Quiz.owner_id == user.id)
+        .filter(models.Quiz.owner_id == user.id, models.Quiz.deleted_at.is_(None))
         .order_by(models.Quiz.id.desc())
         .all()
     )
 
-    is_following = False
-    if current_user.id != user.id:
-        is_following = db.query(models.Follow).filter(
-            models.Follow.follower_id == current_user.id,
-            models.Follow.following_id == user.id
-        ).first() is not None
+    is_me = user.id == current_user.id
+    is_following = not is_me and follow_graph.is_following(current_user.id, user.id)
+    follows_me = not is_me and follow_graph.is_following(user.id, current_user.id)
 
     return {
         "username": user.username,
         "bio": prof.bio,
-        "avatar_url": avatar_url(request, prof.avatar_key),
+        "avatar_url": profile_avatar_url(request, prof),
         "quiz_count": quiz_count,
         "followers": followers,
         "following": following,
@@ -193,6 +212,7 @@ def get_user_profile_public(
             {"id": q.id, "title": q.title, "description": q.description or ""}
             for q in quizzes
         ],
-        "is_me": (user.id == current_user.id),
+        "is_me": is_me,
         "is_following": is_following,
+        "follows_me": follows_me,
     }
\ No newline at end of file
@@ -1,15 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func
+from typing import List, Optional
 
 from .. import models
 from ..deps import get_db, get_current_user
-from ..schemas import QuizCreate, QuizOut, QuizUpdate
+from ..schemas import (
+    QuizCreate, QuizOut, QuizUpdate, QuizQuestionsUpdate, QuizVersionOut,
+    QuizStatsOut, QuestionStatsOut, TrendingQuiz, QuizThumbnailUpdate, ThumbnailOption, TagOut,
+)
+from ..services import notifications, quiz_versions, review_queue, tags as tag_index
 
 router = APIRouter(prefix="/api/v1/quizzes", tags=["quizzes"])
 
+# Встроенные обложки (лежат в app/static/thumbs)
+ALLOWED_THUMBS = [
+    "thumb_book.png",
+    "thumb_brain.png",
+    "thumb_earth.png",
+    "thumb_gamepad.png",
+    "thumb_lightning.png",
+    "thumb_music.png",
+    "thumb_pi.png",
+    "thumb_question.png",
+    "thumb_science.png",
+    "thumb_scroll.png",
+    "thumb_star.png",
+    "thumb_trophy.png",
+]
+
 def _get_quiz_or_404(db: Session, quiz_id: int) -> models.Quiz:
-    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id, models.Quiz.deleted_at.is_(None)).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     return quiz
@@ -18,31 +41,19 @@ def _ensure_owner(quiz: models.Quiz, user_id: int):
     if quiz.owner_id != user_id:
         raise HTTPException(status_code=403, detail="Only owner can modify this quiz")
 
-@router.post("/", response_model=QuizOut, status_code=status.HTTP_201_CREATED)
-def create_quiz(
-    payload: QuizCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
+def _validate_questions(questions) -> None:
     # Валидация correct_option_index в пределах options
-    for i, q in enumerate(payload.questions):
+    for i, q in enumerate(questions):
         if not (0 <= q.correct_option_index < len(q.options)):
             raise HTTPException(
                 status_code=400,
                 detail=f"Question #{i+1}: correct_option_index is out of range"
             )
 
-    quiz = models.Quiz(
-        title=payload.title,
-        description=payload.description,
-        owner_id=current_user.id,
-    )
-    db.add(quiz)
-    db.flush()  # получим quiz.id без полного commit
-
-    for q in payload.questions:
+def _add_questions(db: Session, quiz_id: int, questions) -> None:
+    for q in questions:
         question = models.Question(
-            quiz_id=quiz.id,
+            quiz_id=quiz_id,
             text=q.text,
             correct_option_index=q.correct_option_index,
         )
@@ -51,6 +62,54 @@ def create_quiz(
         for opt in q.options:
             db.add(models.AnswerOption(question_id=question.id, text=opt.text))
 
+def _check_thumbnail_key(key) -> None:
+    if key is not None and key not in ALLOWED_THUMBS:
+        raise HTTPException(status_code=400, detail="Invalid thumbnail key")
+
+def _set_tags(db: Session, quiz: models.Quiz, names: List[str]) -> None:
+    try:
+        tag_index.set_tags(db, quiz, names)
+    except tag_index.InvalidTag as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _snapshot_response(request: Request, version: models.QuizVersion, immutable: bool = False) -> Response:
+    """
+    Снимок версии отдаём байтами как есть, без повторной сериализации.
+    id версии — ETag: повторный запрос с If-None-Match получает 304.
+    """
+    etag = f'"qv{version.id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable" if immutable else "no-cache",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=version.snapshot, media_type="application/json", headers=headers)
+
+@router.post("/", response_model=QuizOut, status_code=status.HTTP_201_CREATED)
+def create_quiz(
+    payload: QuizCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    _validate_questions(payload.questions)
+    _check_thumbnail_key(payload.thumbnail_key)
+
+    quiz = models.Quiz(
+        title=payload.title,
+        description=payload.description,
+        owner_id=current_user.id,
+        thumbnail_key=payload.thumbnail_key,
+    )
+    db.add(quiz)
+    db.flush()  # получим quiz.id без полного commit
+
+    _add_questions(db, quiz.id, payload.questions)
+    _set_tags(db, quiz, payload.tags)
+    db.flush()
+    quiz_versions.publish(db, quiz)
+    notifications.emit(db, notifications.QUIZ_PUBLISHED, current_user.id, quiz_id=quiz.id)
+
     db.commit()
     db.refresh(quiz)
     return quiz
@@ -60,20 +119,123 @@ def list_quizzes(
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    tag: List[str] = Query([], max_length=5),
+    before: Optional[int] = Query(None, ge=1),
+):
+    """
+    Публичный список. С tag (можно несколько — квизы со всеми сразу) — от новых
+    к старым, keyset: следующая страница — before=<id последнего>, skip не используется.
+    """
+    if not tag:
+        quizzes = db.query(models.Quiz).filter(models.Quiz.deleted_at.is_(None)).offset(skip).limit(limit).all()
+        return quizzes
+
+    try:
+        found = tag_index.resolve(db, tag)
+    except tag_index.InvalidTag as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not found:
+        return []
+    ids = tag_index.quiz_ids(db, found, before, limit)
+    if not ids:
+        return []
+    return (
+        db.query(models.Quiz)
+          .filter(models.Quiz.id.in_(ids), models.Quiz.deleted_at.is_(None))
+          .order_by(models.Quiz.id.desc())
+          .all()
+    )
+
+@router.get("/tags", response_model=List[TagOut])
+def list_tags(
+    db: Session = Depends(get_db),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """Популярные темы с числом квизов (счётчики ведутся при изменении тегов, без COUNT)."""
+    return tag_index.popular(db, limit)
+
+@router.get("/trending", response_model=List[TrendingQuiz])
+def trending_quizzes(
+    db: Session = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
 ):
-    # Публичный список (в будущем добавим фиды/подписки)
-    quizzes = db.query(models.Quiz).offset(skip).limit(limit).all()
-    return quizzes
+    """
+    Популярное сейчас: готовый top-K из trending_top (пересчитывается фоном,
+    см. services/trending.py). Объявлен до /{quiz_id}, чтобы не перехватывался им.
+    """
+    rows = (
+        db.query(models.TrendingTop, models.Quiz, models.User.username)
+          .join(models.Quiz, models.Quiz.id == models.TrendingTop.quiz_id)
+          .join(models.User, models.User.id == models.Quiz.owner_id)
+          .filter(models.Quiz.deleted_at.is_(None))
+          .order_by(models.TrendingTop.rank)
+          .limit(limit)
+          .all()
+    )
+    return [
+        TrendingQuiz(
+            rank=t.rank,
+            quiz_id=q.id,
+            title=q.title,
+            description=q.description,
+            owner_id=q.owner_id,
+            owner_username=username,
+            created_at=q.created_at,
+            score=t.score,
+        )
+        for t, q, username in rows
+    ]
+
+@router.get("/thumbnails", response_model=List[ThumbnailOption])
+def list_thumbnails(request: Request) -> List[ThumbnailOption]:
+    """Встроенные обложки на выбор. Объявлен до /{quiz_id}."""
+    base = str(request.base_url).rstrip("/")
+    return [ThumbnailOption(key=k, url=f"{base}/static/thumbs/{k}") for k in ALLOWED_THUMBS]
 
 @router.get("/{quiz_id}", response_model=QuizOut)
 def get_quiz(
     quiz_id: int,
+    request: Request,
     db: Session = Depends(get_db),
 ):
-    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
-    if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    return quiz
+    # Текущая опубликованная версия: квиз по PK + снимок по PK, без join'ов по вопросам
+    quiz = _get_quiz_or_404(db, quiz_id)
+    version_id = quiz.current_version_id
+    if version_id is None:
+        return quiz  # версии ещё нет (не прошёл backfill) — собираем из таблиц, ничего не публикуя
+    return _snapshot_response(request, db.get(models.QuizVersion, version_id))
+
+@router.get("/{quiz_id}/versions", response_model=List[QuizVersionOut])
+def list_quiz_versions(
+    quiz_id: int,
+    db: Session = Depends(get_db),
+):
+    quiz = _get_quiz_or_404(db, quiz_id)
+    rows = (
+        db.query(models.QuizVersion.id, models.QuizVersion.version, models.QuizVersion.created_at)
+          .filter(models.QuizVersion.quiz_id == quiz_id)
+          .order_by(models.QuizVersion.version.desc())
+          .all()
+    )
+    return [
+        QuizVersionOut(id=r.id, version=r.version, created_at=r.created_at,
+                       is_current=(r.id == quiz.current_version_id))
+        for r in rows
+    ]
+
+@router.get("/{quiz_id}/versions/{version_id}", response_model=QuizOut)
+def get_quiz_version(
+    quiz_id: int,
+    version_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """Опубликованная версия — одно чтение по первичному ключу; неизменяема, кэшируется навсегда."""
+    _get_quiz_or_404(db, quiz_id)
+    version = db.get(models.QuizVersion, version_id)
+    if not version or version.quiz_id != quiz_id:
+        raise HTTPException(status_code=404, detail="Quiz version not found")
+    return _snapshot_response(request, version, immutable=True)
 
 @router.get("/mine", response_model=List[QuizOut])
 def list_my_quizzes(
@@ -84,11 +246,70 @@ def list_my_quizzes(
 ):
     return (
         db.query(models.Quiz)
-          .filter(models.Quiz.owner_id == current_user.id)
+          .filter(models.Quiz.owner_id == current_user.id, models.Quiz.deleted_at.is_(None))
           .order_by(models.Quiz.id.desc())
           .offset(skip).limit(limit).all()
     )
 
+@router.get("/{quiz_id}/stats", response_model=QuizStatsOut)
+def quiz_stats(
+    quiz_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Статистика для автора: доля правильных ответов по актуальным вопросам и распределение вариантов.
+    Читается из агрегатов (quiz_stats / question_stats / question_option_stats) по индексу quiz_id.
+    """
+    quiz = _get_quiz_or_404(db, quiz_id)
+    _ensure_owner(quiz, current_user.id)
+
+    qstat = db.query(models.QuizStat).filter(models.QuizStat.quiz_id == quiz_id).first()
+    attempts = qstat.attempts_count if qstat else 0
+
+    questions = (
+        db.query(models.Question.id, models.Question.text)
+          .filter(models.Question.quiz_id == quiz_id, models.Question.retired_at.is_(None))
+          .order_by(models.Question.id)
+          .all()
+    )
+    options_count = dict(
+        db.query(models.AnswerOption.question_id, func.count(models.AnswerOption.id))
+          .join(models.Question, models.Question.id == models.AnswerOption.question_id)
+          .filter(models.Question.quiz_id == quiz_id, models.Question.retired_at.is_(None))
+          .group_by(models.AnswerOption.question_id)
+          .all()
+    )
+    stats_by_qid = {
+        s.question_id: s
+        for s in db.query(models.QuestionStat).filter(models.QuestionStat.quiz_id == quiz_id).all()
+    }
+    picks_by_qid = {}
+    for o in db.query(models.QuestionOptionStat).filter(models.QuestionOptionStat.quiz_id == quiz_id).all():
+        picks_by_qid.setdefault(o.question_id, {})[o.option_index] = o.picks
+
+    out = []
+    for qid, text in questions:
+        st = stats_by_qid.get(qid)
+        answered = st.answered_count if st else 0
+        correct = st.correct_count if st else 0
+        picks = picks_by_qid.get(qid, {})
+        out.append(QuestionStatsOut(
+            question_id=qid,
+            text=text,
+            answered=answered,
+            correct=correct,
+            correct_rate=(correct / answered) if answered else None,
+            option_picks=[picks.get(i, 0) for i in range(options_count.get(qid, 0))],
+        ))
+
+    return QuizStatsOut(
+        quiz_id=quiz_id,
+        attempts=attempts,
+        avg_score=(qstat.score_sum / attempts) if attempts else None,
+        questions=out,
+    )
+
 @router.patch("/{quiz_id}", response_model=QuizOut)
 def update_quiz(
     quiz_id: int,
@@ -106,24 +327,93 @@ def update_quiz(
     if payload.description is not None:
         quiz.description = payload.description
         updated = True
+    if payload.tags is not None:
+        _set_tags(db, quiz, payload.tags)
+        updated = True
 
     if not updated:
         # Нечего менять — вернем как есть (или 400 по желанию)
         return quiz
 
     db.add(quiz)
+    db.flush()
+    quiz_versions.publish(db, quiz)
     db.commit()
     db.refresh(quiz)
     return quiz
 
+@router.put("/{quiz_id}/questions", response_model=QuizOut)
+def replace_quiz_questions(
+    quiz_id: int,
+    payload: QuizQuestionsUpdate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Правка вопросов = новая версия. Старые вопросы не меняются и не удаляются:
+    они помечаются retired_at, поэтому ответы прошлых попыток сохраняют смысл.
+    """
+    quiz = _get_quiz_or_404(db, quiz_id)
+    _ensure_owner(quiz, current_user.id)
+    _validate_questions(payload.questions)
+
+    (
+        db.query(models.Question)
+          .filter(models.Question.quiz_id == quiz_id, models.Question.retired_at.is_(None))
+          .update({models.Question.retired_at: datetime.now(timezone.utc)}, synchronize_session=False)
+    )
+    _add_questions(db, quiz_id, payload.questions)
+    db.flush()
+    review_queue.prune_retired(db, quiz_id)
+    db.expire(quiz, ["questions"])
+    version = quiz_versions.publish(db, quiz)
+    db.commit()
+    return _snapshot_response(request, version)
+
+@router.put("/{quiz_id}/thumbnail", response_model=QuizOut)
+def set_quiz_thumbnail(
+    quiz_id: int,
+    payload: QuizThumbnailUpdate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Обложка квиза: встроенная (key) или своя загрузка (media_id). Публикует новую версию.
+    Если варианты загрузки ещё готовятся, версия переиздаётся, когда они будут готовы.
+    """
+    quiz = _get_quiz_or_404(db, quiz_id)
+    _ensure_owner(quiz, current_user.id)
+    if payload.key is not None and payload.media_id is not None:
+        raise HTTPException(status_code=400, detail="Specify either key or media_id, not both")
+    _check_thumbnail_key(payload.key)
+    if payload.media_id is not None:
+        media = db.get(models.MediaAsset, payload.media_id)
+        if media is None or media.owner_id != current_user.id or media.kind != "thumb":
+            raise HTTPException(status_code=400, detail="Invalid media_id")
+
+    quiz.thumbnail_key = payload.key
+    quiz.thumbnail_media_id = payload.media_id
+    db.flush()
+    db.expire(quiz, ["thumbnail"])
+    version = quiz_versions.publish(db, quiz)
+    db.commit()
+    return _snapshot_response(request, version)
+
 @router.delete("/{quiz_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_quiz(
     quiz_id: int,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
+    """
+    Мягкое удаление: ставим надгробие и сразу отвечаем. Вопросы, попытки, лайки
+    и агрегаты удаляет фоновая задача (services/quiz_cleanup.py).
+    """
     quiz = _get_quiz_or_404(db, quiz_id)
     _ensure_owner(quiz, current_user.id)
 
-    db.delete(quiz)   # каскадно удалит вопросы/варианты/попытки только если настроим каскады
+    quiz.deleted_at = datetime.now(timezone.utc)
+    tag_index.remove_quiz(db, quiz_id)
     db.commit()
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List
+
+from .. import models
+from ..deps import get_db, get_current_user
+from ..schemas import RecommendedQuiz
+from ..services import recommendations
+
+router = APIRouter(prefix="/api/v1/recommendations", tags=["recommendations"])
+
+@router.get("/quizzes", response_model=List[RecommendedQuiz])
+def recommended_quizzes(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Персональные рекомендации по похожести квизов (co-like / co-attempt).
+    Соседи посчитаны заранее (services/recommendations.py), здесь только слияние.
+    Если истории нет — свежие чужие квизы.
+    """
+    ranked = recommendations.recommend(db, current_user.id, limit=limit)
+    score_by_id = dict(ranked)
+
+    q = (
+        db.query(models.Quiz, models.User.username)
+          .join(models.User, models.User.id == models.Quiz.owner_id)
+          .filter(models.Quiz.deleted_at.is_(None))
+    )
+    if score_by_id:
+        rows = q.filter(models.Quiz.id.in_(list(score_by_id))).all()
+        rows.sort(key=lambda r: (-score_by_id[r[0].id], -r[0].id))
+    else:
+        rows = (
+            q.filter(models.Quiz.owner_id != current_user.id)
+             .order_by(models.Quiz.id.desc())
+             .limit(limit)
+             .all()
+        )
+
+    return [
+        RecommendedQuiz(
+            quiz_id=quiz.id,
+            title=quiz.title,
+            description=quiz.description,
+            owner_id=quiz.owner_id,
+            owner_username=username,
+            score=score_by_id.get(quiz.id, 0.0),
+        )
+        for quiz, username in rows
+    ]
@@ -5,7 +5,9 @@ from typing import List
 
 from .. import models
 from ..deps import get_db, get_current_user
-from ..schemas import FeedItem
+from ..schemas import FeedItem, FollowListItem, FollowListOut, FollowSuggestion
+from ..services import notifications
+from ..services.social_graph import graph as follow_graph
 
 router = APIRouter(prefix="/api/v1/social", tags=["social"])
 
@@ -33,7 +35,9 @@ def follow_user(
     )
     if not exists:
         db.add(models.Follow(follower_id=current_user.id, following_id=user_id))
+        notifications.emit(db, notifications.FOLLOWED, current_user.id, user_id=user_id)
         db.commit()
+        follow_graph.add_edge(current_user.id, user_id)
 
 @router.delete("/follow/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def unfollow_user(
@@ -49,6 +53,93 @@ def unfollow_user(
     if row:
         db.delete(row)
         db.commit()
+        follow_graph.remove_edge(current_user.id, user_id)
+
+@router.get("/suggestions", response_model=List[FollowSuggestion])
+def follow_suggestions(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    «Кого читать»: друзья друзей из графа подписок в памяти (services/social_graph.py).
+    SQL только на то, чтобы достать имена.
+    """
+    follow_graph.ensure_loaded(db)
+    ranked = follow_graph.suggest(current_user.id, limit=limit)
+    if not ranked:
+        return []
+
+    names = dict(
+        db.query(models.User.id, models.User.username)
+          .filter(models.User.id.in_([uid for uid, _ in ranked]))
+          .all()
+    )
+    return [
+        FollowSuggestion(user_id=uid, username=names[uid], mutual_count=cnt)
+        for uid, cnt in ranked
+        if uid in names
+    ]
+
+# ---------- FOLLOWERS / FOLLOWING ----------
+
+def _follow_list(db: Session, viewer_id: int, ids: List[int], total: int, next_after) -> FollowListOut:
+    names = dict(
+        db.query(models.User.id, models.User.username)
+          .filter(models.User.id.in_(ids))
+          .all()
+    ) if ids else {}
+    return FollowListOut(
+        items=[
+            FollowListItem(
+                user_id=uid,
+                username=names[uid],
+                is_following=follow_graph.is_following(viewer_id, uid),
+                follows_me=follow_graph.is_following(uid, viewer_id),
+            )
+            for uid in ids
+            if uid in names
+        ],
+        total=total,
+        next_after=next_after,
+    )
+
+def _ensure_user(db: Session, user_id: int) -> None:
+    if db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+@router.get("/users/{user_id}/followers", response_model=FollowListOut)
+def list_followers(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    after: int = Query(0, ge=0, description="курсор: id последнего пользователя с прошлой страницы"),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """
+    Подписчики по возрастанию id, keyset-пагинация. Страница и счётчик — из графа
+    подписок в памяти (бинарный поиск по строке), SQL только за именами.
+    """
+    _ensure_user(db, user_id)
+    follow_graph.ensure_loaded(db)
+    ids, next_after = follow_graph.followers_page(user_id, after=after, limit=limit)
+    total, _ = follow_graph.counts(user_id)
+    return _follow_list(db, current_user.id, ids, total, next_after)
+
+@router.get("/users/{user_id}/following", response_model=FollowListOut)
+def list_following(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    after: int = Query(0, ge=0, description="курсор: id последнего пользователя с прошлой страницы"),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """Подписки пользователя, как /followers."""
+    _ensure_user(db, user_id)
+    follow_graph.ensure_loaded(db)
+    ids, next_after = follow_graph.following_page(user_id, after=after, limit=limit)
+    _, total = follow_graph.counts(user_id)
+    return _follow_list(db, current_user.id, ids, total, next_after)
 
 # ---------- LIKE / UNLIKE ----------
 
@@ -58,7 +149,7 @@ def like_quiz(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id, models.Quiz.deleted_at.is_(None)).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
 
@@ -69,6 +160,7 @@ def like_quiz(
     )
     if not exists:
         db.add(models.Like(user_id=current_user.id, quiz_id=quiz_id))
+        notifications.emit(db, notifications.QUIZ_LIKED, current_user.id, user_id=quiz.owner_id, quiz_id=quiz_id)
         db.commit()
 
 @router.delete("/like/{quiz_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -146,7 +238,7 @@ def feed(
         .join(models.User, models.User.id == models.Quiz.owner_id)
         .outerjoin(like_counts_subq, like_counts_subq.c.quiz_id == models.Quiz.id)
         .outerjoin(liked_by_me_subq, liked_by_me_subq.c.quiz_id == models.Quiz.id)
-        .filter(models.Quiz.owner_id.in_(author_ids))
+        .filter(models.Quiz.owner_id.in_(author_ids), models.Quiz.deleted_at.is_(None))
         .order_by(models.Quiz.id.desc())
         .offset(skip)
         .limit(limit)
@@ -1,6 +1,13 @@
-from fastapi import APIRouter, Depends
-from ..deps import get_current_user
-from ..schemas import UserOut
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import PROVISIONING_TOKEN
+from ..deps import get_db, get_current_user
+from ..schemas import ProvisionedUser, RosterCreate, RosterOut, UserOut
+from ..services import accounts
 from .. import models
 
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
@@ -8,3 +15,35 @@ router = APIRouter(prefix="/api/v1/users", tags=["users"])
 @router.get("/me", response_model=UserOut)
 def read_users_me(current_user: models.User = Depends(get_current_user)):
     return current_user
+
+@router.post("/bulk", response_model=RosterOut, status_code=status.HTTP_201_CREATED)
+async def provision_roster(
+    payload: RosterCreate,
+    db: Session = Depends(get_db),
+    x_provisioning_token: str = Header("", alias="X-Provisioning-Token"),
+):
+    """
+    Список класса: тысячи аккаунтов с профилями одной транзакцией — все или никто.
+    Пароли без значения генерируются и возвращаются один раз. Доступ — по
+    QUIZOGRAM_PROVISIONING_TOKEN; то же из CSV: python -m app.services.accounts.
+    """
+    if not PROVISIONING_TOKEN or not secrets.compare_digest(x_provisioning_token, PROVISIONING_TOKEN):
+        raise HTTPException(status_code=403, detail="Provisioning is disabled or token is invalid")
+
+    new = [accounts.NewAccount(u.username, u.email, u.password) for u in payload.users]
+    try:
+        # хеши считаются в пуле хеширования; поток threadpool только ждёт их и пишет
+        created = await run_in_threadpool(accounts.provision, db, new)
+    except accounts.AccountExists as e:
+        raise HTTPException(status_code=409, detail={"field": e.field, "taken": e.values})
+
+    return RosterOut(
+        created=len(created),
+        users=[
+            ProvisionedUser(
+                id=uid, username=a.username, email=a.email,
+                password=a.password if src.password is None else None,
+            )
+            for (uid, a), src in zip(created, payload.users)
+        ],
+    )
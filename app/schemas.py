@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
+from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, computed_field
 from typing import List, Optional
 
 class UserCreate(BaseModel):
@@ -14,6 +15,24 @@ class UserOut(BaseModel):
     class Config:
         from_attributes = True  # Pydantic v2
 
+class RosterUser(BaseModel):
+    username: str = Field(..., min_length=3, max_length=50)
+    email: EmailStr
+    password: Optional[str] = Field(None, min_length=6, max_length=128)  # None — сгенерировать
+
+class RosterCreate(BaseModel):
+    users: List[RosterUser] = Field(..., min_items=1, max_items=5000)
+
+class ProvisionedUser(BaseModel):
+    id: int
+    username: str
+    email: str
+    password: Optional[str] = None  # только сгенерированный
+
+class RosterOut(BaseModel):
+    created: int
+    users: List[ProvisionedUser]
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -34,6 +53,8 @@ class QuestionCreate(BaseModel):
 class QuizCreate(BaseModel):
     title: str = Field(..., min_length=1, max_length=200)
     description: Optional[str] = None
+    thumbnail_key: Optional[str] = None  # встроенная обложка (см. /quizzes/thumbnails)
+    tags: List[str] = Field([], max_items=10)  # темы; регистр и пробелы нормализуются
     questions: List[QuestionCreate] = Field(..., min_items=1)
 
 # Out-схемы
@@ -51,15 +72,78 @@ class QuestionOut(BaseModel):
     class Config:
         from_attributes = True
 
+class MediaVariantOut(BaseModel):
+    size: int
+    format: str
+    filename: str = Field(..., exclude=True)
+
+    @computed_field
+    @property
+    def url(self) -> str:
+        return f"/media/{self.filename}"
+
+    class Config:
+        from_attributes = True
+
+class MediaOut(BaseModel):
+    id: int
+    kind: str
+    status: str  # pending — варианты ещё готовятся, клиенту отдаётся оригинал
+    content_type: str
+    size_bytes: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    filename: str = Field(..., exclude=True)
+    variants: List[MediaVariantOut] = []
+
+    @computed_field
+    @property
+    def url(self) -> str:
+        return f"/media/{self.filename}"
+
+    class Config:
+        from_attributes = True
+
+class QuizTagOut(BaseModel):
+    slug: str
+    name: str
+    class Config:
+        from_attributes = True
+
 class QuizOut(BaseModel):
     id: int
     title: str
     description: Optional[str]
     owner_id: int
+    created_at: Optional[datetime] = None
+    current_version_id: Optional[int] = None
+    thumbnail_key: Optional[str] = None
+    thumbnail: Optional[MediaOut] = None
+    tags: List[QuizTagOut] = []  # в снимках до появления тегов поля нет
     questions: List[QuestionOut]
+
+    # ссылки относительные: QuizOut кладётся в снимок версии, не зависящий от хоста
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        if self.thumbnail is not None:
+            return self.thumbnail.url
+        if self.thumbnail_key:
+            return f"/static/thumbs/{self.thumbnail_key}"
+        return None
+
     class Config:
         from_attributes = True
 
+class QuizThumbnailUpdate(BaseModel):
+    # одно из двух; оба пустые — убрать обложку
+    key: Optional[str] = None       # встроенная картинка (см. /quizzes/thumbnails)
+    media_id: Optional[int] = None  # загруженная через /media?kind=thumb
+
+class ThumbnailOption(BaseModel):
+    key: str
+    url: str
+
 
 class AttemptAnswerIn(BaseModel):
     question_id: int
@@ -67,11 +151,13 @@ class AttemptAnswerIn(BaseModel):
 
 class AttemptCreate(BaseModel):
     answers: List[AttemptAnswerIn] = Field(..., min_items=1)
+    version_id: Optional[int] = None  # версия, которую проходили; по умолчанию текущая
 
 class AttemptAnswerOut(BaseModel):
     question_id: int
     selected_option_index: int
     is_correct: bool
+    latency_ms: Optional[int] = None  # только у попыток через сессию
 
 class AttemptOut(BaseModel):
     id: int
@@ -80,15 +166,69 @@ class AttemptOut(BaseModel):
     score: int
     total: int
     created_at: Optional[str] = None
+    quiz_version_id: Optional[int] = None
+    duration_ms: Optional[int] = None
     answers: List[AttemptAnswerOut]
 
     class Config:
         from_attributes = True
 
+class BatchAttemptItem(BaseModel):
+    quiz_id: int
+    answers: List[AttemptAnswerIn] = Field(..., min_items=1)
+    version_id: Optional[int] = None  # версия, которую проходили офлайн; по умолчанию текущая
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=100)
+    completed_at: Optional[datetime] = None  # когда квиз пройден офлайн (не позже «сейчас»)
+
+class BatchAttemptCreate(BaseModel):
+    items: List[BatchAttemptItem] = Field(..., min_items=1, max_items=500)
+
+class BatchAttemptResult(BaseModel):
+    index: int  # позиция в items
+    idempotency_key: Optional[str] = None
+    status: str  # created | duplicate | error
+    attempt: Optional[AttemptOut] = None
+    error: Optional[str] = None
+
+class BatchAttemptOut(BaseModel):
+    created: int
+    duplicates: int
+    errors: int
+    results: List[BatchAttemptResult]
+
+class AttemptSessionOut(BaseModel):
+    session_id: str
+    quiz_id: int
+    quiz_version_id: int
+    started_at: datetime
+    expires_at: datetime
+
+class SessionAnswerOut(BaseModel):
+    question_id: int
+    is_correct: bool
+    latency_ms: int
+    answered: int  # сколько вопросов уже отвечено
+    total: int
+
 class LeaderboardRow(BaseModel):
     user_id: int
     best_score: int
     total: int
+    duration_ms: Optional[int] = None  # время лучшей попытки; при равном счёте быстрее — выше
+
+class QuestionStatsOut(BaseModel):
+    question_id: int
+    text: str
+    answered: int
+    correct: int
+    correct_rate: Optional[float] = None  # None, пока на вопрос никто не отвечал
+    option_picks: List[int]  # сколько раз выбран каждый вариант (по индексу)
+
+class QuizStatsOut(BaseModel):
+    quiz_id: int
+    attempts: int
+    avg_score: Optional[float] = None
+    questions: List[QuestionStatsOut]
 
 class FeedItem(BaseModel):
     quiz_id: int
@@ -102,9 +242,119 @@ class FeedItem(BaseModel):
     class Config:
         from_attributes = True
 
+class RecommendedQuiz(BaseModel):
+    quiz_id: int
+    title: str
+    description: Optional[str] = None
+    owner_id: int
+    owner_username: str
+    score: float  # 0 — запасной вариант (свежие квизы), когда рекомендовать не по чему
+
+class FollowSuggestion(BaseModel):
+    user_id: int
+    username: str
+    mutual_count: int  # сколько из тех, кого ты читаешь, подписаны на этого человека
+
+# ----- УВЕДОМЛЕНИЯ -----
+class NotificationOut(BaseModel):
+    id: int
+    kind: str  # quiz_published | quiz_liked | followed
+    actor_id: int
+    actor_username: Optional[str] = None
+    actor_count: int  # >1 — «alice и ещё N-1»
+    quiz_id: Optional[int] = None
+    quiz_title: Optional[str] = None  # None, если квиз удалён
+    created_at: Optional[datetime] = None
+    is_read: bool
+
+class NotificationPage(BaseModel):
+    items: List[NotificationOut]
+    unread: int
+    next_before: Optional[int] = None  # передать как ?before= для следующей страницы
+
+# ----- ПОВТОРЕНИЕ -----
+class PracticeCard(BaseModel):
+    quiz_id: int
+    quiz_title: str
+    question_id: int
+    text: str
+    options: List[AnswerOptionOut]  # без correct_option_index: ответ проверяет /practice/answer
+    due_at: datetime
+    reps: int     # правильных ответов подряд
+    lapses: int   # сколько раз ошибался
+
+class PracticeAnswer(BaseModel):
+    question_id: int
+    selected_option_index: int = Field(..., ge=0)
+
+class PracticeAnswerOut(BaseModel):
+    question_id: int
+    is_correct: bool
+    correct_option_index: int
+    next_due_at: Optional[datetime] = None  # None — карточки нет (ответ правильный и раньше ошибок не было)
+
+class FollowListItem(BaseModel):
+    user_id: int
+    username: str
+    is_following: bool  # подписан ли на него текущий пользователь
+    follows_me: bool    # подписан ли он на текущего пользователя
+
+class FollowListOut(BaseModel):
+    items: List[FollowListItem]
+    total: int
+    next_after: Optional[int] = None  # передать как ?after= для следующей страницы
+
+class TrendingQuiz(BaseModel):
+    rank: int
+    quiz_id: int
+    title: str
+    description: Optional[str] = None
+    owner_id: int
+    owner_username: str
+    created_at: Optional[datetime] = None
+    score: float  # затухающий счёт на момент последнего пересчёта
+
 class QuizUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=200)
     description: Optional[str] = None
+    tags: Optional[List[str]] = Field(None, max_items=10)  # заменяет весь набор; [] — снять все
+
+class TagOut(BaseModel):
+    slug: str
+    name: str
+    quiz_count: int
+    class Config:
+        from_attributes = True
+
+class QuizQuestionsUpdate(BaseModel):
+    questions: List[QuestionCreate] = Field(..., min_items=1)
+
+class ImportRowError(BaseModel):
+    line: int  # номер строки файла, с 1 (у CSV заголовок — строка 1)
+    error: str
+
+class QuestionImportOut(BaseModel):
+    id: int
+    quiz_id: int
+    format: str
+    mode: str
+    filename: Optional[str] = None
+    status: str  # pending | running | done | failed
+    bytes_total: int
+    bytes_done: int
+    rows_done: int
+    imported: int
+    error_count: int
+    errors: List[ImportRowError] = []  # первые IMPORT_MAX_ERRORS
+    version_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class QuizVersionOut(BaseModel):
+    id: int
+    version: int
+    created_at: Optional[datetime] = None
+    is_current: bool
 
 
 class ProfileOut(BaseModel):
@@ -115,6 +365,7 @@ class ProfileOut(BaseModel):
 class ProfileUpdate(BaseModel):
     bio: Optional[str] = Field(None, max_length=1000)
     avatar_key: Optional[str] = None  # имя файла из доступных (см. список)
+    avatar_media_id: Optional[int] = None  # загруженная через /media?kind=avatar
 
 class AvatarOption(BaseModel):
     key: str
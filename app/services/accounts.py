@@ -0,0 +1,179 @@
+"""
+Заведение аккаунтов: регистрация и массовое создание (списки класса).
+
+Уникальность username/email проверяет сама база: вставляем и ловим
+IntegrityError, без предварительного SELECT — гонка двух одинаковых
+регистраций больше не превращается в 500. Какое поле совпало, выясняется
+уже после отказа, одним запросом.
+
+Пароли хешируются в отдельном пуле потоков (core/security.hash_executor):
+pbkdf2 отпускает GIL, список класса хешируется на всех ядрах.
+
+Из CSV (username,email[,password]; без пароля — сгенерируется):
+    python -m app.services.accounts roster.csv [--out credentials.csv]
+"""
+import argparse
+import csv
+import secrets
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core.security import get_password_hash, hash_executor
+
+DEFAULT_AVATAR = "8bit_default.png"
+
+
+class AccountExists(ValueError):
+    def __init__(self, field: str, values: Iterable[str] = ()):
+        self.field = field  # "username" | "email"
+        self.values = list(values)
+        super().__init__(f"{field} already taken")
+
+
+class NewAccount(NamedTuple):
+    username: str
+    email: str
+    password: Optional[str] = None  # None — сгенерировать
+
+
+def generate_password() -> str:
+    return secrets.token_urlsafe(9)
+
+
+def _conflicts(db: Session, usernames: List[str], emails: List[str]) -> Optional[Tuple[str, List[str]]]:
+    """
+    Какие username/email уже заняты (после IntegrityError), включая дубли
+    внутри пакета. None — ни то ни другое: ошибка была про другое ограничение.
+    """
+    taken = {
+        u for (u,) in db.query(models.User.username).filter(models.User.username.in_(usernames))
+    }
+    seen = set()
+    for u in usernames:
+        if u in seen:
+            taken.add(u)
+        seen.add(u)
+    if taken:
+        return "username", sorted(taken)
+    taken = {e for (e,) in db.query(models.User.email).filter(models.User.email.in_(emails))}
+    seen = set()
+    for e in emails:
+        if e in seen:
+            taken.add(e)
+        seen.add(e)
+    return ("email", sorted(taken)) if taken else None
+
+
+def create_user(db: Session, username: str, email: str, hashed_password: str) -> models.User:
+    """Вставка одного пользователя; занятый username/email — AccountExists."""
+    user = models.User(username=username, email=email, hashed_password=hashed_password)
+    db.add(user)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        conflict = _conflicts(db, [username], [email])
+        if conflict is None:
+            raise
+        raise AccountExists(conflict[0])
+    db.refresh(user)
+    return user
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    return list(hash_executor().map(get_password_hash, passwords))
+
+
+def provision(db: Session, accounts: List[NewAccount]) -> List[Tuple[int, NewAccount]]:
+    """
+    Создаёт всех пользователей с профилями одной транзакцией: либо все, либо
+    никто (AccountExists со списком занятых значений). Возвращает (id, аккаунт)
+    с фактическими паролями — сгенерированные нужно отдать учителю.
+    """
+    accounts = [a if a.password else a._replace(password=generate_password()) for a in accounts]
+    hashes = hash_passwords([a.password for a in accounts])
+
+    rows = [
+        {"username": a.username, "email": a.email, "hashed_password": h}
+        for a, h in zip(accounts, hashes)
+    ]
+    try:
+        ids = list(db.scalars(
+            insert(models.User).returning(models.User.id, sort_by_parameter_order=True), rows,
+        ))
+        db.execute(models.Profile.__table__.insert(), [
+            {"user_id": uid, "avatar_key": DEFAULT_AVATAR, "bio": None} for uid in ids
+        ])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        conflict = _conflicts(db, [a.username for a in accounts], [a.email for a in accounts])
+        if conflict is None:
+            raise
+        raise AccountExists(*conflict)
+    return list(zip(ids, accounts))
+
+
+def read_roster(lines: Iterable[str]) -> List[NewAccount]:
+    out: List[NewAccount] = []
+    for row in csv.DictReader(lines):
+        out.append(NewAccount(
+            username=row["username"].strip(),
+            email=row["email"].strip(),
+            password=(row.get("password") or "").strip() or None,
+        ))
+    return out
+
+
+def main() -> None:
+    from pydantic import ValidationError
+
+    from ..database import SessionLocal, sync_schema
+    from ..schemas import RosterUser
+
+    parser = argparse.ArgumentParser(description="Массовое заведение аккаунтов из CSV")
+    parser.add_argument("roster", help="CSV с колонками username,email[,password]")
+    parser.add_argument("--out", default=None, help="куда записать логины и пароли (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    with open(args.roster, newline="", encoding="utf-8") as f:
+        accounts = read_roster(f)
+    errors: Dict[int, str] = {}
+    for i, a in enumerate(accounts, start=2):  # строка 1 — заголовок
+        try:
+            RosterUser(username=a.username, email=a.email, password=a.password)
+        except ValidationError as e:
+            errors[i] = "; ".join(err["msg"] for err in e.errors())
+    if errors:
+        for line, msg in errors.items():
+            print(f"line {line}: {msg}", file=sys.stderr)
+        raise SystemExit(1)
+
+    sync_schema()
+    db = SessionLocal()
+    try:
+        created = provision(db, accounts)
+    except AccountExists as e:
+        raise SystemExit(f"{e.field} already taken: {', '.join(e.values)}")
+    finally:
+        db.close()
+
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["id", "username", "email", "password"])
+        for uid, a in created:
+            writer.writerow([uid, a.username, a.email, a.password])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"created {len(created)} accounts", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
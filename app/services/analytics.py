@@ -0,0 +1,335 @@
+"""
+Аналитика для дашбордов: попытки по дням, доля завершённых, активные пользователи.
+
+Рабочую базу не трогаем запросами: сначала согласованный снимок через
+SQLite backup API шагами по BACKUP_PAGES страниц. Читающая блокировка
+держится только на время шага, между шагами пауза BACKUP_STEP_PAUSE —
+писатели проходят в неё и не ловят «database is locked». Запись другого
+соединения заставляет backup начать копию заново; таких перезапусков
+допускается MAX_BACKUP_RESTARTS, дальше снимок прерывается (SnapshotBusy) —
+экспорт стоит повторить в более тихое время. Затем таблицы
+attempts, attempt_answers, likes, follows выгружаются из снимка по колонкам
+в .npy. Отчёты открывают их через np.load(mmap_mode="r") и считают векторно
+(bincount / unique / searchsorted) — десятки миллионов строк за секунды.
+
+    python -m app.services.analytics export --out ./analytics [--db quizogram.db]
+    python -m app.services.analytics report --data ./analytics [--days 30] [--json report.json]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BACKUP_PAGES = 1024        # страниц за шаг backup (4 МБ при странице 4 КБ)
+BACKUP_STEP_PAUSE = 0.005  # секунд между шагами: окно для писателей
+MAX_BACKUP_RESTARTS = 20   # сколько раз чужая запись может перезапустить копию
+EXPORT_CHUNK = 200_000     # строк за fetchmany
+DAY = 86400
+
+_EPOCH = "COALESCE(CAST(strftime('%s', {}) AS INTEGER), 0)"
+
+# таблица -> [(колонка в .npy, SQL-выражение, dtype)]; строки по возрастанию id
+TABLES: Dict[str, List[Tuple[str, str, str]]] = {
+    "attempts": [
+        ("id", "id", "<i8"),
+        ("user_id", "user_id", "<i4"),
+        ("quiz_id", "quiz_id", "<i4"),
+        ("score", "score", "<i4"),
+        ("total", "total", "<i4"),
+        ("created_at", _EPOCH.format("created_at"), "<i8"),
+    ],
+    "attempt_answers": [
+        ("attempt_id", "attempt_id", "<i8"),
+        ("question_id", "question_id", "<i4"),
+        ("is_correct", "is_correct", "<i1"),
+    ],
+    "likes": [
+        ("user_id", "user_id", "<i4"),
+        ("quiz_id", "quiz_id", "<i4"),
+        ("created_at", _EPOCH.format("created_at"), "<i8"),
+    ],
+    "follows": [
+        ("follower_id", "follower_id", "<i4"),
+        ("following_id", "following_id", "<i4"),
+    ],
+}
+
+
+# ---------- снимок и выгрузка ----------
+
+def default_db_path() -> str:
+    from sqlalchemy.engine import make_url
+
+    from ..database import DATABASE_URL
+
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() != "sqlite" or not url.database:
+        raise SystemExit(f"analytics works with a SQLite file, got {DATABASE_URL}")
+    return url.database
+
+
+class SnapshotBusy(RuntimeError):
+    pass
+
+
+def snapshot(src: str, dest: str, pages: int = BACKUP_PAGES, max_restarts: int = MAX_BACKUP_RESTARTS) -> int:
+    """
+    Согласованная копия src в dest через backup API (src открывается только на
+    чтение). Возвращает число перезапусков; больше max_restarts — SnapshotBusy.
+    """
+    restarts = 0
+    last_remaining = None
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            # источник изменило другое соединение — backup пошёл с первой страницы
+            restarts += 1
+            if restarts > max_restarts:
+                raise SnapshotBusy(f"snapshot restarted {restarts} times because of concurrent writes")
+        last_remaining = remaining
+        time.sleep(BACKUP_STEP_PAUSE)
+
+    source = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+    target = sqlite3.connect(dest)
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=BACKUP_STEP_PAUSE)
+    finally:
+        target.close()
+        source.close()
+    return restarts
+
+
+def _export_table(conn: sqlite3.Connection, table: str, out_dir: Path) -> int:
+    columns = TABLES[table]
+    n = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    table_dir = out_dir / table
+    table_dir.mkdir(parents=True, exist_ok=True)
+    arrays = [
+        np.lib.format.open_memmap(table_dir / f"{name}.npy", mode="w+", dtype=dtype, shape=(n,))
+        for name, _, dtype in columns
+    ]
+    cur = conn.execute(f"SELECT {', '.join(expr for _, expr, _ in columns)} FROM {table} ORDER BY id")
+    at = 0
+    while at < n:
+        rows = cur.fetchmany(EXPORT_CHUNK)
+        if not rows:
+            break
+        # снимок неизменен, но страхуемся от расхождения с COUNT
+        rows = rows[:n - at]
+        block = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * len(columns))
+        block = block.reshape(-1, len(columns))
+        for j, arr in enumerate(arrays):
+            arr[at:at + len(rows)] = block[:, j]
+        at += len(rows)
+    for arr in arrays:
+        arr.flush()
+    return at
+
+
+def export(out_dir: str, db_path: Optional[str] = None, keep_snapshot: bool = False) -> Dict:
+    """Снимок базы + выгрузка таблиц в out_dir/<table>/<column>.npy и manifest.json."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    snap = out / "snapshot.db"
+    if snap.exists():
+        snap.unlink()
+
+    t0 = time.perf_counter()
+    restarts = snapshot(db_path or default_db_path(), str(snap))
+    t1 = time.perf_counter()
+    conn = sqlite3.connect(f"file:{snap}?mode=ro", uri=True)
+    try:
+        rows = {table: _export_table(conn, table, out) for table in TABLES}
+    finally:
+        conn.close()
+    t2 = time.perf_counter()
+    if not keep_snapshot:
+        os.remove(snap)
+
+    manifest = {
+        "snapshot_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": rows,
+        "snapshot_seconds": round(t1 - t0, 2),
+        "snapshot_restarts": restarts,
+        "export_seconds": round(t2 - t1, 2),
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def load(data_dir: str) -> Dict[str, Dict[str, np.ndarray]]:
+    base = Path(data_dir)
+    return {
+        table: {name: np.load(base / table / f"{name}.npy", mmap_mode="r") for name, _, _ in columns}
+        for table, columns in TABLES.items()
+    }
+
+
+# ---------- отчёты ----------
+
+def _day_user_keys(days: np.ndarray, users: np.ndarray) -> np.ndarray:
+    return (days.astype(np.int64) << 32) | users.astype(np.int64)
+
+
+def _distinct_sorted(values: np.ndarray) -> np.ndarray:
+    # np.unique в NumPy 2 идёт через хеш-таблицу и на десятках миллионов
+    # int64 заметно медленнее, чем sort + сравнение с соседом
+    values = np.sort(values)
+    if len(values):
+        values = values[np.concatenate(([True], values[1:] != values[:-1]))]
+    return values
+
+
+def _active(keys: np.ndarray, first_day: int, last_day: int) -> int:
+    """Уникальные пользователи в ключах (день << 32 | user) за дни [first_day, last_day]."""
+    lo = np.searchsorted(keys, first_day << 32)
+    hi = np.searchsorted(keys, (last_day + 1) << 32)
+    users = keys[lo:hi] & 0xFFFFFFFF
+    if not len(users):
+        return 0
+    seen = np.zeros(int(users.max()) + 1, dtype=bool)
+    seen[users] = True
+    return int(seen.sum())
+
+
+def report(data: Dict[str, Dict[str, np.ndarray]], days: int = 30) -> Dict:
+    """Стандартные отчёты за последние days дней (по последнему дню с активностью)."""
+    at, aa, lk, fl = data["attempts"], data["attempt_answers"], data["likes"], data["follows"]
+
+    # завершённость: ответов в попытке не меньше, чем вопросов в версии.
+    # id попыток плотные, так что счётчик по id — один bincount, без сортировок
+    answered = np.zeros(len(at["id"]), dtype=np.int64)
+    if len(aa["attempt_id"]) and len(at["id"]):
+        per_id = np.bincount(aa["attempt_id"], minlength=int(at["id"][-1]) + 1)
+        answered = per_id[at["id"]]
+    total = np.asarray(at["total"])
+    completed = (total > 0) & (answered >= total)
+    score_rate = np.divide(at["score"], total, out=np.zeros(len(total)), where=total > 0)
+
+    a_day = np.asarray(at["created_at"]) // DAY
+    l_day = np.asarray(lk["created_at"]) // DAY
+    a_ok, l_ok = a_day > 0, l_day > 0
+    known_days = np.concatenate([a_day[a_ok], l_day[l_ok]])
+    if not len(known_days):
+        return {"days": [], "summary": {"attempts": int(len(a_day)), "likes": int(len(l_day))}}
+    last_day = int(known_days.max())
+    first_day = max(int(known_days.min()), last_day - days + 1)
+
+    span = last_day - first_day + 1
+    in_a = a_ok & (a_day >= first_day)
+    in_l = l_ok & (l_day >= first_day)
+    ai = (a_day[in_a] - first_day).astype(np.int64)
+    li = (l_day[in_l] - first_day).astype(np.int64)
+    attempts_per_day = np.bincount(ai, minlength=span)
+    completed_per_day = np.bincount(ai, weights=completed[in_a], minlength=span)
+    score_per_day = np.bincount(ai, weights=score_rate[in_a], minlength=span)
+    likes_per_day = np.bincount(li, minlength=span)
+
+    # активные: попытка или лайк за день; ключи только за окно отчёта и MAU
+    lo_day = min(first_day, last_day - 29)
+    a_win = a_ok & (a_day >= lo_day)
+    l_win = l_ok & (l_day >= lo_day)
+    keys = _distinct_sorted(np.concatenate([
+        _day_user_keys(a_day[a_win], np.asarray(at["user_id"])[a_win]),
+        _day_user_keys(l_day[l_win], np.asarray(lk["user_id"])[l_win]),
+    ]))
+    key_days = keys >> 32
+    dau = np.bincount((key_days[key_days >= first_day] - first_day).astype(np.int64), minlength=span)
+
+    rows = []
+    for i in range(span):
+        n = int(attempts_per_day[i])
+        rows.append({
+            "date": datetime.fromtimestamp((first_day + i) * DAY, tz=timezone.utc).date().isoformat(),
+            "attempts": n,
+            "completion_rate": round(float(completed_per_day[i]) / n, 4) if n else None,
+            "avg_score_rate": round(float(score_per_day[i]) / n, 4) if n else None,
+            "likes": int(likes_per_day[i]),
+            "active_users": int(dau[i]),
+        })
+
+    window_quizzes = np.asarray(at["quiz_id"])[in_a]
+    top: List[Dict] = []
+    if len(window_quizzes):
+        counts = np.bincount(window_quizzes)
+        k = min(10, int((counts > 0).sum()))
+        best = np.argpartition(-counts, k - 1)[:k]
+        best = best[np.lexsort((best, -counts[best]))]
+        top = [{"quiz_id": int(q), "attempts": int(counts[q])} for q in best]
+
+    followers = np.bincount(fl["following_id"]) if len(fl["following_id"]) else np.zeros(0, dtype=np.int64)
+    summary = {
+        "from": rows[0]["date"],
+        "to": rows[-1]["date"],
+        "attempts": int(in_a.sum()),
+        "completion_rate": round(float(completed[in_a].mean()), 4) if in_a.any() else None,
+        "dau": int(dau[-1]),
+        "wau": _active(keys, last_day - 6, last_day),
+        "mau": _active(keys, last_day - 29, last_day),
+        "likes": int(in_l.sum()),
+        "follows_total": int(len(fl["follower_id"])),
+        "max_followers": int(followers.max()) if len(followers) else 0,
+        "top_quizzes": top,
+    }
+    return {"days": rows, "summary": summary}
+
+
+def _print_report(result: Dict) -> None:
+    print(f"{'date':<12}{'attempts':>10}{'completed':>11}{'avg score':>11}{'likes':>8}{'active':>8}")
+    for r in result["days"]:
+        comp = f"{r['completion_rate']:.1%}" if r["completion_rate"] is not None else "-"
+        score = f"{r['avg_score_rate']:.1%}" if r["avg_score_rate"] is not None else "-"
+        print(f"{r['date']:<12}{r['attempts']:>10}{comp:>11}{score:>11}{r['likes']:>8}{r['active_users']:>8}")
+    s = result["summary"]
+    print()
+    for key in ("from", "to", "attempts", "completion_rate", "dau", "wau", "mau", "likes",
+                "follows_total", "max_followers"):
+        if key in s:
+            print(f"{key:>16}: {s[key]}")
+    for row in s.get("top_quizzes", []):
+        print(f"{'top quiz':>16}: #{row['quiz_id']} — {row['attempts']} attempts")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Аналитика Quizogram по снимку базы")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="снимок базы и выгрузка таблиц в .npy")
+    p_export.add_argument("--out", default="./analytics")
+    p_export.add_argument("--db", default=None, help="файл SQLite (по умолчанию из QUIZOGRAM_DATABASE_URL)")
+    p_export.add_argument("--keep-snapshot", action="store_true")
+
+    p_report = sub.add_parser("report", help="отчёты по выгрузке")
+    p_report.add_argument("--data", default="./analytics")
+    p_report.add_argument("--days", type=int, default=30)
+    p_report.add_argument("--json", dest="json_path", default=None, help="куда сохранить отчёт")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        try:
+            manifest = export(args.out, args.db, keep_snapshot=args.keep_snapshot)
+        except SnapshotBusy as e:
+            raise SystemExit(f"export aborted: {e}")
+        print(json.dumps(manifest, indent=2))
+        return
+
+    t0 = time.perf_counter()
+    result = report(load(args.data), days=args.days)
+    elapsed = time.perf_counter() - t0
+    _print_report(result)
+    print(f"\nreport computed in {elapsed:.2f}s")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Попытки с таймингом: сессия на сервере от «старт» до «готово».
+
+POST /attempts/{quiz_id}/start заводит строку attempt_sessions с версией
+квиза; каждый ответ проверяется по ключу ответов из кэша quiz_versions
+(без запросов по вопросам) и дописывается в упакованный массив ANSWER_DTYPE
+(11 байт на ответ) вместе с задержкой — временем от старта или предыдущего
+ответа. Запись ответа — один UPDATE с условием на last_ms: два параллельных
+ответа в одну сессию не затрут друг друга, второй получит SessionConflict.
+
+finish() пишет Attempt и все ответы одной транзакцией (executemany) и
+удаляет сессию; duration_ms попытки — сумма задержек, тай-брейк лидерборда.
+Незавершённые сессии живут ATTEMPT_SESSION_TTL_SECONDS от старта, потом их
+удаляет фоновая задача purge_expired().
+"""
+import secrets
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core.config import ATTEMPT_SESSION_TTL_SECONDS
+from . import quiz_stats, quiz_versions, review_queue
+
+ANSWER_DTYPE = np.dtype([
+    ("question_id", "<i4"),
+    ("option", "<i2"),
+    ("correct", "u1"),
+    ("latency_ms", "<i4"),
+])
+
+
+class SessionExpired(ValueError):
+    pass
+
+
+class SessionConflict(ValueError):
+    """Сессию изменил параллельный запрос (ответ или завершение)."""
+
+
+class InvalidAnswer(ValueError):
+    pass
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob or b"", dtype=ANSWER_DTYPE)
+
+
+def start(db: Session, user_id: int, quiz_id: int, version_id: int) -> models.AttemptSession:
+    """Новая сессия по версии квиза; чужая или пустая версия — InvalidAnswer."""
+    key = quiz_versions.answer_key(db, version_id)
+    if key is None or key.quiz_id != quiz_id:
+        raise InvalidAnswer(f"Version {version_id} doesn't belong to quiz {quiz_id}")
+    if not key.total:
+        raise InvalidAnswer("Quiz has no questions")
+    ts = now_ms()
+    session = models.AttemptSession(
+        id=secrets.token_urlsafe(16),
+        user_id=user_id,
+        quiz_id=quiz_id,
+        quiz_version_id=version_id,
+        started_ms=ts,
+        last_ms=ts,
+        expires_at=ts // 1000 + ATTEMPT_SESSION_TTL_SECONDS,
+        answers=b"",
+    )
+    db.add(session)
+    db.commit()
+    return session
+
+
+def get(db: Session, session_id: str, user_id: int) -> Optional[models.AttemptSession]:
+    """Сессия пользователя; истёкшая — SessionExpired (задача могла ещё не удалить её)."""
+    session = db.get(models.AttemptSession, session_id)
+    if session is None or session.user_id != user_id:
+        return None
+    if session.expires_at <= time.time():
+        raise SessionExpired("Attempt session expired")
+    return session
+
+
+def answer(
+    db: Session, session: models.AttemptSession, question_id: int, option: int,
+) -> Tuple[bool, int, int, int]:
+    """
+    Записывает ответ. Возвращает (is_correct, latency_ms, отвечено, всего).
+    Коммитит; при гонке с другим запросом — SessionConflict.
+    """
+    key = quiz_versions.answer_key(db, session.quiz_version_id)
+    if question_id not in key.correct:
+        raise InvalidAnswer(f"Question {question_id} doesn't belong to quiz {session.quiz_id}")
+    if option < 0 or option >= key.options[question_id]:
+        raise InvalidAnswer(f"Question {question_id}: selected_option_index out of range")
+    answers = decode(session.answers)
+    if (answers["question_id"] == question_id).any():
+        raise InvalidAnswer(f"Duplicate answer for question {question_id}")
+
+    prev = session.last_ms
+    ts = max(now_ms(), prev + 1)  # last_ms — ещё и версия строки, должна вырасти
+    row = np.zeros(1, dtype=ANSWER_DTYPE)
+    row["question_id"] = question_id
+    row["option"] = option
+    row["correct"] = option == key.correct[question_id]
+    row["latency_ms"] = ts - prev
+    blob = session.answers + row.tobytes()
+
+    t = models.AttemptSession
+    updated = db.execute(
+        update(t)
+        .where(t.id == session.id, t.last_ms == prev)
+        .values(answers=blob, last_ms=ts)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.rollback()
+        raise SessionConflict("Attempt session was modified concurrently")
+    db.commit()
+    return bool(row["correct"][0]), ts - prev, len(answers) + 1, key.total
+
+
+def finish(db: Session, session: models.AttemptSession) -> Tuple[models.Attempt, np.ndarray]:
+    """
+    Превращает сессию в попытку: Attempt и ответы с задержками одной
+    транзакцией, статистика и очередь повторения — в ней же. Сессия удаляется
+    с условием на last_ms, так что повторное или параллельное завершение
+    получит SessionConflict, а не вторую попытку.
+    """
+    answers = decode(session.answers)
+    key = quiz_versions.answer_key(db, session.quiz_version_id)
+    t = models.AttemptSession
+    removed = db.execute(
+        delete(t)
+        .where(t.id == session.id, t.last_ms == session.last_ms)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not removed:
+        db.rollback()
+        raise SessionConflict("Attempt session was modified concurrently")
+
+    attempt = models.Attempt(
+        user_id=session.user_id,
+        quiz_id=session.quiz_id,
+        score=int(answers["correct"].sum()),
+        total=key.total,
+        quiz_version_id=session.quiz_version_id,
+        duration_ms=int(answers["latency_ms"].sum()),
+    )
+    db.add(attempt)
+    db.flush()
+
+    rows = [
+        {
+            "attempt_id": attempt.id,
+            "question_id": qid,
+            "selected_option_index": opt,
+            "is_correct": ok,
+            "latency_ms": latency,
+        }
+        for qid, opt, ok, latency in answers.tolist()
+    ]
+    if rows:
+        db.execute(models.AttemptAnswer.__table__.insert(), rows)
+    quiz_stats.record_attempt(
+        db, session.quiz_id, attempt.score,
+        ((r["question_id"], r["selected_option_index"], r["is_correct"]) for r in rows),
+    )
+    review_queue.record_attempt(
+        db, session.user_id, session.quiz_id, ((r["question_id"], r["is_correct"]) for r in rows),
+    )
+    db.expunge(session)
+    db.commit()
+    db.refresh(attempt)
+    return attempt, answers
+
+
+def purge_expired(db: Session) -> int:
+    """Фоновая задача: удаляет брошенные сессии. Возвращает число удалённых."""
+    removed = db.execute(
+        delete(models.AttemptSession).where(models.AttemptSession.expires_at <= int(time.time()))
+    ).rowcount
+    db.commit()
+    return removed
@@ -0,0 +1,16 @@
+"""Выгрузка результатов запросов сразу в NumPy-массивы (для офлайн-пересчётов)."""
+from itertools import chain
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+
+def fetch_int_array(db: Session, stmt, ncols: int) -> np.ndarray:
+    """
+    Целочисленный результат запроса как массив (n, ncols).
+    np.asarray по списку Row идёт через медленный __getitem__ на каждую ячейку,
+    поэтому разворачиваем строки в плоский итератор и собираем fromiter.
+    """
+    rows = db.execute(stmt).all()
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * ncols)
+    return flat.reshape(-1, ncols)
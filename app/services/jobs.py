@@ -0,0 +1,81 @@
+"""
+Простейший планировщик фоновых задач: каждая задача крутится в своём
+daemon-потоке с собственной сессией БД. Плюс курсоры (водяные знаки)
+в таблице job_cursors для инкрементальной обработки.
+"""
+import logging
+import threading
+from typing import Callable, Dict, List
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+
+logger = logging.getLogger("quizogram.jobs")
+
+
+def get_cursor(db: Session, job: str, name: str) -> int:
+    row = db.get(models.JobCursor, (job, name))
+    return row.value if row else 0
+
+
+def set_cursor(db: Session, job: str, name: str, value: int) -> None:
+    row = db.get(models.JobCursor, (job, name))
+    if row is None:
+        db.add(models.JobCursor(job=job, name=name, value=value))
+    else:
+        row.value = value
+
+
+class PeriodicJob:
+    def __init__(self, name: str, interval_seconds: float, fn: Callable[[Session], object]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.fn = fn
+
+    def run_once(self) -> None:
+        db = SessionLocal()
+        try:
+            self.fn(db)
+        except Exception:
+            db.rollback()
+            logger.exception("background job %s failed", self.name)
+        finally:
+            db.close()
+
+
+class JobRunner:
+    def __init__(self):
+        self._jobs: List[PeriodicJob] = []
+        self._threads: Dict[str, threading.Thread] = {}
+        self._stop = threading.Event()
+
+    def register(self, name: str, interval_seconds: float, fn: Callable[[Session], object]) -> None:
+        # повторная регистрация (приложение собрано заново) заменяет задачу, а не дублирует
+        self._jobs = [j for j in self._jobs if j.name != name]
+        self._jobs.append(PeriodicJob(name, interval_seconds, fn))
+
+    def start(self) -> None:
+        self._stop.clear()
+        for job in self._jobs:
+            if job.name in self._threads:
+                continue
+            t = threading.Thread(target=self._loop, args=(job,), name=f"job-{job.name}", daemon=True)
+            self._threads[job.name] = t
+            t.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for t in self._threads.values():
+            t.join(timeout)
+        self._threads.clear()
+
+    def _loop(self, job: PeriodicJob) -> None:
+        # первый прогон сразу после старта, дальше — по расписанию
+        while not self._stop.is_set():
+            job.run_once()
+            self._stop.wait(job.interval_seconds)
+
+
+runner = JobRunner()
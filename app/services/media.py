@@ -0,0 +1,323 @@
+"""
+Медиа-конвейер: обложки квизов и аватарки.
+
+Загрузка пишется на диск кусками по MEDIA_UPLOAD_CHUNK_BYTES, sha256 считается
+на лету — целиком файл в памяти не держится. Готовый файл переименовывается
+в <sha256>.<ext>, после чего пул процессов нарезает квадратные варианты
+фиксированных размеров в WebP и PNG. Варианты тоже названы по хешу
+содержимого, поэтому /media/* отдаётся с вечным кэшем (immutable).
+
+Pillow — необязательная зависимость: без неё варианты не строятся,
+а клиенты получают оригинал.
+"""
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import AsyncIterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from ..core.config import MEDIA_DIR, MEDIA_MAX_UPLOAD_BYTES, MEDIA_WORKERS
+from ..database import SessionLocal
+
+# сам Pillow импортируется только в процессах пула
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+logger = logging.getLogger("quizogram.media")
+
+VARIANT_SIZES = {"thumb": (640, 320, 160), "avatar": (256, 128, 64)}  # по убыванию
+VARIANT_FORMATS = ("webp", "png")
+MAX_IMAGE_PIXELS = 40_000_000  # больше — отказ (защита от «бомб» распаковки)
+
+# Сигнатуры форматов: заголовку Content-Type клиента не доверяем
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"GIF87a", "image/gif", "gif"),
+    (b"GIF89a", "image/gif", "gif"),
+)
+_SNIFF_BYTES = 12
+
+
+class MediaTooLarge(ValueError):
+    pass
+
+
+class UnsupportedMedia(ValueError):
+    pass
+
+
+class StoredFile(NamedTuple):
+    sha256: str
+    filename: str
+    content_type: str
+    size_bytes: int
+
+
+def sniff(head: bytes) -> Optional[Tuple[str, str]]:
+    """(content_type, расширение) по первым байтам файла."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    for magic, content_type, ext in _SIGNATURES:
+        if head.startswith(magic):
+            return content_type, ext
+    return None
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_stream(chunks: AsyncIterable[bytes]) -> StoredFile:
+    """
+    Пишет поток во временный файл, проверяя лимит и сигнатуру, и кладёт
+    его в MEDIA_DIR под именем по sha256. Одинаковое содержимое даёт то же имя.
+    """
+    tmp_dir = MEDIA_DIR / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    detected = None
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > MEDIA_MAX_UPLOAD_BYTES:
+                    raise MediaTooLarge(f"File is larger than {MEDIA_MAX_UPLOAD_BYTES} bytes")
+                if detected is None and len(head) < _SNIFF_BYTES:
+                    head += chunk[:_SNIFF_BYTES - len(head)]
+                    if len(head) >= _SNIFF_BYTES:
+                        detected = sniff(head)
+                        if detected is None:
+                            raise UnsupportedMedia("Only PNG, JPEG, GIF and WebP images are accepted")
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+        if detected is None:
+            raise UnsupportedMedia("Only PNG, JPEG, GIF and WebP images are accepted")
+        content_type, ext = detected
+        sha = digest.hexdigest()
+        filename = f"{sha}.{ext}"
+        os.replace(tmp_path, MEDIA_DIR / filename)
+    except BaseException:
+        _unlink_quietly(tmp_path)
+        raise
+    return StoredFile(sha, filename, content_type, size)
+
+
+def register(db: Session, owner_id: int, kind: str, stored: StoredFile) -> Tuple[models.MediaAsset, bool]:
+    """Запись об ассете; повторная загрузка того же файла вернёт существующую."""
+    def existing():
+        return (
+            db.query(models.MediaAsset)
+              .filter(
+                  models.MediaAsset.owner_id == owner_id,
+                  models.MediaAsset.kind == kind,
+                  models.MediaAsset.sha256 == stored.sha256,
+              )
+              .first()
+        )
+
+    asset = existing()
+    if asset is not None:
+        return asset, False
+    asset = models.MediaAsset(
+        owner_id=owner_id,
+        kind=kind,
+        sha256=stored.sha256,
+        filename=stored.filename,
+        content_type=stored.content_type,
+        size_bytes=stored.size_bytes,
+        status="pending" if HAS_PILLOW else "ready",
+    )
+    db.add(asset)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # параллельная загрузка того же файла
+        return existing(), False
+    db.refresh(asset)
+    return asset, True
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_dir = os.path.join(os.path.dirname(path), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _unlink_quietly(tmp_path)
+        raise
+
+
+def render_variants(
+    src_path: str, out_dir: str, sizes: Sequence[int], formats: Sequence[str],
+) -> Tuple[int, int, List[Tuple[int, str, str, int]]]:
+    """
+    Выполняется в процессе пула. Возвращает (ширина, высота, [(size, format, filename, bytes)]).
+    Каждый следующий (меньший) размер режется из предыдущего, а не из оригинала.
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    warnings.simplefilter("error", Image.DecompressionBombWarning)
+    with Image.open(src_path) as im:
+        width, height = im.size
+        im.draft("RGB", (sizes[0], sizes[0]))  # JPEG декодируется сразу в уменьшенном масштабе
+        frame = ImageOps.exif_transpose(im).convert("RGBA")
+    if (frame.width > frame.height) != (width > height):
+        width, height = height, width  # поворот по EXIF
+
+    # мелкие картинки не растягиваем; самый маленький вариант делаем всегда
+    short_side = min(width, height)
+    wanted = [s for s in sizes if s <= short_side] or [sizes[-1]]
+
+    out = []
+    base = frame
+    for size in wanted:
+        base = ImageOps.fit(base, (size, size), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            buf = BytesIO()
+            if fmt == "webp":
+                base.save(buf, "WEBP", quality=82, method=4)
+            else:
+                base.save(buf, "PNG", optimize=True)
+            data = buf.getvalue()
+            filename = f"{hashlib.sha256(data).hexdigest()}.{fmt}"
+            path = os.path.join(out_dir, filename)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+            out.append((size, fmt, filename, len(data)))
+    return width, height, out
+
+
+class MediaPipeline:
+    """Пул процессов для нарезки вариантов; результат пишется в БД из колбэка."""
+
+    def __init__(self, workers: int = MEDIA_WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight: Set[int] = set()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn, а не fork: в процессе API уже крутятся потоки
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def submit(self, asset: models.MediaAsset) -> bool:
+        if not HAS_PILLOW or asset.status != "pending":
+            return False
+        asset_id = asset.id
+        with self._lock:
+            if asset_id in self._inflight:
+                return False
+            self._inflight.add(asset_id)
+        try:
+            pool = self._executor()
+            future = pool.submit(
+                render_variants,
+                str(MEDIA_DIR / asset.filename),
+                str(MEDIA_DIR),
+                VARIANT_SIZES[asset.kind],
+                VARIANT_FORMATS,
+            )
+        except Exception:
+            with self._lock:
+                self._inflight.discard(asset_id)
+            raise
+        future.add_done_callback(lambda f: self._finish(asset_id, pool, f))
+        return True
+
+    def _finish(self, asset_id: int, pool: ProcessPoolExecutor, future: Future) -> None:
+        from . import quiz_versions
+
+        db = SessionLocal()
+        try:
+            asset = db.get(models.MediaAsset, asset_id)
+            if asset is None:
+                return
+            try:
+                width, height, variants = future.result()
+            except BrokenProcessPool:
+                # упал процесс пула: пул пересоздаём, ассет остаётся pending до следующего прохода
+                logger.error("media %s: worker process died, will retry", asset_id)
+                self._discard(pool)
+                return
+            except Exception:
+                logger.exception("media %s: failed to render variants", asset_id)
+                asset.status = "failed"
+                db.commit()
+                return
+            asset.width, asset.height = width, height
+            asset.variants = [
+                models.MediaVariant(size=size, format=fmt, filename=filename, size_bytes=nbytes)
+                for size, fmt, filename, nbytes in sorted(variants)
+            ]
+            asset.status = "ready"
+            db.flush()
+            # в снимках квизов с этой обложкой должны появиться варианты
+            for quiz in (
+                db.query(models.Quiz)
+                  .filter(
+                      models.Quiz.thumbnail_media_id == asset_id,
+                      models.Quiz.current_version_id.isnot(None),
+                      models.Quiz.deleted_at.is_(None),
+                  )
+            ):
+                quiz_versions.publish(db, quiz)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("media %s: failed to store variants", asset_id)
+        finally:
+            db.close()
+            with self._lock:
+                self._inflight.discard(asset_id)
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+pipeline = MediaPipeline()
+
+
+def process_pending(db: Session) -> int:
+    """Фоновая задача: ассеты, не обработанные до рестарта. Возвращает число отправленных в пул."""
+    if not HAS_PILLOW:
+        return 0
+    pending = db.query(models.MediaAsset).filter(models.MediaAsset.status == "pending").all()
+    return sum(pipeline.submit(asset) for asset in pending)
@@ -0,0 +1,182 @@
+"""
+Уведомления: новый квиз автора, на которого подписан; лайк моего квиза; новый подписчик.
+
+Роутеры только пишут событие (emit) в транзакции действия — запрос не ждёт
+рассылки. Фоновая задача fan_out() читает notification_events по водяному
+знаку и пишет в notifications:
+- лайки и подписки пакета группируются по (адресат, вид, квиз):
+  одна строка «N человек лайкнули ваш квиз», actor_count = N;
+- новый квиз рассылается подписчикам автора пакетами по FANOUT_BATCH
+  (keyset по follower_id), у каждого пакета своя транзакция, позиция внутри
+  события — во втором курсоре, так что рестарт продолжает с того же места.
+
+Непрочитанное — счётчик notification_counters, увеличивается той же
+транзакцией, что пишет уведомления; COUNT по notifications не нужен.
+Обработанные события удаляются, notifications только дописываются.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from .jobs import get_cursor, set_cursor
+
+JOB = "notifications"
+EVENT_BATCH = 1000
+FANOUT_BATCH = 1000
+
+QUIZ_PUBLISHED = "quiz_published"
+QUIZ_LIKED = "quiz_liked"
+FOLLOWED = "followed"
+
+
+def emit(
+    db: Session,
+    kind: str,
+    actor_id: int,
+    user_id: Optional[int] = None,
+    quiz_id: Optional[int] = None,
+) -> None:
+    """Событие для рассылки. Не коммитит — пишется вместе с самим действием."""
+    if user_id is not None and user_id == actor_id:
+        return  # свой квиз лайкать можно, но уведомлять себя незачем
+    db.add(models.NotificationEvent(kind=kind, actor_id=actor_id, user_id=user_id, quiz_id=quiz_id))
+
+
+def _bump_unread(db: Session, per_user: Dict[int, int]) -> None:
+    if not per_user:
+        return
+    stmt = insert(models.NotificationCounter)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"unread": models.NotificationCounter.unread + stmt.excluded.unread},
+    )
+    db.execute(stmt, [{"user_id": u, "unread": n, "last_read_id": 0} for u, n in per_user.items()])
+
+
+def _advance(db: Session, event_id: int, recipient: int = 0) -> None:
+    set_cursor(db, JOB, "events", event_id)
+    set_cursor(db, JOB, "recipient", recipient)
+    if not recipient:
+        db.execute(delete(models.NotificationEvent).where(models.NotificationEvent.id <= event_id))
+
+
+def _flush_grouped(db: Session, events: List) -> int:
+    """Лайки и подписки подряд идущих событий — одной транзакцией, со склейкой повторов."""
+    if not events:
+        return 0
+    groups: Dict[Tuple[int, str, Optional[int]], Tuple[set, int]] = {}
+    for ev in events:
+        actors, _ = groups.get((ev.user_id, ev.kind, ev.quiz_id), (set(), 0))
+        actors.add(ev.actor_id)
+        groups[(ev.user_id, ev.kind, ev.quiz_id)] = (actors, ev.actor_id)
+
+    rows = [
+        {"user_id": u, "kind": k, "quiz_id": q, "actor_id": last, "actor_count": len(actors)}
+        for (u, k, q), (actors, last) in groups.items()
+    ]
+    per_user: Dict[int, int] = {}
+    for r in rows:
+        per_user[r["user_id"]] = per_user.get(r["user_id"], 0) + 1
+    db.execute(models.Notification.__table__.insert(), rows)
+    _bump_unread(db, per_user)
+    _advance(db, events[-1].id)
+    db.commit()
+    return len(rows)
+
+
+def _fan_out_published(db: Session, ev, batch_size: int) -> int:
+    """Новый квиз — всем подписчикам автора, пакетами; каждый пакет двигает курсор."""
+    quiz_alive = db.execute(
+        select(models.Quiz.id).where(models.Quiz.id == ev.quiz_id, models.Quiz.deleted_at.is_(None))
+    ).first()
+    if quiz_alive is None:
+        _advance(db, ev.id)
+        db.commit()
+        return 0
+
+    written = 0
+    after = get_cursor(db, JOB, "recipient")
+    while True:
+        followers = list(db.execute(
+            select(models.Follow.follower_id)
+            .where(models.Follow.following_id == ev.actor_id, models.Follow.follower_id > after)
+            .order_by(models.Follow.follower_id)
+            .limit(batch_size)
+        ).scalars())
+        if followers:
+            db.execute(models.Notification.__table__.insert(), [
+                {"user_id": f, "kind": ev.kind, "quiz_id": ev.quiz_id, "actor_id": ev.actor_id, "actor_count": 1}
+                for f in followers
+            ])
+            _bump_unread(db, dict.fromkeys(followers, 1))
+            written += len(followers)
+            after = followers[-1]
+        done = len(followers) < batch_size
+        _advance(db, ev.id if done else ev.id - 1, 0 if done else after)
+        db.commit()
+        if done:
+            return written
+
+
+def fan_out(db: Session, event_batch: int = EVENT_BATCH, fanout_batch: int = FANOUT_BATCH) -> int:
+    """Фоновая задача: раскладывает новые события. Возвращает число записанных уведомлений."""
+    e = models.NotificationEvent
+    written = 0
+    while True:
+        events = db.execute(
+            select(e.id, e.kind, e.actor_id, e.user_id, e.quiz_id)
+            .where(e.id > get_cursor(db, JOB, "events"))
+            .order_by(e.id)
+            .limit(event_batch)
+        ).all()
+        if not events:
+            return written
+        grouped = []
+        for ev in events:
+            if ev.kind == QUIZ_PUBLISHED:
+                written += _flush_grouped(db, grouped)
+                grouped = []
+                written += _fan_out_published(db, ev, fanout_batch)
+            else:
+                grouped.append(ev)
+        written += _flush_grouped(db, grouped)
+        if len(events) < event_batch:
+            return written
+
+
+# ---------- чтение ----------
+
+def unread_count(db: Session, user_id: int) -> int:
+    counter = db.get(models.NotificationCounter, user_id)
+    return counter.unread if counter else 0
+
+
+def last_read_id(db: Session, user_id: int) -> int:
+    counter = db.get(models.NotificationCounter, user_id)
+    return counter.last_read_id if counter else 0
+
+
+def page(db: Session, user_id: int, before: Optional[int], limit: int) -> List[models.Notification]:
+    """Новые сверху; keyset по id (уведомления пишет один воркер, id растёт вместе с created_at)."""
+    n = models.Notification
+    q = db.query(n).filter(n.user_id == user_id)
+    if before:
+        q = q.filter(n.id < before)
+    return q.order_by(n.created_at.desc(), n.id.desc()).limit(limit).all()
+
+
+def mark_all_read(db: Session, user_id: int) -> None:
+    """Одним UPDATE, чтобы не потерять уведомления, дописанные между чтением и записью."""
+    n = models.Notification
+    db.execute(
+        update(models.NotificationCounter)
+        .where(models.NotificationCounter.user_id == user_id)
+        .values(
+            unread=0,
+            last_read_id=select(func.coalesce(func.max(n.id), 0)).where(n.user_id == user_id).scalar_subquery(),
+        )
+    )
+    db.commit()
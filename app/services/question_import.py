@@ -0,0 +1,551 @@
+"""
+Импорт банка вопросов в квиз: CSV или JSON Lines.
+
+Файл приходит multipart/form-data (часть file, поля mode и format). Тело
+разбирается потоком (python-multipart, receive()): часть file пишется в
+IMPORT_DIR по мере чтения с проверкой лимита, а не копится Starlette целиком
+до вызова обработчика. Затем импорт ставится в очередь: запрос сразу отвечает
+202, прогресс опрашивается по id импорта. Файл
+читает фоновый поток, построчно, целиком в память не поднимая:
+- каждая строка проверяется схемой QuestionCreate; ошибки копятся с номером
+  строки (первые MAX_ERRORS, счётчик — все);
+- валидные вопросы пишутся пакетами по IMPORT_CHUNK_ROWS: executemany вопросов
+  с RETURNING id и executemany вариантов, коммит на пакет — запись в SQLite
+  не держит блокировку базы на весь файл;
+- импорт берёт тот процесс, чей UPDATE ... WHERE status='pending' изменил
+  строку (claim), и держит аренду claimed_at, продлевая её каждым пакетом.
+  Чужой running не трогается, пока аренда не истекла (IMPORT_LEASE_SECONDS);
+  процесс, у которого аренду перехватили, бросает работу на следующем пакете;
+- пока импорт не закончен, его вопросы скрыты (retired_at + import_id).
+  В конце одной транзакцией они открываются (mode=replace заодно выводит из
+  оборота прежние) и публикуется новая версия квиза. Хоть одна ошибка —
+  импорт failed, записанное удаляется: банк попадает в квиз целиком или никак.
+
+CSV: заголовок обязателен. Колонки text, correct_option_index (с 0, как в API)
+и варианты — все колонки, чьё имя начинается с option, по порядку; пустые
+ячейки вариантов пропускаются.
+JSON Lines: по объекту QuestionCreate на строку:
+    {"text": "...", "options": [{"text": "..."}, {"text": "..."}], "correct_option_index": 1}
+"""
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from ..core.config import (
+    IMPORT_CHUNK_ROWS, IMPORT_DIR, IMPORT_LEASE_SECONDS, IMPORT_MAX_QUESTIONS, IMPORT_MAX_UPLOAD_BYTES,
+)
+from ..database import SessionLocal
+from ..schemas import QuestionCreate
+
+logger = logging.getLogger("quizogram.imports")
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/jsonl": "jsonl",
+    "application/x-ndjson": "jsonl",
+    "application/x-jsonlines": "jsonl",
+}
+MODES = ("append", "replace")
+MAX_ERRORS = 100
+FORM_FIELDS = ("mode", "format")
+FIELD_MAX_BYTES = 1024
+# границы, заголовки частей и поля формы сверх самого файла
+MAX_REQUEST_BYTES = IMPORT_MAX_UPLOAD_BYTES + 64 * 1024
+
+Row = Tuple[int, Optional[QuestionCreate], Optional[str]]  # (строка, вопрос, ошибка)
+
+
+class ImportTooLarge(ValueError):
+    pass
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+class InvalidUpload(ValueError):
+    """Тело не разбирается как форма загрузки (нет части file, битый multipart, неверное поле)."""
+
+
+class Upload(NamedTuple):
+    path: str
+    size: int
+    filename: Optional[str]
+    format: str
+    mode: str
+
+
+class _LeaseLost(Exception):
+    """Аренду импорта перехватил другой процесс — эта попытка ничего больше не пишет."""
+
+
+class _Fatal(Exception):
+    """Дальше файл читать нельзя (заголовок, кодировка, лимит)."""
+
+    def __init__(self, line: int, error: str):
+        self.line, self.error = line, error
+
+
+def detect_format(
+    filename: Optional[str], declared: Optional[str] = None, content_type: Optional[str] = None,
+) -> str:
+    """Формат: поле format, иначе расширение filename, иначе Content-Type части."""
+    if declared:
+        if declared not in _PARSERS:
+            raise UnsupportedFormat("format must be csv or jsonl")
+        return declared
+    fmt = FORMATS.get(Path(filename or "").suffix.lower())
+    if fmt is None:
+        fmt = CONTENT_TYPES.get((content_type or "").split(";")[0].strip().lower())
+    if fmt is None:
+        raise UnsupportedFormat("Upload a .csv or .jsonl file or pass format=csv|jsonl")
+    return fmt
+
+
+class _FormReader:
+    """
+    Колбэки MultipartParser. Данные части file копятся в pending до конца
+    текущего куска тела (их пишет receive() в потоке), поля mode/format — в
+    памяти, не длиннее FIELD_MAX_BYTES; прочие части пропускаются.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.size = 0
+        self.pending = bytearray()
+        self.has_file = False
+        self.complete = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._name = self._value = b""
+        self._target: Optional[str] = None  # "file", имя поля или None
+        self._field = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_end": self.on_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers, self._target, self._field = {}, None, bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._name.lower()] = self._value
+        self._name = self._value = b""
+
+    def on_headers_finished(self) -> None:
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in disposition:
+            if name != "file" or self.has_file:
+                raise InvalidUpload("Send exactly one file, in the form field 'file'")
+            self.has_file = True
+            self.filename = disposition[b"filename"].decode("utf-8", "replace")[:255] or None
+            content_type = self._headers.get(b"content-type")
+            self.content_type = content_type.decode("latin-1") if content_type else None
+            self._target = "file"
+        elif name in FORM_FIELDS:
+            self._target = name
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._target == "file":
+            self.size += end - start
+            if self.size > IMPORT_MAX_UPLOAD_BYTES:
+                raise ImportTooLarge(f"File is larger than {IMPORT_MAX_UPLOAD_BYTES} bytes")
+            self.pending += data[start:end]
+        elif self._target is not None:
+            self._field += data[start:end]
+            if len(self._field) > FIELD_MAX_BYTES:
+                raise InvalidUpload(f"Form field {self._target!r} is too long")
+
+    def on_part_end(self) -> None:
+        if self._target not in (None, "file"):
+            self.fields[self._target] = self._field.decode("utf-8", "replace").strip()
+
+    def on_end(self) -> None:
+        self.complete = True
+
+
+async def receive(content_type: Optional[str], chunks: AsyncIterable[bytes]) -> Upload:
+    """
+    Разбирает multipart/form-data по мере чтения тела: часть file пишется в
+    IMPORT_DIR кусками, лимит IMPORT_MAX_UPLOAD_BYTES проверяется на лету.
+    mode — поле формы (по умолчанию append), формат — см. detect_format.
+    """
+    media_type, params = parse_options_header(content_type or "")
+    boundary = params.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise UnsupportedFormat("Send the file as multipart/form-data in the field 'file'")
+
+    IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=IMPORT_DIR, suffix=".upload")
+    reader = _FormReader()
+    parser = MultipartParser(boundary, reader.callbacks())
+    received = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                received += len(chunk)
+                if received > MAX_REQUEST_BYTES:
+                    raise ImportTooLarge(f"File is larger than {IMPORT_MAX_UPLOAD_BYTES} bytes")
+                try:
+                    parser.write(chunk)
+                except MultipartParseError as e:
+                    raise InvalidUpload(f"Malformed multipart body: {e}")
+                if reader.pending:
+                    data, reader.pending = bytes(reader.pending), bytearray()
+                    await run_in_threadpool(f.write, data)
+            parser.finalize()
+        if not reader.complete:
+            raise InvalidUpload("Multipart body is incomplete")
+        if not reader.has_file:
+            raise InvalidUpload("Form field 'file' is required")
+        mode = reader.fields.get("mode") or "append"
+        if mode not in MODES:
+            raise InvalidUpload("mode must be append or replace")
+        fmt = detect_format(reader.filename, reader.fields.get("format") or None, reader.content_type)
+    except BaseException:
+        _unlink_quietly(path)
+        raise
+    return Upload(path, reader.size, reader.filename, fmt, mode)
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def create(
+    db: Session, quiz_id: int, owner_id: int, fmt: str, mode: str, filename: Optional[str], path: str, size: int,
+) -> models.QuestionImport:
+    job = models.QuestionImport(
+        quiz_id=quiz_id, owner_id=owner_id, format=fmt, mode=mode, filename=filename,
+        path=path, status="pending", bytes_total=size,
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+# ---------- аренда ----------
+
+def _claimable(now: int):
+    """pending или running с истёкшей арендой (NULL — строка из версии без аренды)."""
+    t = models.QuestionImport
+    return or_(
+        t.status == "pending",
+        and_(t.status == "running", or_(t.claimed_at.is_(None), t.claimed_at < now - IMPORT_LEASE_SECONDS)),
+    )
+
+
+def _claim(db: Session, import_id: int) -> Optional[int]:
+    """Атомарно забирает импорт. Возвращает метку аренды или None, если его держит другой процесс."""
+    t = models.QuestionImport
+    now = int(time.time())
+    claimed = db.execute(
+        update(t).where(t.id == import_id, _claimable(now))
+        .values(status="running", claimed_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return now if claimed else None
+
+
+def _renew(db: Session, import_id: int, lease: int) -> int:
+    """Продлевает аренду в текущей транзакции; перехваченная — _LeaseLost."""
+    t = models.QuestionImport
+    now = max(int(time.time()), lease)
+    renewed = db.execute(
+        update(t).where(t.id == import_id, t.status == "running", t.claimed_at == lease)
+        .values(claimed_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not renewed:
+        raise _LeaseLost()
+    return now
+
+
+# ---------- разбор ----------
+
+def _validate(line: int, record) -> Row:
+    try:
+        q = QuestionCreate.model_validate(record)
+    except ValidationError as e:
+        return line, None, "; ".join(
+            f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+            for err in e.errors()
+        )
+    if q.correct_option_index >= len(q.options):
+        return line, None, "correct_option_index is out of range"
+    return line, q, None
+
+
+def _rows_csv(text: io.TextIOBase) -> Iterator[Row]:
+    reader = csv.reader(text)
+    header = [h.strip().lower() for h in next(reader, [])]
+    options = [i for i, h in enumerate(header) if h.startswith("option")]
+    if "text" not in header or "correct_option_index" not in header or len(options) < 2:
+        raise _Fatal(1, "Header must have text, correct_option_index and at least two option columns")
+    text_col, correct_col = header.index("text"), header.index("correct_option_index")
+    width = max(options + [text_col, correct_col]) + 1
+
+    line = reader.line_num
+    for row in reader:
+        start, line = line + 1, reader.line_num  # запись в кавычках может занимать несколько строк
+        if not any(cell.strip() for cell in row):
+            continue
+        row += [""] * (width - len(row))
+        yield _validate(start, {
+            "text": row[text_col].strip(),
+            "correct_option_index": row[correct_col].strip(),
+            "options": [{"text": row[i].strip()} for i in options if row[i].strip()],
+        })
+
+
+def _rows_jsonl(text: io.TextIOBase) -> Iterator[Row]:
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            yield line, None, f"Invalid JSON: {e}"
+            continue
+        yield _validate(line, record)
+
+
+_PARSERS = {"csv": _rows_csv, "jsonl": _rows_jsonl}
+
+
+# ---------- запись ----------
+
+def _write_chunk(db: Session, job: models.QuestionImport, questions: List[QuestionCreate], staged_at: datetime):
+    ids = list(db.scalars(
+        insert(models.Question).returning(models.Question.id, sort_by_parameter_order=True),
+        [
+            {"quiz_id": job.quiz_id, "text": q.text, "correct_option_index": q.correct_option_index,
+             "retired_at": staged_at, "import_id": job.id}
+            for q in questions
+        ],
+    ))
+    db.execute(models.AnswerOption.__table__.insert(), [
+        {"question_id": qid, "text": opt.text}
+        for qid, q in zip(ids, questions)
+        for opt in q.options
+    ])
+
+
+def _discard_staged(db: Session, import_id: int) -> None:
+    staged = select(models.Question.id).where(models.Question.import_id == import_id)
+    db.execute(delete(models.AnswerOption).where(models.AnswerOption.question_id.in_(staged)))
+    db.execute(delete(models.Question).where(models.Question.import_id == import_id))
+
+
+def _publish(db: Session, job: models.QuestionImport, now: datetime) -> Optional[int]:
+    """Открывает вопросы импорта и публикует версию одной транзакцией; None — квиза уже нет."""
+    from . import quiz_versions, review_queue
+
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == job.quiz_id, models.Quiz.deleted_at.is_(None)).first()
+    if quiz is None:
+        return None
+    q = models.Question
+    if job.mode == "replace":
+        db.execute(
+            update(q).where(q.quiz_id == job.quiz_id, q.retired_at.is_(None)).values(retired_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    db.execute(
+        update(q).where(q.import_id == job.id).values(retired_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.flush()
+    if job.mode == "replace":
+        review_queue.prune_retired(db, job.quiz_id)
+    db.expire(quiz, ["questions"])
+    return quiz_versions.publish(db, quiz).id
+
+
+def run(import_id: int) -> None:
+    """
+    Выполняет импорт, если удалось его забрать; повторный запуск (аренда
+    истекла — прежний процесс умер) начинает файл заново.
+    """
+    db = SessionLocal()
+    lease = None
+    try:
+        lease = _claim(db, import_id)
+        if lease is None:
+            return
+        job = db.get(models.QuestionImport, import_id)
+        _discard_staged(db, job.id)
+        job.bytes_done = job.rows_done = job.imported = job.error_count = 0
+        job.errors = None
+        db.commit()
+
+        errors: List[dict] = []
+        staged_at = datetime.now(timezone.utc)
+        chunk: List[QuestionCreate] = []
+
+        def fail(line: int, error: str) -> None:
+            job.error_count += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append({"line": line, "error": error})
+
+        def flush(raw) -> None:
+            nonlocal lease
+            lease = _renew(db, job.id, lease)
+            if chunk and not job.error_count:
+                _write_chunk(db, job, chunk, staged_at)
+                job.imported += len(chunk)
+            chunk.clear()
+            job.bytes_done = raw.tell()
+            db.commit()
+
+        with open(job.path, "rb") as raw:
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            line = 0
+            try:
+                for line, question, error in _PARSERS[job.format](text):
+                    job.rows_done += 1
+                    if error is not None:
+                        fail(line, error)
+                    elif job.rows_done > IMPORT_MAX_QUESTIONS:
+                        raise _Fatal(line, f"More than {IMPORT_MAX_QUESTIONS} questions in one import")
+                    else:
+                        chunk.append(question)
+                    if job.rows_done % IMPORT_CHUNK_ROWS == 0:
+                        flush(raw)
+            except _Fatal as e:
+                fail(e.line, e.error)
+            except UnicodeDecodeError:
+                fail(line + 1, "File is not valid UTF-8")
+            except csv.Error as e:
+                fail(line + 1, f"Malformed CSV: {e}")
+            flush(raw)
+            job.bytes_done = job.bytes_total
+
+        lease = _renew(db, job.id, lease)
+        now = datetime.now(timezone.utc)
+        if not job.error_count and not job.imported:
+            fail(1, "No questions in file")
+        if not job.error_count:
+            job.version_id = _publish(db, job, now)
+            if job.version_id is None:
+                fail(1, "Quiz was deleted")
+        if job.error_count:
+            _discard_staged(db, job.id)
+            job.status = "failed"
+            job.imported = 0
+        else:
+            job.status = "done"
+        job.errors = json.dumps(errors, ensure_ascii=False)
+        job.finished_at = now
+        db.commit()
+        _unlink_quietly(job.path)
+    except _LeaseLost:
+        db.rollback()
+        logger.warning("question import %s was taken over by another worker", import_id)
+    except Exception:
+        db.rollback()
+        logger.exception("question import %s failed", import_id)
+        if lease is None:
+            return
+        try:
+            _renew(db, import_id, lease)  # падение помечает только импорт, который всё ещё наш
+        except _LeaseLost:
+            db.rollback()
+            return
+        job = db.get(models.QuestionImport, import_id)
+        if job is not None:
+            _discard_staged(db, import_id)
+            job.status = "failed"
+            job.imported = 0
+            job.errors = json.dumps([{"line": 0, "error": "Internal error"}])
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+            _unlink_quietly(job.path)
+    finally:
+        db.close()
+
+
+class ImportRunner:
+    """Один фоновый поток: импорты идут по очереди и не спорят за блокировку записи SQLite."""
+
+    def __init__(self):
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight: Set[int] = set()
+
+    def submit(self, import_id: int) -> bool:
+        with self._lock:
+            if import_id in self._inflight:
+                return False
+            self._inflight.add(import_id)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="question-import")
+            pool = self._pool
+        future = pool.submit(run, import_id)
+        future.add_done_callback(lambda _: self._done(import_id))
+        return True
+
+    def _done(self, import_id: int) -> None:
+        with self._lock:
+            self._inflight.discard(import_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            # незаконченный импорт останется running и начнётся заново, когда истечёт аренда
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+runner = ImportRunner()
+
+
+def process_pending(db: Session) -> int:
+    """
+    Фоновая задача: pending и брошенные running (аренда истекла). Возвращает
+    число поставленных в очередь; забирает импорт всё равно run() — атомарно.
+    """
+    pending = db.execute(
+        select(models.QuestionImport.id)
+        .where(_claimable(int(time.time())))
+        .order_by(models.QuestionImport.id)
+    ).scalars().all()
+    return sum(runner.submit(import_id) for import_id in pending)
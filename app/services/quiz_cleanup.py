@@ -0,0 +1,138 @@
+"""
+Фоновая очистка удалённых квизов.
+
+DELETE /quizzes/{id} только ставит quizzes.deleted_at — запрос возвращается
+сразу, а все чтения фильтруют надгробия. Здесь зависимые строки удаляются
+пакетами по QUIZ_CLEANUP_BATCH_SIZE, каждый пакет — своя короткая
+транзакция, чтобы не держать блокировку SQLite на весь квиз с тысячами попыток.
+
+Сама строка квиза остаётся надгробием: id не переиспользуется (SQLite без
+AUTOINCREMENT выдаёт max(id) + 1), а водяные знаки фоновых задач и ETag'и
+версий опираются на неизменность id.
+
+Разово:
+    python -m app.services.quiz_cleanup
+"""
+import logging
+import os
+from contextlib import suppress
+from typing import List
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core.config import QUIZ_CLEANUP_BATCH_SIZE
+from . import quiz_versions
+
+logger = logging.getLogger("quizogram.quiz_cleanup")
+
+
+def _batches(db: Session, id_query, batch_size: int):
+    """Отдаёт id пакетами, пока запрос что-то возвращает (удалённое в него уже не попадает)."""
+    while True:
+        ids: List[int] = list(db.execute(id_query.limit(batch_size)).scalars())
+        if not ids:
+            return
+        yield ids
+        if len(ids) < batch_size:
+            return
+
+
+def purge_quiz(db: Session, quiz_id: int, batch_size: int = QUIZ_CLEANUP_BATCH_SIZE) -> int:
+    """Удаляет всё, что ссылается на квиз. Возвращает число удалённых строк."""
+    removed = 0
+
+    # попытки вместе с ответами и ключами идемпотентности
+    attempts = select(models.Attempt.id).where(models.Attempt.quiz_id == quiz_id).order_by(models.Attempt.id)
+    for ids in _batches(db, attempts, batch_size):
+        removed += db.execute(delete(models.AttemptAnswer).where(models.AttemptAnswer.attempt_id.in_(ids))).rowcount
+        removed += db.execute(
+            delete(models.AttemptIdempotencyKey).where(models.AttemptIdempotencyKey.attempt_id.in_(ids))
+        ).rowcount
+        removed += db.execute(delete(models.Attempt).where(models.Attempt.id.in_(ids))).rowcount
+        db.commit()
+
+    likes = select(models.Like.id).where(models.Like.quiz_id == quiz_id).order_by(models.Like.id)
+    for ids in _batches(db, likes, batch_size):
+        removed += db.execute(delete(models.Like).where(models.Like.id.in_(ids))).rowcount
+        db.commit()
+
+    # производные таблицы: размер ограничен числом вопросов / TOP_K соседей / читателей
+    for stmt in (
+        delete(models.QuestionOptionStat).where(models.QuestionOptionStat.quiz_id == quiz_id),
+        delete(models.QuestionStat).where(models.QuestionStat.quiz_id == quiz_id),
+        delete(models.QuizStat).where(models.QuizStat.quiz_id == quiz_id),
+        delete(models.QuizNeighbor).where(
+            or_(models.QuizNeighbor.quiz_id == quiz_id, models.QuizNeighbor.neighbor_id == quiz_id)
+        ),
+        delete(models.QuizTrending).where(models.QuizTrending.quiz_id == quiz_id),
+        delete(models.TrendingTop).where(models.TrendingTop.quiz_id == quiz_id),
+        delete(models.ReviewState).where(models.ReviewState.quiz_id == quiz_id),
+        delete(models.AttemptSession).where(models.AttemptSession.quiz_id == quiz_id),
+        delete(models.QuizTag).where(models.QuizTag.quiz_id == quiz_id),
+    ):
+        removed += db.execute(stmt).rowcount
+    db.commit()
+
+    # вопросы (включая выведенные из оборота) с вариантами
+    questions = select(models.Question.id).where(models.Question.quiz_id == quiz_id).order_by(models.Question.id)
+    for ids in _batches(db, questions, batch_size):
+        removed += db.execute(delete(models.AnswerOption).where(models.AnswerOption.question_id.in_(ids))).rowcount
+        removed += db.execute(delete(models.Question).where(models.Question.id.in_(ids))).rowcount
+        db.commit()
+
+    # импорты вопросов: их вопросы уже удалены; незавершённые файлы подчищаем
+    for (path,) in db.execute(select(models.QuestionImport.path).where(
+        models.QuestionImport.quiz_id == quiz_id, models.QuestionImport.status.in_(("pending", "running")),
+    )):
+        with suppress(OSError):
+            os.unlink(path)
+    removed += db.execute(delete(models.QuestionImport).where(models.QuestionImport.quiz_id == quiz_id)).rowcount
+
+    # версии: попыток, ссылающихся на них, уже нет
+    db.execute(update(models.Quiz).where(models.Quiz.id == quiz_id).values(current_version_id=None))
+    version_ids = list(db.execute(
+        select(models.QuizVersion.id).where(models.QuizVersion.quiz_id == quiz_id)
+    ).scalars())
+    if version_ids:
+        removed += db.execute(delete(models.QuizVersion).where(models.QuizVersion.id.in_(version_ids))).rowcount
+    db.commit()
+    quiz_versions.forget(version_ids)
+    return removed
+
+
+def purge_deleted(db: Session, batch_size: int = QUIZ_CLEANUP_BATCH_SIZE) -> int:
+    """
+    Фоновая задача: чистит все квизы-надгробия, у которых ещё есть версия или вопросы.
+    Возвращает число обработанных квизов.
+    """
+    has_questions = select(models.Question.id).where(models.Question.quiz_id == models.Quiz.id).exists()
+    pending = list(db.execute(
+        select(models.Quiz.id)
+        .where(
+            models.Quiz.deleted_at.isnot(None),
+            or_(models.Quiz.current_version_id.isnot(None), has_questions),
+        )
+        .order_by(models.Quiz.deleted_at)
+    ).scalars())
+    for quiz_id in pending:
+        removed = purge_quiz(db, quiz_id, batch_size)
+        logger.info("purged quiz %s: %s rows", quiz_id, removed)
+    return len(pending)
+
+
+def main() -> None:
+    from ..database import SessionLocal, sync_schema
+
+    sync_schema()
+    db = SessionLocal()
+    try:
+        done = purge_deleted(db)
+    finally:
+        db.close()
+    print(f"purged {done} deleted quizzes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Агрегаты статистики по квизам: попытки и средний балл, доля правильных
+ответов на вопрос и распределение выбранных вариантов.
+
+- record_attempt() — инкрементальное обновление в той же транзакции, что и попытка;
+- rebuild() — пересборка с нуля батчами (keyset по id + векторный подсчёт в NumPy),
+  для бэкфилла по миллионам строк attempt_answers.
+
+Запуск пересборки:
+    python -m app.services.quiz_stats [--batch-size 50000]
+"""
+import argparse
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from .columnar import fetch_int_array
+
+DEFAULT_BATCH_SIZE = 50_000
+
+
+def _upsert_add(db: Session, model, rows: List[Dict], key_cols: List[str], count_cols: List[str]) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE SET count = count + excluded.count (executemany)."""
+    if not rows:
+        return
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_cols,
+        set_={c: getattr(model, c) + getattr(stmt.excluded, c) for c in count_cols},
+    )
+    db.execute(stmt, rows)
+
+
+def record_attempt(
+    db: Session,
+    quiz_id: int,
+    score: int,
+    answers: Iterable[Tuple[int, int, bool]],
+) -> None:
+    """
+    Учитывает одну попытку. answers: (question_id, selected_option_index, is_correct).
+    Не коммитит — вызывается внутри транзакции попытки.
+    """
+    record_attempts(db, [(quiz_id, score, answers)])
+
+
+def record_attempts(
+    db: Session,
+    attempts: Iterable[Tuple[int, int, Iterable[Tuple[int, int, bool]]]],
+) -> None:
+    """Пакетный вариант record_attempt: (quiz_id, score, answers) -> три upsert'а на весь пакет."""
+    quiz_rows: Dict[int, Dict] = {}
+    question_rows: Dict[int, Dict] = {}
+    option_rows: Dict[Tuple[int, int], Dict] = {}
+    for quiz_id, score, answers in attempts:
+        zrow = quiz_rows.setdefault(quiz_id, {"quiz_id": quiz_id, "attempts_count": 0, "score_sum": 0})
+        zrow["attempts_count"] += 1
+        zrow["score_sum"] += score
+
+        for question_id, option_index, is_correct in answers:
+            qrow = question_rows.setdefault(question_id, {
+                "question_id": question_id, "quiz_id": quiz_id, "answered_count": 0, "correct_count": 0,
+            })
+            qrow["answered_count"] += 1
+            qrow["correct_count"] += int(bool(is_correct))
+
+            orow = option_rows.setdefault((question_id, option_index), {
+                "question_id": question_id, "option_index": option_index, "quiz_id": quiz_id, "picks": 0,
+            })
+            orow["picks"] += 1
+
+    _upsert_add(db, models.QuizStat, list(quiz_rows.values()),
+                ["quiz_id"], ["attempts_count", "score_sum"])
+    _upsert_add(db, models.QuestionStat, list(question_rows.values()),
+                ["question_id"], ["answered_count", "correct_count"])
+    _upsert_add(db, models.QuestionOptionStat, list(option_rows.values()),
+                ["question_id", "option_index"], ["picks"])
+
+
+def _aggregate_answers(batch: np.ndarray) -> Tuple[List[Dict], List[Dict]]:
+    """batch: колонки (id, question_id, quiz_id, selected_option_index, is_correct)."""
+    qids, quiz_ids, options, correct = batch[:, 1], batch[:, 2], batch[:, 3], batch[:, 4]
+
+    uq, first, inv = np.unique(qids, return_index=True, return_inverse=True)
+    answered = np.bincount(inv)
+    correct_cnt = np.bincount(inv, weights=correct).astype(np.int64)
+    question_rows = [
+        {"question_id": q, "quiz_id": z, "answered_count": a, "correct_count": c}
+        for q, z, a, c in zip(uq.tolist(), quiz_ids[first].tolist(), answered.tolist(), correct_cnt.tolist())
+    ]
+
+    pairs, pair_first, picks = np.unique(
+        np.stack([qids, options], axis=1), axis=0, return_index=True, return_counts=True,
+    )
+    option_rows = [
+        {"question_id": q, "option_index": o, "quiz_id": z, "picks": p}
+        for (q, o), z, p in zip(pairs.tolist(), quiz_ids[pair_first].tolist(), picks.tolist())
+    ]
+    return question_rows, option_rows
+
+
+def _aggregate_attempts(batch: np.ndarray) -> List[Dict]:
+    """batch: колонки (id, quiz_id, score)."""
+    uq, inv = np.unique(batch[:, 1], return_inverse=True)
+    attempts = np.bincount(inv)
+    score_sum = np.bincount(inv, weights=batch[:, 2]).astype(np.int64)
+    return [
+        {"quiz_id": z, "attempts_count": a, "score_sum": s}
+        for z, a, s in zip(uq.tolist(), attempts.tolist(), score_sum.tolist())
+    ]
+
+
+def rebuild(db: Session, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Пересобирает все агрегаты. Очистка таблиц и фиксация верхних границ id
+    идут одной транзакцией: всё, что выше границ, уже учтено record_attempt,
+    поэтому двойного счёта нет, а писатели блокируются только на один батч.
+    """
+    db.execute(delete(models.QuizStat))
+    db.execute(delete(models.QuestionStat))
+    db.execute(delete(models.QuestionOptionStat))
+    max_answer_id = db.execute(select(func.max(models.AttemptAnswer.id))).scalar() or 0
+    max_attempt_id = db.execute(select(func.max(models.Attempt.id))).scalar() or 0
+    db.commit()
+
+    aa, q, at = models.AttemptAnswer, models.Question, models.Attempt
+    answers_done = 0
+    last_id = 0
+    while last_id < max_answer_id:
+        batch = fetch_int_array(
+            db,
+            select(aa.id, aa.question_id, q.quiz_id, aa.selected_option_index, aa.is_correct)
+            .join(q, q.id == aa.question_id)
+            .where(aa.id > last_id, aa.id <= max_answer_id)
+            .order_by(aa.id)
+            .limit(batch_size),
+            5,
+        )
+        if not len(batch):
+            break
+        question_rows, option_rows = _aggregate_answers(batch)
+        _upsert_add(db, models.QuestionStat, question_rows,
+                    ["question_id"], ["answered_count", "correct_count"])
+        _upsert_add(db, models.QuestionOptionStat, option_rows,
+                    ["question_id", "option_index"], ["picks"])
+        db.commit()
+        last_id = int(batch[-1, 0])
+        answers_done += len(batch)
+
+    attempts_done = 0
+    last_id = 0
+    while last_id < max_attempt_id:
+        batch = fetch_int_array(
+            db,
+            select(at.id, at.quiz_id, at.score)
+            .where(at.id > last_id, at.id <= max_attempt_id)
+            .order_by(at.id)
+            .limit(batch_size),
+            3,
+        )
+        if not len(batch):
+            break
+        _upsert_add(db, models.QuizStat, _aggregate_attempts(batch),
+                    ["quiz_id"], ["attempts_count", "score_sum"])
+        db.commit()
+        last_id = int(batch[-1, 0])
+        attempts_done += len(batch)
+
+    return {"attempt_answers": answers_done, "attempts": attempts_done}
+
+
+def main() -> None:
+    from ..database import SessionLocal, sync_schema
+
+    parser = argparse.ArgumentParser(description="Пересборка статистики по квизам")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    sync_schema()
+    db = SessionLocal()
+    try:
+        done = rebuild(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"rebuilt: {done['attempts']} attempts, {done['attempt_answers']} answers")
+
+
+if __name__ == "__main__":
+    main()
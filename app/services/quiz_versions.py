@@ -0,0 +1,156 @@
+"""
+Неизменяемые версии квизов.
+
+Каждая публикация (создание квиза, правка заголовка/описания, замена вопросов)
+пишет новую строку quiz_versions: весь QuizOut одним orjson-блобом. Отдача
+версии — одно чтение по первичному ключу и отправка байтов как есть; оценка
+попыток — по ключу ответов из того же снимка, без join'ов. Снимки не меняются,
+поэтому разобранные ключи ответов кэшируются в процессе по id версии.
+
+Квизы, созданные до появления версий, публикуются разом — на старте
+приложения (вместе с проверкой схемы), при деплое (python -m app.database) или:
+    python -m app.services.quiz_versions
+Пути чтения версии не создают: публикация на лету в GET гонялась за номер версии.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import orjson
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, selectinload
+
+from .. import models
+from ..schemas import QuizOut
+
+ANSWER_KEY_CACHE_SIZE = 4096
+BACKFILL_BATCH = 500
+
+
+class AnswerKey(NamedTuple):
+    version_id: int
+    quiz_id: int
+    correct: Dict[int, int]   # question_id -> индекс правильного варианта
+    options: Dict[int, int]   # question_id -> число вариантов
+    total: int
+
+
+_cache: "OrderedDict[int, AnswerKey]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def build_snapshot(quiz: models.Quiz, version_id: int) -> bytes:
+    data = QuizOut.model_validate(quiz).model_dump(mode="json")
+    data["current_version_id"] = version_id
+    return orjson.dumps(data)
+
+
+def _next_version(db: Session, quiz_id: int) -> int:
+    """
+    Номер следующей версии: UPDATE quizzes SET version_seq = version_seq + 1
+    RETURNING. Строка квиза блокируется до конца транзакции, так что две
+    параллельные публикации получают разные номера, а не IntegrityError на
+    uq_quiz_version. Для квизов до version_seq счёт продолжается с MAX(version).
+    """
+    q, v = models.Quiz, models.QuizVersion
+    last = select(func.max(v.version)).where(v.quiz_id == q.id).scalar_subquery()
+    return db.execute(
+        update(q).where(q.id == quiz_id)
+        .values(version_seq=func.coalesce(q.version_seq, last, 0) + 1)
+        .returning(q.version_seq)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def publish(db: Session, quiz: models.Quiz) -> models.QuizVersion:
+    """Новая версия из текущего состояния квиза (актуальные вопросы). Без commit."""
+    version = models.QuizVersion(quiz_id=quiz.id, version=_next_version(db, quiz.id), snapshot=b"")
+    db.add(version)
+    db.flush()  # id версии нужен внутри снимка
+    quiz.current_version_id = version.id
+    version.snapshot = build_snapshot(quiz, version.id)
+    db.flush()
+    return version
+
+
+def _decode_key(version: models.QuizVersion) -> AnswerKey:
+    data = orjson.loads(version.snapshot)
+    questions = data["questions"]
+    return AnswerKey(
+        version_id=version.id,
+        quiz_id=version.quiz_id,
+        correct={q["id"]: q["correct_option_index"] for q in questions},
+        options={q["id"]: len(q["options"]) for q in questions},
+        total=len(questions),
+    )
+
+
+def answer_keys(db: Session, version_ids: Iterable[int]) -> Dict[int, AnswerKey]:
+    """Ключи ответов по id версий: из кэша, недостающие — одним запросом по PK."""
+    wanted = set(version_ids)
+    found: Dict[int, AnswerKey] = {}
+    with _cache_lock:
+        for vid in wanted:
+            key = _cache.get(vid)
+            if key is not None:
+                _cache.move_to_end(vid)
+                found[vid] = key
+
+    missing = wanted - found.keys()
+    if missing:
+        for version in db.query(models.QuizVersion).filter(models.QuizVersion.id.in_(missing)):
+            found[version.id] = _decode_key(version)
+        with _cache_lock:
+            for vid in missing:
+                if vid in found:
+                    _cache[vid] = found[vid]
+            while len(_cache) > ANSWER_KEY_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return found
+
+
+def answer_key(db: Session, version_id: int) -> Optional[AnswerKey]:
+    return answer_keys(db, [version_id]).get(version_id)
+
+
+def forget(version_ids: Iterable[int]) -> None:
+    """Выкидывает ключи удалённых версий из кэша."""
+    with _cache_lock:
+        for vid in version_ids:
+            _cache.pop(vid, None)
+
+
+def backfill_missing(db: Session, batch_size: int = BACKFILL_BATCH) -> int:
+    """Публикует версии для всех квизов без current_version_id. Возвращает их число."""
+    done = 0
+    while True:
+        quizzes = (
+            db.query(models.Quiz)
+              .options(selectinload(models.Quiz.questions).selectinload(models.Question.options))
+              .filter(models.Quiz.current_version_id.is_(None), models.Quiz.deleted_at.is_(None))
+              .order_by(models.Quiz.id)
+              .limit(batch_size)
+              .all()
+        )
+        if not quizzes:
+            return done
+        for quiz in quizzes:
+            publish(db, quiz)
+        db.commit()
+        done += len(quizzes)
+
+
+def main() -> None:
+    from ..database import SessionLocal, sync_schema
+
+    sync_schema()
+    db = SessionLocal()
+    try:
+        done = backfill_missing(db)
+    finally:
+        db.close()
+    print(f"published versions for {done} quizzes")
+
+
+if __name__ == "__main__":
+    main()
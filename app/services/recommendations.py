@@ -0,0 +1,275 @@
+"""
+Рекомендации квизов: item-item косинусная близость по матрице
+пользователь × квиз (лайк = 1.0, попытка = 0.5), считается офлайн батчами
+на scipy.sparse и хранится как top-K соседей на квиз в quiz_neighbors.
+
+- refresh() — инкрементально: пересчитываются только строки квизов с новыми
+  лайками/попытками (по водяным знакам id) и квизов, которые делят с ними
+  пользователей — у остальных косинус не изменился;
+- refresh(full=True) — полный пересчёт (в том числе учитывает снятые лайки);
+- recommend() — на запросе: пара индексных выборок по user_id, соседи
+  по первичному ключу quiz_neighbors и небольшое слияние в памяти.
+
+Запуск вручную:
+    python -m app.services.recommendations [--full]
+"""
+import argparse
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .columnar import fetch_int_array
+from .jobs import get_cursor, set_cursor
+
+if TYPE_CHECKING:
+    import scipy.sparse as sp  # сам scipy грузится только офлайн-пересчётом (~0.2 с импорта)
+
+JOB = "recommendations"
+TOP_K = 20
+LIKE_WEIGHT = 1.0
+ATTEMPT_WEIGHT = 0.5
+ROW_BATCH = 512       # строк матрицы близости за один проход
+SEED_LIMIT = 50       # сколько последних лайков/попыток берём как «затравку»
+
+
+def _watermarks(db: Session) -> Tuple[int, int]:
+    """(max_like_id, max_attempt_id) — граница событий одного прохода refresh."""
+    max_like_id = db.execute(select(func.max(models.Like.id))).scalar() or 0
+    max_attempt_id = db.execute(select(func.max(models.Attempt.id))).scalar() or 0
+    return int(max_like_id), int(max_attempt_id)
+
+
+def _build_matrix(db: Session, max_like_id: int, max_attempt_id: int) -> Tuple["sp.csr_matrix", "sp.csr_matrix"]:
+    """
+    Возвращает (Xn, XnT): нормированную по столбцам матрицу пользователь × квиз
+    по лайкам и попыткам с id не больше водяных знаков и её транспонированную
+    копию (обе CSR). Всё, что новее, достанется следующему проходу.
+    """
+    import scipy.sparse as sp
+
+    max_quiz_id = db.execute(select(func.max(models.Quiz.id))).scalar() or 0
+
+    likes = fetch_int_array(
+        db, select(models.Like.user_id, models.Like.quiz_id).where(models.Like.id <= max_like_id), 2,
+    )
+    attempts = fetch_int_array(
+        db,
+        select(models.Attempt.user_id, models.Attempt.quiz_id)
+        .where(models.Attempt.id <= max_attempt_id)
+        .group_by(models.Attempt.user_id, models.Attempt.quiz_id),
+        2,
+    )
+
+    pairs = np.concatenate([likes, attempts])
+    weights = np.concatenate([
+        np.full(len(likes), LIKE_WEIGHT, dtype=np.float32),
+        np.full(len(attempts), ATTEMPT_WEIGHT, dtype=np.float32),
+    ])
+    n_users = int(pairs[:, 0].max()) + 1 if len(pairs) else 1
+    n_items = max(int(max_quiz_id), int(pairs[:, 1].max()) if len(pairs) else 0) + 1
+
+    x = sp.csr_matrix((weights, (pairs[:, 0], pairs[:, 1])), shape=(n_users, n_items), dtype=np.float32)
+    x.sum_duplicates()
+
+    norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=0)).ravel())
+    inv = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    xn = (x @ sp.diags(inv.astype(np.float32))).tocsr()
+    return xn, xn.T.tocsr()
+
+
+def _top_k_rows(xn: "sp.csr_matrix", xnt: "sp.csr_matrix", items: np.ndarray) -> Iterable[Tuple[int, List[Tuple[int, float]]]]:
+    """Для каждого квиза из items — список (neighbor_id, score) длиной до TOP_K."""
+    for start in range(0, len(items), ROW_BATCH):
+        batch = items[start:start + ROW_BATCH]
+        sims = (xnt[batch] @ xn).tocsr()
+        for r, quiz_id in enumerate(batch.tolist()):
+            lo, hi = sims.indptr[r], sims.indptr[r + 1]
+            cols = sims.indices[lo:hi]
+            vals = sims.data[lo:hi]
+            keep = cols != quiz_id
+            cols, vals = cols[keep], vals[keep]
+            if len(vals) > TOP_K:
+                idx = np.argpartition(-vals, TOP_K)[:TOP_K]
+                cols, vals = cols[idx], vals[idx]
+            order = np.argsort(-vals, kind="stable")
+            yield quiz_id, list(zip(cols[order].tolist(), vals[order].tolist()))
+
+
+def _store(db: Session, rows: Iterable[Tuple[int, List[Tuple[int, float]]]]) -> int:
+    stored = 0
+    pending: List[Tuple[int, List[Tuple[int, float]]]] = []
+
+    def flush():
+        ids = [q for q, _ in pending]
+        db.execute(delete(models.QuizNeighbor).where(models.QuizNeighbor.quiz_id.in_(ids)))
+        values = [
+            {"quiz_id": q, "neighbor_id": n, "score": s}
+            for q, neigh in pending for n, s in neigh
+        ]
+        if values:
+            db.execute(models.QuizNeighbor.__table__.insert(), values)
+        db.commit()
+        pending.clear()
+
+    for row in rows:
+        pending.append(row)
+        stored += 1
+        if len(pending) >= ROW_BATCH:
+            flush()
+    if pending:
+        flush()
+    return stored
+
+
+def _merge_affected(
+    db: Session, sims_t: "sp.csr_matrix", dirty_ids: np.ndarray, affected: np.ndarray,
+) -> Iterable[Tuple[int, List[Tuple[int, float]]]]:
+    """
+    У квиза j без новых событий меняются только близости к «грязным» квизам:
+    остальные пары (j, k) не затронуты ни числителем, ни нормами. Поэтому берём
+    сохранённый top-K, выбрасываем из него грязных соседей и вливаем их новые
+    значения из sims_t (строка j — близости к грязным квизам, столбец — позиция в dirty_ids).
+    Кандидат, выпавший из top-K раньше, сюда не вернётся — это поправит полный пересчёт.
+    """
+    dirty = set(dirty_ids.tolist())
+    for start in range(0, len(affected), ROW_BATCH):
+        batch = affected[start:start + ROW_BATCH].tolist()
+        stored: Dict[int, List[Tuple[int, float]]] = {q: [] for q in batch}
+        for quiz_id, neighbor_id, score in db.execute(
+            select(models.QuizNeighbor.quiz_id, models.QuizNeighbor.neighbor_id, models.QuizNeighbor.score)
+            .where(models.QuizNeighbor.quiz_id.in_(batch))
+        ):
+            if neighbor_id not in dirty:
+                stored[quiz_id].append((neighbor_id, score))
+        for quiz_id in batch:
+            lo, hi = sims_t.indptr[quiz_id], sims_t.indptr[quiz_id + 1]
+            merged = dict(stored[quiz_id])
+            merged.update(zip(dirty_ids[sims_t.indices[lo:hi]].tolist(), sims_t.data[lo:hi].tolist()))
+            merged.pop(quiz_id, None)
+            yield quiz_id, sorted(merged.items(), key=lambda item: -item[1])[:TOP_K]
+
+
+def refresh(db: Session, full: bool = False) -> int:
+    """Пересчитывает соседей; возвращает число обновлённых квизов."""
+    last_like_id = get_cursor(db, JOB, "likes")
+    last_attempt_id = get_cursor(db, JOB, "attempts")
+    full = full or (last_like_id == 0 and last_attempt_id == 0)
+    # водяные знаки — до всех чтений: грязные квизы и матрица видят одни и те же
+    # события (id <= max), пришедшее позже целиком достаётся следующему проходу
+    max_like_id, max_attempt_id = _watermarks(db)
+
+    if not full:
+        # быстрая проверка по первичным ключам: есть ли вообще новые события
+        dirty = set(db.execute(
+            select(models.Like.quiz_id)
+            .where(models.Like.id > last_like_id, models.Like.id <= max_like_id).distinct()
+        ).scalars())
+        dirty.update(db.execute(
+            select(models.Attempt.quiz_id)
+            .where(models.Attempt.id > last_attempt_id, models.Attempt.id <= max_attempt_id).distinct()
+        ).scalars())
+        if not dirty:
+            return 0
+
+    xn, xnt = _build_matrix(db, max_like_id, max_attempt_id)
+
+    if full:
+        items = np.flatnonzero(np.diff(xn.tocsc().indptr))  # квизы хоть с одним взаимодействием
+        updated = _store(db, _top_k_rows(xn, xnt, items))
+        # квизы, у которых не осталось ни лайков, ни попыток (все лайки сняты)
+        engaged = select(models.Like.quiz_id).union(select(models.Attempt.quiz_id))
+        db.execute(delete(models.QuizNeighbor).where(models.QuizNeighbor.quiz_id.not_in(engaged)))
+    else:
+        # строки грязных квизов считаем целиком; по симметрии они же дают
+        # новые значения близости для всех затронутых квизов
+        dirty_ids = np.array(sorted(q for q in dirty if q < xn.shape[1]), dtype=np.int64)
+        updated = _store(db, _top_k_rows(xn, xnt, dirty_ids))
+        sims_t = (xnt[dirty_ids] @ xn).T.tocsr()
+        affected = np.setdiff1d(np.flatnonzero(np.diff(sims_t.indptr)), dirty_ids)
+        updated += _store(db, _merge_affected(db, sims_t, dirty_ids, affected))
+
+    set_cursor(db, JOB, "likes", max_like_id)
+    set_cursor(db, JOB, "attempts", max_attempt_id)
+    db.commit()
+    return updated
+
+
+def recommend(db: Session, user_id: int, limit: int = 20) -> List[Tuple[int, float]]:
+    """
+    Ранжирует квизы для пользователя: сумма близостей к его последним
+    лайкам (вес LIKE_WEIGHT) и попыткам (ATTEMPT_WEIGHT). Возвращает (quiz_id, score).
+    """
+    liked = db.execute(
+        select(models.Like.quiz_id)
+        .where(models.Like.user_id == user_id)
+        .order_by(models.Like.id.desc())
+        .limit(SEED_LIMIT)
+    ).scalars().all()
+    attempted = db.execute(
+        select(models.Attempt.quiz_id)
+        .where(models.Attempt.user_id == user_id)
+        .order_by(models.Attempt.id.desc())
+        .limit(SEED_LIMIT)
+    ).scalars().all()
+
+    seed_weight: Dict[int, float] = {}
+    for qid in attempted:
+        seed_weight[qid] = ATTEMPT_WEIGHT
+    for qid in liked:
+        seed_weight[qid] = max(seed_weight.get(qid, 0.0), LIKE_WEIGHT)
+    if not seed_weight:
+        return []
+
+    scores: Dict[int, float] = {}
+    for quiz_id, neighbor_id, score in db.execute(
+        select(models.QuizNeighbor.quiz_id, models.QuizNeighbor.neighbor_id, models.QuizNeighbor.score)
+        .where(models.QuizNeighbor.quiz_id.in_(list(seed_weight)))
+    ):
+        if neighbor_id in seed_weight:
+            continue
+        scores[neighbor_id] = scores.get(neighbor_id, 0.0) + seed_weight[quiz_id] * score
+    if not scores:
+        return []
+
+    # уберём то, что пользователь уже лайкал (старше затравки), свои и удалённые квизы
+    candidates = list(scores)
+    seen = set(db.execute(
+        select(models.Like.quiz_id)
+        .where(models.Like.user_id == user_id, models.Like.quiz_id.in_(candidates))
+    ).scalars())
+    seen.update(db.execute(
+        select(models.Quiz.id)
+        .where(
+            models.Quiz.id.in_(candidates),
+            or_(models.Quiz.owner_id == user_id, models.Quiz.deleted_at.isnot(None)),
+        )
+    ).scalars())
+
+    ranked = sorted(
+        ((q, s) for q, s in scores.items() if q not in seen),
+        key=lambda item: (-item[1], -item[0]),
+    )
+    return ranked[:limit]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from ..database import SessionLocal, sync_schema
+
+    parser = argparse.ArgumentParser(description="Пересчёт соседей для рекомендаций")
+    parser.add_argument("--full", action="store_true", help="полный пересчёт вместо инкрементального")
+    args = parser.parse_args(argv)
+
+    sync_schema()
+    db = SessionLocal()
+    try:
+        updated = refresh(db, full=args.full)
+    finally:
+        db.close()
+    print(f"updated neighbours for {updated} quizzes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Повторение ошибок по SM-2.
+
+Вопрос, на который пользователь ответил неправильно, становится карточкой
+в его очереди. Дальше каждый ответ (в попытке квиза или в режиме практики)
+пересчитывает карточку по SM-2: правильный — интервал 1, 6, затем
+interval * EF дней; ошибка — сброс повторений, EF -0.54 (не ниже 1.3)
+и повтор через RELEARN_SECONDS (новая карточка доступна сразу).
+
+Хранение: одна строка review_states на (пользователь, квиз), карточки —
+упакованный массив CARD_DTYPE (18 байт на карточку, по возрастанию question_id),
+next_due — минимальный срок. Запись попытки — чтение одной строки по PK
+и её перезапись, без обращения к истории ответов. «Следующие N» — один
+диапазонный запрос по индексу (user_id, next_due): в каждой строке с
+next_due <= now есть хотя бы одна просроченная карточка, а у невыбранных
+строк сроки не раньше последней выбранной, так что N строк всегда хватает.
+
+Заполнение по истории попыток (для пар без строки):
+    python -m app.services.review_queue
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .columnar import fetch_int_array
+
+CARD_DTYPE = np.dtype([
+    ("question_id", "<i4"),
+    ("due", "<i8"),        # unix-секунды
+    ("interval", "<u2"),   # дни; 0 — карточка переучивается
+    ("ef", "<u2"),         # EF * 100
+    ("reps", "<u1"),       # правильных подряд
+    ("lapses", "<u1"),     # сколько раз ошибались (насыщается на 255)
+])
+
+DAY = 86400
+RELEARN_SECONDS = 10 * 60
+INITIAL_EF = 250
+MIN_EF = 130
+MAX_INTERVAL_DAYS = 3650
+# ответы бинарные: правильный — оценка 4, ошибка — 1
+EF_DELTA_CORRECT = 0    # 100 * (0.1 - 1 * (0.08 + 1 * 0.02))
+EF_DELTA_WRONG = -54    # 100 * (0.1 - 4 * (0.08 + 4 * 0.02))
+BACKFILL_BATCH = 50_000
+
+_EMPTY = np.zeros(0, dtype=CARD_DTYPE)
+
+
+class DueCard(NamedTuple):
+    quiz_id: int
+    question_id: int
+    due: int
+    reps: int
+    lapses: int
+
+
+def epoch(dt: Optional[datetime] = None) -> int:
+    if dt is None:
+        return int(time.time())
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=CARD_DTYPE).copy()
+
+
+def encode(cards: np.ndarray) -> bytes:
+    return cards.astype(CARD_DTYPE, copy=False).tobytes()
+
+
+def grade(cards: np.ndarray, question_ids: np.ndarray, correct: np.ndarray, now: int) -> np.ndarray:
+    """
+    Применяет ответы одной попытки (question_id уникальны) к отсортированным карточкам.
+    Неправильно отвеченные вопросы без карточки добавляются; правильные без карточки — нет.
+    """
+    question_ids = np.asarray(question_ids, dtype=np.int32)
+    correct = np.asarray(correct, dtype=bool)
+
+    pos = np.searchsorted(cards["question_id"], question_ids)
+    known = pos < len(cards)
+    known[known] = cards["question_id"][pos[known]] == question_ids[known]
+    fresh = question_ids[~known & ~correct]
+    if len(fresh):
+        new = np.zeros(len(fresh), dtype=CARD_DTYPE)
+        new["question_id"] = fresh
+        new["ef"] = INITIAL_EF
+        cards = np.concatenate([cards, new])
+        cards = cards[np.argsort(cards["question_id"], kind="stable")]
+        pos = np.searchsorted(cards["question_id"], question_ids)
+        known = pos < len(cards)
+        known[known] = cards["question_id"][pos[known]] == question_ids[known]
+
+    idx, ok = pos[known], correct[known]
+    if not len(idx):
+        return cards
+    c = cards[idx]
+    # новая карточка доступна сразу, повторная ошибка — через RELEARN_SECONDS
+    relearn = np.where(np.isin(c["question_id"], fresh), 0, RELEARN_SECONDS)
+
+    reps = np.where(ok, np.minimum(c["reps"].astype(np.int64) + 1, 255), 0)
+    ef = np.maximum(c["ef"].astype(np.int64) + np.where(ok, EF_DELTA_CORRECT, EF_DELTA_WRONG), MIN_EF)
+    grown = np.rint(c["interval"].astype(np.int64) * c["ef"] / 100).astype(np.int64)
+    interval = np.where(reps == 1, 1, np.where(reps == 2, 6, grown))
+    interval = np.where(ok, np.clip(interval, 1, MAX_INTERVAL_DAYS), 0)
+
+    c["reps"] = reps
+    c["ef"] = ef
+    c["interval"] = interval
+    c["lapses"] = np.where(ok, c["lapses"], np.minimum(c["lapses"].astype(np.int64) + 1, 255))
+    c["due"] = np.where(ok, now + interval * DAY, now + relearn)
+    cards[idx] = c
+    return cards
+
+
+def _store(db: Session, state: Optional[models.ReviewState], user_id: int, quiz_id: int, cards: np.ndarray):
+    if not len(cards):
+        if state is not None:
+            db.delete(state)
+        return
+    if state is None:
+        state = models.ReviewState(user_id=user_id, quiz_id=quiz_id)
+        db.add(state)
+    state.cards = encode(cards)
+    state.next_due = int(cards["due"].min())
+
+
+def record_attempt(
+    db: Session,
+    user_id: int,
+    quiz_id: int,
+    answers: Iterable[Tuple[int, bool]],
+    answered_at: Optional[datetime] = None,
+) -> None:
+    """Учитывает ответы одной попытки: (question_id, is_correct). Не коммитит."""
+    record_attempts(db, user_id, [(quiz_id, answered_at, answers)])
+
+
+def record_attempts(
+    db: Session,
+    user_id: int,
+    attempts: Iterable[Tuple[int, Optional[datetime], Iterable[Tuple[int, bool]]]],
+) -> None:
+    """
+    Пакетный вариант для одного пользователя: (quiz_id, answered_at, answers).
+    Строки всех затронутых квизов читаются одним запросом; попытки
+    применяются в порядке answered_at. Не коммитит.
+    """
+    batch = []
+    for quiz_id, answered_at, answers in attempts:
+        answers = list(answers)
+        if answers:
+            batch.append((epoch(answered_at), quiz_id, answers))
+    if not batch:
+        return
+    batch.sort(key=lambda t: t[0])
+
+    states = {
+        s.quiz_id: s
+        for s in db.query(models.ReviewState).filter(
+            models.ReviewState.user_id == user_id,
+            models.ReviewState.quiz_id.in_({quiz_id for _, quiz_id, _ in batch}),
+        )
+    }
+    cards: Dict[int, np.ndarray] = {quiz_id: decode(s.cards) for quiz_id, s in states.items()}
+    for now, quiz_id, answers in batch:
+        qids = np.fromiter((a[0] for a in answers), dtype=np.int32, count=len(answers))
+        ok = np.fromiter((bool(a[1]) for a in answers), dtype=bool, count=len(answers))
+        cards[quiz_id] = grade(cards.get(quiz_id, _EMPTY), qids, ok, now)
+    for quiz_id, quiz_cards in cards.items():
+        _store(db, states.get(quiz_id), user_id, quiz_id, quiz_cards)
+
+
+def due(db: Session, user_id: int, limit: int, now: Optional[int] = None) -> List[DueCard]:
+    """До limit просроченных карточек, самые давние первыми. Один диапазонный запрос."""
+    now = epoch() if now is None else now
+    rows = db.execute(
+        select(models.ReviewState.quiz_id, models.ReviewState.cards)
+        .join(models.Quiz, models.Quiz.id == models.ReviewState.quiz_id)
+        .where(
+            models.ReviewState.user_id == user_id,
+            models.ReviewState.next_due <= now,
+            models.Quiz.deleted_at.is_(None),
+        )
+        .order_by(models.ReviewState.next_due)
+        .limit(limit)
+    ).all()
+    out: List[DueCard] = []
+    for quiz_id, blob in rows:
+        cards = decode(blob)
+        for c in cards[cards["due"] <= now]:
+            out.append(DueCard(quiz_id, int(c["question_id"]), int(c["due"]), int(c["reps"]), int(c["lapses"])))
+    out.sort(key=lambda c: (c.due, c.quiz_id, c.question_id))
+    return out[:limit]
+
+
+def prune_retired(db: Session, quiz_id: int) -> int:
+    """
+    Убирает из очередей всех пользователей карточки вопросов квиза, снятых
+    правкой (retired_at). Вызывается там, где вопросы снимаются, в той же
+    транзакции — иначе такие карточки навсегда остаются «просроченными» и
+    занимают выборку due(). Возвращает число изменённых строк. Не коммитит.
+    """
+    live = fetch_int_array(db, select(models.Question.id).where(
+        models.Question.quiz_id == quiz_id, models.Question.retired_at.is_(None),
+    ), 1)[:, 0]
+    changed = 0
+    for state in db.query(models.ReviewState).filter(models.ReviewState.quiz_id == quiz_id):
+        cards = decode(state.cards)
+        keep = cards[np.isin(cards["question_id"], live)]
+        if len(keep) < len(cards):
+            _store(db, state, state.user_id, quiz_id, keep)
+            changed += 1
+    return changed
+
+
+def backfill(db: Session, batch_size: int = BACKFILL_BATCH) -> int:
+    """
+    Строит очереди по истории attempt_answers для пар (пользователь, квиз),
+    у которых строки ещё нет. Ответы читаются keyset-пакетами по id и
+    проигрываются по попыткам. Возвращает число созданных строк.
+    """
+    aa, at = models.AttemptAnswer, models.Attempt
+    existing = set(db.execute(select(models.ReviewState.user_id, models.ReviewState.quiz_id)).tuples())
+    max_id = db.execute(select(func.max(aa.id))).scalar() or 0
+
+    cards: Dict[Tuple[int, int], np.ndarray] = {}
+    last_id = 0
+    while last_id < max_id:
+        batch = fetch_int_array(
+            db,
+            select(
+                aa.id, at.id, at.user_id, at.quiz_id,
+                func.coalesce(cast(func.strftime("%s", at.created_at), Integer), 0),
+                aa.question_id, aa.is_correct,
+            )
+            .join(at, at.id == aa.attempt_id)
+            .where(aa.id > last_id, aa.id <= max_id)
+            .order_by(aa.id)
+            .limit(batch_size),
+            7,
+        )
+        if not len(batch):
+            break
+        # границы попыток внутри пакета; попытка на стыке пакетов проигрывается двумя
+        # частями — вопросы в них разные, результат тот же
+        starts = np.flatnonzero(np.r_[True, batch[1:, 1] != batch[:-1, 1]])
+        ends = np.r_[starts[1:], len(batch)]
+        for s, e in zip(starts.tolist(), ends.tolist()):
+            _, _, user_id, quiz_id, answered_at, _, _ = batch[s].tolist()
+            pair = (user_id, quiz_id)
+            if pair in existing:
+                continue
+            known = cards.get(pair)
+            wrong = batch[s:e, 6] == 0
+            if known is None and not wrong.any():
+                continue
+            cards[pair] = grade(_EMPTY if known is None else known, batch[s:e, 5], ~wrong, answered_at)
+        last_id = int(batch[-1, 0])
+
+    rows = [
+        {"user_id": u, "quiz_id": q, "cards": encode(c), "next_due": int(c["due"].min())}
+        for (u, q), c in cards.items()
+        if len(c)
+    ]
+    for i in range(0, len(rows), batch_size):
+        db.execute(models.ReviewState.__table__.insert(), rows[i:i + batch_size])
+    db.commit()
+    return len(rows)
+
+
+def main() -> None:
+    from ..database import SessionLocal, sync_schema
+
+    parser = argparse.ArgumentParser(description="Очереди повторения по истории попыток")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH)
+    args = parser.parse_args()
+
+    sync_schema()
+    db = SessionLocal()
+    try:
+        done = backfill(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"review queues: {done} created")
+
+
+if __name__ == "__main__":
+    main()
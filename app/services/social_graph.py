@@ -0,0 +1,303 @@
+"""
+Граф подписок в памяти процесса: «кого читать» (друзья друзей), списки
+подписчиков/подписок, счётчики и проверка «подписан ли».
+
+База — два CSR из таблицы follows: исходящие рёбра (по follower_id) и входящие
+(по following_id). В каждом indptr (int64) и отсортированные строки indices
+(int32). Подписки/отписки после сборки кладутся в небольшой оверлей delta:
+строка источника -> (added, removed) из frozenset. Запись под блокировкой
+писателя заменяет целиком только свою строку (copy-on-write по строке, а не
+по всему оверлею), фон периодически пересобирает CSR. Читатели берут строку
+одним обращением к словарю, без блокировок. Счётчик — O(1)
+(длина строки ± оверлей), проверка ребра — бинарный поиск по строке.
+
+Каждый воркер держит свой индекс; источник истины — база. Изменения из
+соседних процессов становятся видны после пересборки: фоновой задачей или
+сами, когда индекс старше FOLLOW_GRAPH_MAX_AGE_SECONDS. Свою подписку или
+отписку роутер кладёт в оверлей синхронно, сразу после commit (add_edge /
+remove_edge), так что флажки is_following / follows_me зрителя в том же
+воркере обновляются без SQL и без ожидания пересборки.
+"""
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core.config import FOLLOW_GRAPH_MAX_AGE_SECONDS
+from .columnar import fetch_int_array
+
+logger = logging.getLogger("quizogram.social_graph")
+
+MAX_FOF_EDGES = 1_000_000  # потолок рёбер второго круга на один запрос
+
+_Delta = Tuple[FrozenSet[int], FrozenSet[int]]  # (added, removed) одной строки
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+_NO_DELTA: "_Delta" = (frozenset(), frozenset())
+
+
+class _Adjacency(NamedTuple):
+    indptr: np.ndarray
+    indices: np.ndarray
+    delta: Dict[int, _Delta]  # added — только рёбра не из базы, removed — только из базы
+
+
+class _State(NamedTuple):
+    out: _Adjacency  # на кого подписан
+    inc: _Adjacency  # кто подписан
+
+
+def _empty_adjacency() -> _Adjacency:
+    return _Adjacency(np.zeros(1, dtype=np.int64), _EMPTY, {})
+
+
+def _build_csr(edges: np.ndarray) -> _Adjacency:
+    """edges: (n, 2) пар (src, dst) -> CSR по src, строки отсортированы."""
+    if not len(edges):
+        return _empty_adjacency()
+    order = np.lexsort((edges[:, 1], edges[:, 0]))
+    edges = edges[order]
+    counts = np.bincount(edges[:, 0])
+    indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return _Adjacency(indptr, edges[:, 1].astype(np.int32), {})
+
+
+def _base_row(adj: _Adjacency, node: int) -> np.ndarray:
+    if node + 1 >= len(adj.indptr):
+        return _EMPTY
+    return adj.indices[adj.indptr[node]:adj.indptr[node + 1]]
+
+
+def _in_sorted(row: np.ndarray, value: int) -> bool:
+    i = np.searchsorted(row, value)
+    return bool(i < len(row) and row[i] == value)
+
+
+def _apply(adj: _Adjacency, is_add: bool, src: int, dst: int) -> None:
+    """Меняет строку src в оверлее на новую; остальные строки не копируются. Под блокировкой писателя."""
+    in_base = _in_sorted(_base_row(adj, src), dst)
+    added, removed = adj.delta.get(src, _NO_DELTA)
+    if is_add:
+        removed = removed - {dst}
+        if not in_base:
+            added = added | {dst}
+    else:
+        added = added - {dst}
+        if in_base:
+            removed = removed | {dst}
+    if added or removed:
+        adj.delta[src] = (added, removed)
+    else:
+        adj.delta.pop(src, None)
+
+
+def _row(adj: _Adjacency, node: int) -> np.ndarray:
+    row = _base_row(adj, node)
+    added, removed = adj.delta.get(node, _NO_DELTA)
+    if added:
+        row = np.union1d(row, np.fromiter(added, dtype=np.int32))
+    if removed:
+        row = np.setdiff1d(row, np.fromiter(removed, dtype=np.int32), assume_unique=True)
+    return row
+
+
+def _has_edge(adj: _Adjacency, src: int, dst: int) -> bool:
+    added, removed = adj.delta.get(src, _NO_DELTA)
+    if dst in added:
+        return True
+    if dst in removed:
+        return False
+    return _in_sorted(_base_row(adj, src), dst)
+
+
+def _degree(adj: _Adjacency, node: int) -> int:
+    base = int(adj.indptr[node + 1] - adj.indptr[node]) if node + 1 < len(adj.indptr) else 0
+    added, removed = adj.delta.get(node, _NO_DELTA)
+    return base + len(added) - len(removed)
+
+
+def _page(adj: _Adjacency, node: int, after: int, limit: int) -> Tuple[List[int], Optional[int]]:
+    """Id по возрастанию строго после after; второй элемент — курсор следующей страницы."""
+    row = _row(adj, node)
+    start = int(np.searchsorted(row, after, side="right"))
+    page = row[start:start + limit].tolist()
+    next_after = page[-1] if start + limit < len(row) else None
+    return page, next_after
+
+
+class FollowGraph:
+    def __init__(self, max_age_seconds: float = FOLLOW_GRAPH_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._write_lock = threading.Lock()
+        self._load_lock = threading.RLock()  # одна пересборка за раз
+        self._state = _State(_empty_adjacency(), _empty_adjacency())
+        self._journal: Optional[List[Tuple[bool, int, int]]] = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self.loaded = False
+
+    # ---------- сборка ----------
+
+    def load(self, db: Session) -> None:
+        """
+        Полная пересборка из follows. Изменения, пришедшие во время чтения,
+        пишутся в журнал и применяются поверх новой базы (операции идемпотентны).
+        """
+        with self._load_lock:
+            with self._write_lock:
+                self._journal = []
+            try:
+                edges = fetch_int_array(db, select(models.Follow.follower_id, models.Follow.following_id), 2)
+                out = _build_csr(edges)
+                inc = _build_csr(edges[:, ::-1])
+            except Exception:
+                with self._write_lock:
+                    self._journal = None
+                raise
+
+            with self._write_lock:
+                journal, self._journal = self._journal, None
+                for is_add, src, dst in journal:
+                    _apply(out, is_add, src, dst)
+                    _apply(inc, is_add, dst, src)
+                self._state = _State(out, inc)
+                self._loaded_at = time.monotonic()
+                self.loaded = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Первый вызов грузит синхронно; устаревший индекс пересобирается фоном."""
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load(db)
+        elif time.monotonic() - self._loaded_at > self.max_age_seconds:
+            self._refresh_in_background()
+
+    def _refresh_in_background(self) -> None:
+        with self._write_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            from ..database import SessionLocal
+
+            db = SessionLocal()
+            try:
+                self.load(db)
+            except Exception:
+                logger.exception("follow graph refresh failed")
+            finally:
+                db.close()
+                with self._write_lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="follow-graph-refresh", daemon=True).start()
+
+    # ---------- изменения (вызываются роутерами после commit) ----------
+
+    def add_edge(self, follower_id: int, following_id: int) -> None:
+        self._record(True, follower_id, following_id)
+
+    def remove_edge(self, follower_id: int, following_id: int) -> None:
+        self._record(False, follower_id, following_id)
+
+    def _record(self, is_add: bool, src: int, dst: int) -> None:
+        with self._write_lock:
+            if self._journal is not None:
+                self._journal.append((is_add, src, dst))
+            if self.loaded:
+                st = self._state
+                _apply(st.out, is_add, src, dst)
+                _apply(st.inc, is_add, dst, src)
+
+    # ---------- чтение ----------
+
+    def following(self, user_id: int) -> np.ndarray:
+        """Отсортированный массив id, на кого подписан user_id."""
+        return _row(self._state.out, user_id)
+
+    def followers(self, user_id: int) -> np.ndarray:
+        """Отсортированный массив id подписчиков user_id."""
+        return _row(self._state.inc, user_id)
+
+    def following_page(self, user_id: int, after: int = 0, limit: int = 50) -> Tuple[List[int], Optional[int]]:
+        return _page(self._state.out, user_id, after, limit)
+
+    def followers_page(self, user_id: int, after: int = 0, limit: int = 50) -> Tuple[List[int], Optional[int]]:
+        return _page(self._state.inc, user_id, after, limit)
+
+    def counts(self, user_id: int) -> Tuple[int, int]:
+        """(подписчиков, подписок)."""
+        st = self._state
+        return _degree(st.inc, user_id), _degree(st.out, user_id)
+
+    def is_following(self, follower_id: int, following_id: int) -> bool:
+        return _has_edge(self._state.out, follower_id, following_id)
+
+    def is_mutual(self, a: int, b: int) -> bool:
+        st = self._state
+        return _has_edge(st.out, a, b) and _has_edge(st.out, b, a)
+
+    def suggest(self, user_id: int, limit: int = 20) -> List[Tuple[int, int]]:
+        """
+        Друзья друзей: (user_id, сколько моих подписок на него подписано),
+        по убыванию счётчика. Без меня и тех, на кого я уже подписан.
+        """
+        st = self._state.out
+        mine = _row(st, user_id)
+        if not len(mine):
+            return []
+
+        # строки базы для всех моих подписок — одним векторным gather
+        in_base = mine[mine + 1 < len(st.indptr)].astype(np.int64)
+        starts = st.indptr[in_base]
+        lens = st.indptr[in_base + 1] - starts
+        sampled = None
+        if lens.sum() > MAX_FOF_EDGES:
+            # очень широкий круг: берём детерминированную выборку подписок
+            rng = np.random.default_rng(user_id)
+            pick = rng.permutation(len(in_base))
+            pick = pick[np.cumsum(lens[pick]) <= MAX_FOF_EDGES]
+            in_base, starts, lens = in_base[pick], starts[pick], lens[pick]
+            sampled = set(in_base.tolist())
+        total = int(lens.sum())
+        offsets = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+        second = st.indices[offsets + np.arange(total)]
+
+        extra_add: List[int] = []
+        extra_remove: List[int] = []
+        for src, (added, removed) in list(st.delta.items()):  # список — снимок: писатель меняет словарь на месте
+            follows_src = (src in sampled) if sampled is not None else _in_sorted(mine, src)
+            if follows_src:
+                extra_add.extend(added)
+                extra_remove.extend(removed)
+
+        size = max(int(second.max()) if total else 0, max(extra_add, default=0), user_id) + 1
+        counts = np.bincount(second, minlength=size)
+        if extra_add:
+            counts += np.bincount(np.asarray(extra_add), minlength=size)
+        if extra_remove:
+            counts -= np.bincount(np.asarray(extra_remove), minlength=size)
+
+        counts[user_id] = 0
+        counts[mine[mine < size]] = 0
+        candidates = np.flatnonzero(counts > 0)
+        if len(candidates) > limit:
+            top = np.argpartition(-counts[candidates], limit)[:limit]
+            candidates = candidates[top]
+        order = np.lexsort((candidates, -counts[candidates]))
+        return [(int(u), int(counts[u])) for u in candidates[order]]
+
+
+graph = FollowGraph()
+
+
+def rebuild(db: Session) -> None:
+    graph.load(db)
@@ -0,0 +1,248 @@
+"""
+Теги квизов: нормализованная связь многие-ко-многим (tags + quiz_tags).
+
+- slug — имя в нижнем регистре, всё кроме букв и цифр схлопывается в «-»:
+  «Math», « math » и «MATH!» — один тег;
+- tags.quiz_count меняется той же транзакцией, что и связи (создание, правка,
+  мягкое удаление квиза), поэтому облако тегов читается без COUNT;
+- квизы тега — keyset по покрывающему индексу (tag_id, quiz_id DESC):
+  quiz_id < before, от новых к старым, без OFFSET;
+- несколько тегов (И) — пересечение отсортированных списков id, а не
+  GROUP BY ... HAVING COUNT = N по всем строкам всех тегов. Ведёт самый
+  редкий тег: его id читаются окнами по INTERSECT_CHUNK, остальные теги
+  сужают окно по очереди — диапазон своего индекса в границах окна и
+  слияние в numpy, а если тег намного больше кандидатов (PROBE_RATIO) —
+  точечные поиски кандидатов по PK (quiz_id, tag_id).
+
+Теги по встроенным обложкам для квизов без тегов (снимки версий не
+переиздаются — теги попадут в GET /quizzes/{id} со следующей правкой):
+    python -m app.services.tags --from-thumbnails
+Пересчитать quiz_count с нуля:
+    python -m app.services.tags --recount
+"""
+import argparse
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, literal, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from .columnar import fetch_int_array
+
+MAX_TAG_LENGTH = 50
+INTERSECT_CHUNK = 1000
+PROBE_RATIO = 8
+
+# встроенные обложки, которые однозначно указывают на тему
+THUMBNAIL_TAGS = {
+    "thumb_book.png": "Литература",
+    "thumb_brain.png": "Логика",
+    "thumb_earth.png": "География",
+    "thumb_gamepad.png": "Игры",
+    "thumb_lightning.png": "Блиц",
+    "thumb_music.png": "Музыка",
+    "thumb_pi.png": "Математика",
+    "thumb_science.png": "Наука",
+    "thumb_scroll.png": "История",
+    "thumb_trophy.png": "Спорт",
+}
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+class InvalidTag(ValueError):
+    pass
+
+
+def normalize(name: str) -> str:
+    slug = _SEPARATORS.sub("-", name.strip().lower()).strip("-")
+    if not slug or len(slug) > MAX_TAG_LENGTH:
+        raise InvalidTag(f"Invalid tag {name!r}")
+    return slug
+
+
+def _ensure(db: Session, names: Dict[str, str]) -> Dict[str, int]:
+    """slug -> id; недостающие теги создаются (гонка двух авторов разрешается ON CONFLICT)."""
+    if not names:
+        return {}
+    db.execute(
+        insert(models.Tag).on_conflict_do_nothing(index_elements=["slug"]),
+        [{"slug": slug, "name": name, "quiz_count": 0} for slug, name in names.items()],
+    )
+    return dict(db.execute(select(models.Tag.slug, models.Tag.id).where(models.Tag.slug.in_(names))).all())
+
+
+def _bump(db: Session, tag_ids: Iterable[int], delta: int) -> None:
+    tag_ids = list(tag_ids)
+    if tag_ids:
+        db.execute(
+            update(models.Tag).where(models.Tag.id.in_(tag_ids))
+            .values(quiz_count=models.Tag.quiz_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def set_tags(db: Session, quiz: models.Quiz, names: Iterable[str]) -> None:
+    """Заменяет набор тегов квиза; счётчики двигаются только у изменившихся. Не коммитит."""
+    wanted: Dict[str, str] = {}
+    for name in names:
+        wanted.setdefault(normalize(name), " ".join(name.split())[:MAX_TAG_LENGTH])
+    ids = set(_ensure(db, wanted).values())
+    current = set(db.execute(select(models.QuizTag.tag_id).where(models.QuizTag.quiz_id == quiz.id)).scalars())
+
+    added, removed = ids - current, current - ids
+    if added:
+        db.execute(models.QuizTag.__table__.insert(), [{"quiz_id": quiz.id, "tag_id": t} for t in added])
+    if removed:
+        db.execute(delete(models.QuizTag).where(models.QuizTag.quiz_id == quiz.id, models.QuizTag.tag_id.in_(removed)))
+    _bump(db, added, 1)
+    _bump(db, removed, -1)
+    db.expire(quiz, ["tags"])
+
+
+def remove_quiz(db: Session, quiz_id: int) -> None:
+    """Мягкое удаление квиза: связи убираются сразу, счётчики уменьшаются. Не коммитит."""
+    tag_ids = list(db.execute(select(models.QuizTag.tag_id).where(models.QuizTag.quiz_id == quiz_id)).scalars())
+    if tag_ids:
+        db.execute(delete(models.QuizTag).where(models.QuizTag.quiz_id == quiz_id))
+        _bump(db, tag_ids, -1)
+
+
+def resolve(db: Session, names: Iterable[str]) -> Optional[List[models.Tag]]:
+    """Теги по именам; None, если какого-то нет (пересечение заведомо пустое)."""
+    slugs = {normalize(n) for n in names}
+    tags = db.query(models.Tag).filter(models.Tag.slug.in_(slugs)).all()
+    return tags if len(tags) == len(slugs) else None
+
+
+def popular(db: Session, limit: int) -> List[models.Tag]:
+    return (
+        db.query(models.Tag)
+          .filter(models.Tag.quiz_count > 0)
+          .order_by(models.Tag.quiz_count.desc(), models.Tag.slug)
+          .limit(limit).all()
+    )
+
+
+# ---------- выборка квизов ----------
+
+def _range(db: Session, tag_id: int, upper: Optional[int], lower: Optional[int] = None,
+           limit: Optional[int] = None) -> np.ndarray:
+    """id квизов тега в [lower, upper) по возрастанию; с limit — limit самых новых."""
+    qt = models.QuizTag
+    stmt = select(qt.quiz_id).where(qt.tag_id == tag_id)
+    if upper is not None:
+        stmt = stmt.where(qt.quiz_id < upper)
+    if lower is not None:
+        stmt = stmt.where(qt.quiz_id >= lower)
+    stmt = stmt.order_by(qt.quiz_id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return fetch_int_array(db, stmt, 1)[::-1, 0]
+
+
+def _probe(db: Session, tag_id: int, candidates: np.ndarray) -> np.ndarray:
+    qt = models.QuizTag
+    found = fetch_int_array(
+        db, select(qt.quiz_id).where(qt.tag_id == tag_id, qt.quiz_id.in_(candidates.tolist())), 1,
+    )[:, 0]
+    return candidates[np.isin(candidates, found, assume_unique=True)]
+
+
+def _intersect_sorted(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Общие элементы двух возрастающих списков без повторов (бинпоиск меньшего в большем)."""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a) or not len(b):
+        return a[:0]
+    pos = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[pos] == a]
+
+
+def quiz_ids(db: Session, tags: List[models.Tag], before: Optional[int], limit: int) -> List[int]:
+    """id живых квизов со всеми тегами, от новых к старым, строго меньше before."""
+    if not tags:
+        return []
+    tags = sorted(tags, key=lambda t: t.quiz_count)
+    lead, rest = tags[0], tags[1:]
+    if not rest:
+        return _range(db, lead.id, before, limit=limit)[::-1].tolist()
+
+    out: List[int] = []
+    upper = before
+    while len(out) < limit:
+        window = _range(db, lead.id, upper, limit=INTERSECT_CHUNK)
+        if not len(window):
+            break
+        candidates = window
+        for tag in rest:
+            if tag.quiz_count > PROBE_RATIO * len(candidates):
+                candidates = _probe(db, tag.id, candidates)
+            else:
+                candidates = _intersect_sorted(candidates, _range(db, tag.id, upper, lower=int(window[0])))
+            if not len(candidates):
+                break
+        out.extend(candidates[::-1].tolist())
+        if len(window) < INTERSECT_CHUNK:
+            break
+        upper = int(window[0])
+    return out[:limit]
+
+
+# ---------- обслуживание ----------
+
+def recount(db: Session) -> None:
+    db.execute(update(models.Tag).values(
+        quiz_count=select(func.count()).where(models.QuizTag.tag_id == models.Tag.id).scalar_subquery()
+    ))
+    db.commit()
+
+
+def tag_from_thumbnails(db: Session) -> int:
+    """Живым квизам без тегов — тег по встроенной обложке. Возвращает число новых связей."""
+    q, qt = models.Quiz, models.QuizTag
+    ids = _ensure(db, {normalize(name): name for name in THUMBNAIL_TAGS.values()})
+    tagged = select(qt.quiz_id)
+    added = 0
+    for key, name in THUMBNAIL_TAGS.items():
+        tag_id = ids[normalize(name)]
+        added += db.execute(
+            qt.__table__.insert().from_select(
+                ["quiz_id", "tag_id"],
+                select(q.id, literal(tag_id)).where(
+                    q.thumbnail_key == key, q.deleted_at.is_(None), q.id.not_in(tagged),
+                ),
+            )
+        ).rowcount
+    db.commit()
+    recount(db)
+    return added
+
+
+def main() -> None:
+    from ..database import SessionLocal, sync_schema
+
+    parser = argparse.ArgumentParser(description="Обслуживание тегов квизов")
+    parser.add_argument("--from-thumbnails", action="store_true", help="проставить теги по встроенным обложкам")
+    parser.add_argument("--recount", action="store_true", help="пересчитать quiz_count")
+    args = parser.parse_args()
+    if not (args.from_thumbnails or args.recount):
+        parser.error("nothing to do")
+
+    sync_schema()
+    db = SessionLocal()
+    try:
+        if args.from_thumbnails:
+            print(f"tagged by thumbnail: {tag_from_thumbnails(db)}")
+        elif args.recount:
+            recount(db)
+            print("tag counts recomputed")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
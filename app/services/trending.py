@@ -0,0 +1,105 @@
+"""
+Trending: экспоненциально затухающий счёт по лайкам, попыткам и созданию квиза.
+
+score(t) = Σ w_i · 2^(-(t - t_i) / half_life)
+
+Историю заново не читаем: на каждом пересчёте все сохранённые счёты
+умножаются на 2^(-Δt / half_life) одним UPDATE, а новые события (по водяным
+знакам id) добавляются с весом, уже затухшим от момента события до «сейчас».
+Снятые лайки не вычитаются — их вклад просто затухает.
+Затем перезаписывается готовый top-K (trending_top), из которого читает API.
+"""
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core.config import TRENDING_HALF_LIFE_HOURS
+from .jobs import get_cursor, set_cursor
+
+JOB = "trending"
+TOP_K = 100
+LIKE_WEIGHT = 1.0
+ATTEMPT_WEIGHT = 0.5
+CREATED_WEIGHT = 2.0        # свежий квиз получает стартовый импульс
+MIN_SCORE = 1e-3            # всё, что затухло ниже, удаляем
+EVENT_BATCH = 50_000
+
+
+def _decay_factor(seconds: float) -> float:
+    return 0.5 ** (max(seconds, 0.0) / (TRENDING_HALF_LIFE_HOURS * 3600.0))
+
+
+def _to_epoch(value: datetime) -> float:
+    if value.tzinfo is None:  # SQLite отдаёт CURRENT_TIMESTAMP без зоны, это UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _collect(
+    db: Session, model, quiz_col, cursor: str, weight: float, now: float, acc: Dict[int, float],
+) -> None:
+    """Добавляет в acc затухшие вклады новых строк model (id > водяного знака)."""
+    last_id = get_cursor(db, JOB, cursor)
+    max_id = db.execute(select(func.max(model.id))).scalar() or 0
+    while last_id < max_id:
+        rows = db.execute(
+            select(model.id, quiz_col, model.created_at)
+            .where(model.id > last_id, model.id <= max_id)
+            .order_by(model.id)
+            .limit(EVENT_BATCH)
+        ).all()
+        if not rows:
+            break
+        for _, quiz_id, created_at in rows:
+            if created_at is None:  # старые квизы до появления quizzes.created_at — без импульса
+                continue
+            acc[quiz_id] = acc.get(quiz_id, 0.0) + weight * _decay_factor(now - _to_epoch(created_at))
+        last_id = rows[-1][0]
+    set_cursor(db, JOB, cursor, max_id)
+
+
+def refresh(db: Session, now: Optional[float] = None) -> int:
+    """Затухание + новые события + новый top-K. Возвращает размер top-K."""
+    now = time.time() if now is None else now
+
+    decayed_at = get_cursor(db, JOB, "decayed_at")
+    if decayed_at:
+        factor = _decay_factor(now - decayed_at)
+        db.execute(update(models.QuizTrending).values(score=models.QuizTrending.score * factor))
+        db.execute(delete(models.QuizTrending).where(models.QuizTrending.score < MIN_SCORE))
+    set_cursor(db, JOB, "decayed_at", int(now))
+
+    new_scores: Dict[int, float] = {}
+    _collect(db, models.Like, models.Like.quiz_id, "likes", LIKE_WEIGHT, now, new_scores)
+    _collect(db, models.Attempt, models.Attempt.quiz_id, "attempts", ATTEMPT_WEIGHT, now, new_scores)
+    _collect(db, models.Quiz, models.Quiz.id, "quizzes", CREATED_WEIGHT, now, new_scores)
+
+    rows = [{"quiz_id": q, "score": s} for q, s in new_scores.items() if s >= MIN_SCORE]
+    if rows:
+        stmt = insert(models.QuizTrending)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["quiz_id"],
+            set_={"score": models.QuizTrending.score + stmt.excluded.score},
+        )
+        db.execute(stmt, rows)
+
+    top = db.execute(
+        select(models.QuizTrending.quiz_id, models.QuizTrending.score)
+        .join(models.Quiz, models.Quiz.id == models.QuizTrending.quiz_id)
+        .where(models.Quiz.deleted_at.is_(None))
+        .order_by(models.QuizTrending.score.desc(), models.QuizTrending.quiz_id.desc())
+        .limit(TOP_K)
+    ).all()
+    db.execute(delete(models.TrendingTop))
+    if top:
+        db.execute(
+            models.TrendingTop.__table__.insert(),
+            [{"rank": i, "quiz_id": q, "score": s} for i, (q, s) in enumerate(top, start=1)],
+        )
+    db.commit()
+    return len(top)
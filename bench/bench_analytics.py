@@ -0,0 +1,91 @@
+"""
+Бенчмарк отчётов аналитики (app/services/analytics.py) на синтетической выгрузке.
+
+Массивы пишутся прямо в .npy той же раскладки, что даёт export, без SQLite:
+проверяется именно время отчётов по memory-mapped колонкам.
+По умолчанию 5M попыток, 10 ответов на попытку (50M строк attempt_answers),
+5M лайков, 2M подписок, 90 дней истории.
+
+Запуск из корня репозитория:
+    python -m bench.bench_analytics [--attempts 5000000] [--answers-per-attempt 10] [--json out.json]
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services import analytics
+
+START = 1_700_000_000
+
+
+def _save(base: Path, table: str, **columns: np.ndarray) -> None:
+    (base / table).mkdir(parents=True, exist_ok=True)
+    dtypes = {name: dtype for name, _, dtype in analytics.TABLES[table]}
+    for name, values in columns.items():
+        np.save(base / table / f"{name}.npy", values.astype(dtypes[name], copy=False))
+
+
+def generate(base: Path, attempts: int, per_attempt: int, likes: int, follows: int,
+             users: int, quizzes: int, days: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    span = days * analytics.DAY
+    created = np.sort(rng.integers(START, START + span, attempts))
+    _save(base, "attempts",
+          id=np.arange(1, attempts + 1), user_id=rng.integers(1, users + 1, attempts),
+          quiz_id=rng.integers(1, quizzes + 1, attempts), score=rng.integers(0, per_attempt + 1, attempts),
+          total=np.full(attempts, per_attempt), created_at=created)
+    # ~5% попыток брошены на полпути
+    answered = np.where(rng.random(attempts) < 0.05, per_attempt // 2, per_attempt)
+    _save(base, "attempt_answers",
+          attempt_id=np.repeat(np.arange(1, attempts + 1), answered),
+          question_id=rng.integers(1, quizzes * per_attempt, int(answered.sum())),
+          is_correct=rng.integers(0, 2, int(answered.sum())))
+    _save(base, "likes",
+          user_id=rng.integers(1, users + 1, likes), quiz_id=rng.integers(1, quizzes + 1, likes),
+          created_at=np.sort(rng.integers(START, START + span, likes)))
+    _save(base, "follows",
+          follower_id=rng.integers(1, users + 1, follows), following_id=rng.integers(1, users + 1, follows))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк отчётов аналитики")
+    parser.add_argument("--attempts", type=int, default=5_000_000)
+    parser.add_argument("--answers-per-attempt", type=int, default=10)
+    parser.add_argument("--likes", type=int, default=5_000_000)
+    parser.add_argument("--follows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--quizzes", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", default=None, help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="quizogram-analytics-") as tmp:
+        base = Path(tmp)
+        t0 = time.perf_counter()
+        generate(base, args.attempts, args.answers_per_attempt, args.likes, args.follows,
+                 args.users, args.quizzes, args.days, args.seed)
+        t1 = time.perf_counter()
+        data = analytics.load(tmp)
+        rows = sum(len(next(iter(cols.values()))) for cols in data.values())
+        result = analytics.report(data, days=30)
+        t2 = time.perf_counter()
+
+    out = {
+        "rows": rows,
+        "generate_s": round(t1 - t0, 2),
+        "report_s": round(t2 - t1, 2),
+        "summary": {k: v for k, v in result["summary"].items() if k != "top_quizzes"},
+    }
+    print(json.dumps(out, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Бенчмарк рекомендаций: полный и инкрементальный пересчёт соседей
+и задержка recommend() на запросе.
+
+По умолчанию 100k пользователей, 20k квизов, 1M лайков (популярность по Ципфу).
+Запуск из корня репозитория:
+    python -m bench.bench_recommendations [--users 100000] [--likes 1000000] [--json out.json]
+
+База создаётся во временном файле, рабочая quizogram.db не трогается.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+_TMP_DIR = tempfile.mkdtemp(prefix="quizogram-bench-")
+_DB_PATH = os.path.join(_TMP_DIR, "bench.db")
+os.environ.setdefault("QUIZOGRAM_DATABASE_URL", f"sqlite:///{_DB_PATH}")
+
+from app.database import SessionLocal, sync_schema  # noqa: E402
+from app.services import recommendations  # noqa: E402
+
+
+def generate_likes(rng: np.random.Generator, users: int, quizzes: int, likes: int) -> np.ndarray:
+    """Уникальные пары (user_id, quiz_id): пользователи и квизы с тяжёлым хвостом."""
+    item_p = 1.0 / np.arange(1, quizzes + 1) ** 0.8
+    item_p /= item_p.sum()
+    user_p = 1.0 / np.arange(1, users + 1) ** 0.5
+    user_p /= user_p.sum()
+
+    pairs = np.empty((0, 2), dtype=np.int64)
+    while len(pairs) < likes:
+        need = int((likes - len(pairs)) * 1.2) + 1000
+        u = rng.choice(users, size=need, p=user_p) + 1
+        q = rng.choice(quizzes, size=need, p=item_p) + 1
+        pairs = np.unique(np.concatenate([pairs, np.stack([u, q], axis=1)]), axis=0)
+    rng.shuffle(pairs)
+    return pairs[:likes]
+
+
+def seed(args, rng: np.random.Generator) -> np.ndarray:
+    sync_schema()
+    con = sqlite3.connect(_DB_PATH)
+    con.executemany(
+        "INSERT INTO users (id, username, email, hashed_password) VALUES (?, ?, ?, 'x')",
+        ((i, f"user{i}", f"user{i}@example.com") for i in range(1, args.users + 1)),
+    )
+    con.executemany(
+        "INSERT INTO quizzes (id, title, owner_id) VALUES (?, ?, ?)",
+        ((i, f"Квиз {i}", int(o)) for i, o in zip(range(1, args.quizzes + 1),
+                                                  rng.integers(1, args.users + 1, args.quizzes))),
+    )
+    likes = generate_likes(rng, args.users, args.quizzes, args.likes + args.incremental)
+    con.executemany("INSERT INTO likes (user_id, quiz_id) VALUES (?, ?)", likes[:args.likes].tolist())
+    con.commit()
+    con.close()
+    return likes[args.likes:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк рекомендаций")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--quizzes", type=int, default=20_000)
+    parser.add_argument("--likes", type=int, default=1_000_000)
+    parser.add_argument("--incremental", type=int, default=1_000, help="лайков для инкрементального прогона")
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    t0 = time.perf_counter()
+    extra_likes = seed(args, rng)
+    seed_s = time.perf_counter() - t0
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        full_items = recommendations.refresh(db, full=True)
+        full_s = time.perf_counter() - t0
+
+        con = sqlite3.connect(_DB_PATH)
+        con.executemany("INSERT INTO likes (user_id, quiz_id) VALUES (?, ?)", extra_likes.tolist())
+        con.commit()
+        con.close()
+        t0 = time.perf_counter()
+        incr_items = recommendations.refresh(db)
+        incr_s = time.perf_counter() - t0
+
+        latencies = []
+        for uid in rng.integers(1, args.users + 1, args.requests).tolist():
+            t0 = time.perf_counter()
+            recommendations.recommend(db, uid, limit=20)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    finally:
+        db.close()
+
+    lat = np.asarray(latencies)
+    results = {
+        "params": vars(args) | {"json_path": None},
+        "seed_s": round(seed_s, 2),
+        "full_refresh_s": round(full_s, 2),
+        "full_refresh_quizzes": full_items,
+        "incremental_refresh_s": round(incr_s, 2),
+        "incremental_refresh_quizzes": incr_items,
+        "recommend_ms": {p: round(float(np.percentile(lat, int(p[1:]))), 3) for p in ("p50", "p95", "p99")},
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
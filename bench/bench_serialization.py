@@ -0,0 +1,137 @@
+"""
+Бенчмарк сериализации и сжатия ответов.
+
+Сравнивает по CPU-времени два пути от response_model до байтов:
+- dump_json — встроенный путь FastAPI (pydantic сериализует модель сразу в JSON);
+  он работает, только пока у маршрута нет своего response_class;
+- dict_json — модель -> dict -> JSONResponse, как при любом своём классе ответа;
+а также размер ответа на проводе (identity / gzip / br) для:
+- get_quiz с квизом на 100 вопросов (по 4 варианта);
+- страницы ленты на 100 элементов.
+
+Запуск из корня репозитория:
+    python -m bench.bench_serialization [--iterations 200] [--json out.json]
+
+База создаётся во временном файле, рабочая quizogram.db не трогается.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+_TMP_DIR = tempfile.mkdtemp(prefix="quizogram-bench-")
+os.environ.setdefault("QUIZOGRAM_DATABASE_URL", f"sqlite:///{_TMP_DIR}/bench.db")
+
+from typing import List  # noqa: E402
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app import models  # noqa: E402
+from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.schemas import FeedItem, QuizOut  # noqa: E402
+
+QUESTIONS = 100
+OPTIONS = 4
+FEED_ITEMS = 100
+
+
+def seed() -> tuple:
+    db = SessionLocal()
+    try:
+        reader = models.User(username="reader", email="reader@example.com",
+                             hashed_password=get_password_hash("password"))
+        author = models.User(username="author", email="author@example.com",
+                             hashed_password=get_password_hash("password"))
+        db.add_all([reader, author])
+        db.flush()
+        db.add(models.Follow(follower_id=reader.id, following_id=author.id))
+
+        big = models.Quiz(title="Большой квиз", description="Квиз на 100 вопросов " * 3, owner_id=author.id)
+        db.add(big)
+        db.flush()
+        for i in range(QUESTIONS):
+            q = models.Question(quiz_id=big.id, text=f"Вопрос №{i}: какой вариант правильный?",
+                                correct_option_index=i % OPTIONS)
+            q.options = [models.AnswerOption(text=f"Вариант {j} для вопроса {i}") for j in range(OPTIONS)]
+            db.add(q)
+
+        for i in range(FEED_ITEMS - 1):
+            db.add(models.Quiz(title=f"Квиз {i}", description=f"Описание квиза {i} для ленты",
+                               owner_id=author.id))
+        db.commit()
+        return big.id, create_access_token(subject=reader.username)
+    finally:
+        db.close()
+
+
+def cpu_per_call(fn, iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        t0 = time.process_time_ns()
+        fn()
+        samples.append(time.process_time_ns() - t0)
+    return statistics.median(samples) / 1000.0  # мкс
+
+
+def wire_sizes(client: TestClient, url: str, headers: dict) -> dict:
+    sizes = {}
+    for encoding in ("identity", "gzip", "br"):
+        r = client.get(url, headers={**headers, "Accept-Encoding": encoding})
+        r.raise_for_status()
+        sizes[encoding] = int(r.headers["content-length"])
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", dest="json_path", default=None, help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    results = {}
+    with TestClient(app) as client:  # lifespan: создаёт схему, на выходе гасит фоновые задачи
+        quiz_id, token = seed()
+        auth = {"Authorization": f"Bearer {token}"}
+
+        db = SessionLocal()
+        try:
+            quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
+            quiz_model = QuizOut.model_validate(quiz)
+        finally:
+            db.close()
+        feed_models = [
+            FeedItem(**item)
+            for item in client.get(f"/api/v1/social/feed?limit={FEED_ITEMS}", headers=auth).json()
+        ]
+
+        for name, adapter, payload, url in (
+            ("get_quiz_100q", TypeAdapter(QuizOut), quiz_model, f"/api/v1/quizzes/{quiz_id}"),
+            (f"feed_{FEED_ITEMS}", TypeAdapter(List[FeedItem]), feed_models,
+             f"/api/v1/social/feed?limit={FEED_ITEMS}"),
+        ):
+            results[name] = {
+                "dump_json_us": cpu_per_call(lambda: adapter.dump_json(payload), args.iterations),
+                "dict_json_us": cpu_per_call(
+                    lambda: JSONResponse(adapter.dump_python(payload, mode="json")), args.iterations,
+                ),
+                "bytes": wire_sizes(client, url, auth),
+            }
+
+    for name, row in results.items():
+        b = row["bytes"]
+        print(f"{name:>16}: dump_json {row['dump_json_us']:8.1f} us | dict+json {row['dict_json_us']:8.1f} us | "
+              f"bytes identity={b['identity']} gzip={b['gzip']} br={b['br']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
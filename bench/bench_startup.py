@@ -0,0 +1,134 @@
+"""
+Бенчмарк холодного старта.
+
+Каждый прогон — новый процесс на чистом интерпретаторе (без кэша импортов):
+- import_ms          — import app.main;
+- create_app_ms      — сборка приложения (роутеры, middleware, mount'ы);
+- startup_ms         — lifespan (проверка схемы и т.п.);
+- first_request_ms   — первый GET /health после старта;
+- ttfr_ms            — от запуска процесса до ответа на первый запрос
+                       (uvicorn на свободном порту, --server).
+
+Запуск из корня репозитория:
+    python -m bench.bench_startup [--runs 5] [--server] [--no-sync-schema] [--json out.json]
+
+База и каталог медиа — временные, рабочая quizogram.db не трогается.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Выполняется в дочернем процессе: печатает JSON с замерами фаз
+_PHASES = r"""
+import json, time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+application = app.main.create_app(start_jobs=False)
+t2 = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(application)
+t3 = time.perf_counter()
+client.__enter__()
+t4 = time.perf_counter()
+assert client.get("/health").status_code == 200
+t5 = time.perf_counter()
+client.__exit__(None, None, None)
+ms = lambda a, b: round((b - a) * 1000, 1)
+print(json.dumps({
+    "import_ms": ms(t0, t1),
+    "create_app_ms": ms(t1, t2),
+    "startup_ms": ms(t3, t4),
+    "first_request_ms": ms(t4, t5),
+}))
+"""
+
+
+def _env(tmp: str, sync_schema: bool) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "QUIZOGRAM_DATABASE_URL": f"sqlite:///{tmp}/startup.db",
+        "QUIZOGRAM_MEDIA_DIR": f"{tmp}/media",
+        "QUIZOGRAM_BACKGROUND_JOBS": "0",
+        "QUIZOGRAM_SYNC_SCHEMA": "1" if sync_schema else "0",
+    })
+    return env
+
+
+def run_phases(sync_schema: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="quizogram-startup-") as tmp:
+        out = subprocess.run(
+            [sys.executable, "-c", _PHASES], cwd=ROOT, env=_env(tmp, sync_schema),
+            capture_output=True, text=True, check=True,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_server(sync_schema: bool, timeout: float = 30.0) -> float:
+    """Время от запуска uvicorn до первого успешного /health, мс."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    with tempfile.TemporaryDirectory(prefix="quizogram-startup-") as tmp:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=_env(tmp, sync_schema), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - t0 < timeout:
+                try:
+                    with urllib.request.urlopen(url, timeout=1) as resp:
+                        if resp.status == 200:
+                            return round((time.perf_counter() - t0) * 1000, 1)
+                except OSError:
+                    time.sleep(0.005)
+            raise RuntimeError("server did not answer /health in time")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта Quizogram")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--server", action="store_true", help="ещё и time-to-first-request через uvicorn")
+    parser.add_argument("--no-sync-schema", action="store_true", help="QUIZOGRAM_SYNC_SCHEMA=0")
+    parser.add_argument("--json", dest="json_path", default=None, help="куда сохранить результаты")
+    args = parser.parse_args()
+    sync_schema = not args.no_sync_schema
+
+    runs = [run_phases(sync_schema) for _ in range(args.runs)]
+    result = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "sync_schema": sync_schema,
+        "median_ms": {k: statistics.median(r[k] for r in runs) for k in runs[0]},
+    }
+    if args.server:
+        result["median_ms"]["ttfr_ms"] = statistics.median(run_server(sync_schema) for _ in range(args.runs))
+
+    for name, value in result["median_ms"].items():
+        print(f"{name:>18}: {value:>8} ms")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
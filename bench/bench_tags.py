@@ -0,0 +1,111 @@
+"""
+Бенчмарк выборки квизов по нескольким тегам (app/services/tags.py).
+
+Сравниваются пересечение отсортированных списков id (quiz_ids) и запрос
+GROUP BY quiz_id HAVING COUNT(*) = N на той же временной базе SQLite,
+где есть только tags и quiz_tags. Популярность тегов по Ципфу, у квиза
+от 1 до 4 тегов. Для пар «частый+частый», «частый+редкий» и тройки
+меряется первая страница и страница из глубины (before в середине диапазона).
+
+Запуск из корня репозитория:
+    python -m bench.bench_tags [--quizzes 1000000] [--tags 500] [--json out.json]
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services import tags as tag_index
+
+PAGE = 20
+
+
+def generate(db: Session, quizzes: int, n_tags: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, n_tags + 1) ** 1.1
+    per_quiz = rng.integers(1, 5, quizzes)
+    quiz_id = np.repeat(np.arange(1, quizzes + 1), per_quiz)
+    tag_id = rng.choice(n_tags, size=len(quiz_id), p=weights / weights.sum()) + 1
+    pairs = np.unique(quiz_id * (n_tags + 1) + tag_id)  # повторы тега у квиза схлопываются
+
+    db.execute(models.Tag.__table__.insert(), [
+        {"id": i, "slug": f"tag-{i}", "name": f"Тег {i}", "quiz_count": 0} for i in range(1, n_tags + 1)
+    ])
+    rows = [{"quiz_id": int(p // (n_tags + 1)), "tag_id": int(p % (n_tags + 1))} for p in pairs]
+    for i in range(0, len(rows), 100_000):
+        db.execute(models.QuizTag.__table__.insert(), rows[i:i + 100_000])
+    db.commit()
+    tag_index.recount(db)
+
+
+def group_by_having(db: Session, tag_ids, before, limit):
+    qt = models.QuizTag
+    stmt = select(qt.quiz_id).where(qt.tag_id.in_(tag_ids))
+    if before is not None:
+        stmt = stmt.where(qt.quiz_id < before)
+    stmt = (
+        stmt.group_by(qt.quiz_id).having(func.count() == len(tag_ids))
+        .order_by(qt.quiz_id.desc()).limit(limit)
+    )
+    return list(db.execute(stmt).scalars())
+
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк выборки по тегам")
+    parser.add_argument("--quizzes", type=int, default=1_000_000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", default=None, help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="quizogram-tags-") as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'tags.db'}")
+        models.Base.metadata.create_all(engine, tables=[models.Tag.__table__, models.QuizTag.__table__])
+        with Session(engine) as db:
+            t0 = time.perf_counter()
+            generate(db, args.quizzes, args.tags, args.seed)
+            generate_s = round(time.perf_counter() - t0, 2)
+
+            by_id = {t.id: t for t in db.query(models.Tag)}
+            cases = {
+                "frequent+frequent": [1, 2],
+                "frequent+rare": [1, args.tags // 2],
+                "three frequent": [1, 2, 3],
+            }
+            out = {"quiz_tags": sum(t.quiz_count for t in by_id.values()), "generate_s": generate_s, "cases": {}}
+            for name, ids in cases.items():
+                tags = [by_id[i] for i in ids]
+                case = {"counts": [t.quiz_count for t in tags]}
+                for page, before in (("first_page", None), ("deep_page", args.quizzes // 2)):
+                    expected = group_by_having(db, ids, before, PAGE)
+                    assert tag_index.quiz_ids(db, tags, before, PAGE) == expected
+                    case[page] = {
+                        "intersection_ms": _time(lambda: tag_index.quiz_ids(db, tags, before, PAGE)),
+                        "group_by_ms": _time(lambda: group_by_having(db, ids, before, PAGE)),
+                    }
+                out["cases"][name] = case
+        engine.dispose()
+
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
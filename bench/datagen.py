@@ -0,0 +1,208 @@
+"""
+Детерминированный генератор синтетических данных для бенчмарков.
+
+Заполняет пустую базу пользователями (с профилями), подписками (степенной
+закон: немного «звёзд» с огромным числом подписчиков), квизами с вопросами
+и вариантами, лайками и попытками с ответами. Вставка — батчами через
+SQLAlchemy Core (executemany), id проставляются явно, поэтому генератор
+ожидает пустую базу. После вставки пересобираются производные таблицы
+(статистика, рекомендации, trending) и граф подписок в памяти.
+
+Отдельно:
+    python -m bench.datagen --scale small --db /tmp/bench.db
+"""
+import argparse
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+CHUNK = 20_000
+
+
+@dataclass
+class Scale:
+    users: int
+    quizzes: int
+    questions_per_quiz: int
+    options_per_question: int
+    follows_per_user: int      # среднее; распределение с тяжёлым хвостом
+    likes: int
+    attempts: int
+
+
+SCALES: Dict[str, Scale] = {
+    "tiny": Scale(users=200, quizzes=50, questions_per_quiz=5, options_per_question=4,
+                  follows_per_user=10, likes=1_000, attempts=500),
+    "small": Scale(users=2_000, quizzes=500, questions_per_quiz=10, options_per_question=4,
+                   follows_per_user=20, likes=20_000, attempts=10_000),
+    "medium": Scale(users=20_000, quizzes=5_000, questions_per_quiz=10, options_per_question=4,
+                    follows_per_user=30, likes=200_000, attempts=100_000),
+    "large": Scale(users=100_000, quizzes=20_000, questions_per_quiz=12, options_per_question=4,
+                   follows_per_user=50, likes=1_000_000, attempts=500_000),
+}
+
+
+@dataclass
+class Dataset:
+    """То, что нужно сценариям нагрузки, чтобы не ходить за этим в базу."""
+    scale: Scale
+    usernames: List[str]
+    quiz_questions: Dict[int, List[Tuple[int, int]]]  # quiz_id -> [(question_id, options)]
+
+
+def _zipf_weights(n: int, exponent: float) -> np.ndarray:
+    w = 1.0 / np.arange(1, n + 1) ** exponent
+    return w / w.sum()
+
+
+def _unique_pairs(rng, n_src: int, n_dst: int, count: int, dst_p: np.ndarray,
+                  src_p: np.ndarray = None, allow_self: bool = True) -> np.ndarray:
+    """count уникальных пар (src, dst), id с единицы."""
+    pairs = np.empty((0, 2), dtype=np.int64)
+    while len(pairs) < count:
+        need = int((count - len(pairs)) * 1.3) + 100
+        src = rng.choice(n_src, size=need, p=src_p) + 1
+        dst = rng.choice(n_dst, size=need, p=dst_p) + 1
+        batch = np.stack([src, dst], axis=1)
+        if not allow_self:
+            batch = batch[batch[:, 0] != batch[:, 1]]
+        pairs = np.unique(np.concatenate([pairs, batch]), axis=0)
+    rng.shuffle(pairs)
+    return pairs[:count]
+
+
+def _insert(conn, table, rows: Iterator[dict]) -> int:
+    total = 0
+    chunk: List[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            conn.execute(table.insert(), chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        conn.execute(table.insert(), chunk)
+        total += len(chunk)
+    return total
+
+
+def generate(scale: Scale, seed: int = 42, rebuild_derived: bool = True) -> Dataset:
+    from app import models
+    from app.core.security import get_password_hash
+    from app.database import SessionLocal, engine, sync_schema
+
+    sync_schema(engine)
+    rng = np.random.default_rng(seed)
+    password_hash = get_password_hash("password")  # pbkdf2 дорогой — один на всех
+    usernames = [f"user{i:06d}" for i in range(1, scale.users + 1)]
+
+    n_q = scale.quizzes * scale.questions_per_quiz
+    quiz_owner = rng.choice(scale.users, size=scale.quizzes, p=_zipf_weights(scale.users, 1.0)) + 1
+    correct = rng.integers(0, scale.options_per_question, size=n_q)
+
+    with engine.begin() as conn:
+        _insert(conn, models.User.__table__, (
+            {"id": i, "username": name, "email": f"{name}@example.com", "hashed_password": password_hash}
+            for i, name in enumerate(usernames, start=1)
+        ))
+        _insert(conn, models.Profile.__table__, (
+            {"user_id": i, "bio": f"Био пользователя {i}", "avatar_key": "8bit_default.png"}
+            for i in range(1, scale.users + 1)
+        ))
+
+        # подписки: популярность цели по Ципфу, активность подписчика тоже неравномерна
+        follows = _unique_pairs(
+            rng, scale.users, scale.users, min(scale.users * scale.follows_per_user, scale.users * (scale.users - 1) // 2),
+            dst_p=_zipf_weights(scale.users, 1.1), src_p=_zipf_weights(scale.users, 0.5), allow_self=False,
+        )
+        _insert(conn, models.Follow.__table__, (
+            {"follower_id": a, "following_id": b} for a, b in follows.tolist()
+        ))
+
+        _insert(conn, models.Quiz.__table__, (
+            {"id": i, "title": f"Квиз №{i}", "description": f"Синтетический квиз {i}", "owner_id": int(o)}
+            for i, o in enumerate(quiz_owner.tolist(), start=1)
+        ))
+        _insert(conn, models.Question.__table__, (
+            {"id": qid, "quiz_id": (qid - 1) // scale.questions_per_quiz + 1,
+             "text": f"Вопрос {qid}: выберите правильный вариант", "correct_option_index": int(correct[qid - 1])}
+            for qid in range(1, n_q + 1)
+        ))
+        _insert(conn, models.AnswerOption.__table__, (
+            {"question_id": qid, "text": f"Вариант {j} к вопросу {qid}"}
+            for qid in range(1, n_q + 1) for j in range(scale.options_per_question)
+        ))
+
+        quiz_p = _zipf_weights(scale.quizzes, 0.9)
+        likes = _unique_pairs(rng, scale.users, scale.quizzes, scale.likes, dst_p=quiz_p)
+        _insert(conn, models.Like.__table__, (
+            {"user_id": u, "quiz_id": q} for u, q in likes.tolist()
+        ))
+
+        att_users = rng.integers(1, scale.users + 1, size=scale.attempts)
+        att_quizzes = rng.choice(scale.quizzes, size=scale.attempts, p=quiz_p) + 1
+        # ответы: правильный с вероятностью 0.6, иначе случайный
+        picks = np.where(
+            rng.random((scale.attempts, scale.questions_per_quiz)) < 0.6,
+            -1,
+            rng.integers(0, scale.options_per_question, size=(scale.attempts, scale.questions_per_quiz)),
+        )
+        first_q = (att_quizzes - 1) * scale.questions_per_quiz + 1
+        qids = first_q[:, None] + np.arange(scale.questions_per_quiz)[None, :]
+        selected = np.where(picks < 0, correct[qids - 1], picks)
+        is_correct = (selected == correct[qids - 1]).astype(np.int64)
+        scores = is_correct.sum(axis=1)
+
+        _insert(conn, models.Attempt.__table__, (
+            {"id": i, "user_id": int(u), "quiz_id": int(q), "score": int(s), "total": scale.questions_per_quiz}
+            for i, (u, q, s) in enumerate(zip(att_users, att_quizzes, scores), start=1)
+        ))
+        _insert(conn, models.AttemptAnswer.__table__, (
+            {"attempt_id": a + 1, "question_id": int(qids[a, k]),
+             "selected_option_index": int(selected[a, k]), "is_correct": int(is_correct[a, k])}
+            for a in range(scale.attempts) for k in range(scale.questions_per_quiz)
+        ))
+
+    if rebuild_derived:
+        from app.services import quiz_stats, quiz_versions, recommendations, review_queue, social_graph, trending
+
+        db = SessionLocal()
+        try:
+            quiz_stats.rebuild(db)
+            quiz_versions.backfill_missing(db)
+            review_queue.backfill(db)
+            recommendations.refresh(db, full=True)
+            trending.refresh(db)
+            social_graph.graph.load(db)
+        finally:
+            db.close()
+
+    quiz_questions = {
+        q: [((q - 1) * scale.questions_per_quiz + k + 1, scale.options_per_question)
+            for k in range(scale.questions_per_quiz)]
+        for q in range(1, scale.quizzes + 1)
+    }
+    return Dataset(scale=scale, usernames=usernames, quiz_questions=quiz_questions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных Quizogram")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", required=True, help="путь к новому файлу SQLite")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} уже существует — генератор ожидает пустую базу")
+    os.environ["QUIZOGRAM_DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+
+    t0 = time.perf_counter()
+    generate(SCALES[args.scale], seed=args.seed)
+    print(f"generated {args.scale} {asdict(SCALES[args.scale])} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Нагрузочный прогон реальных эндпоинтов в процессе, через ASGI-приложение
+(httpx.ASGITransport — без сети и без uvicorn).
+
+Для каждого сценария (feed, get_quiz, attempt, attempt_batch, leaderboard, profile, search)
+меряет пропускную способность, перцентили задержки и среднее число
+SQL-выражений на запрос. Результаты — JSON, который можно сравнить
+с прогоном на другом коммите.
+
+    python -m bench.loadtest --scale small --requests 500 --concurrency 8 --json after.json
+    python -m bench.loadtest --scale small --compare before.json
+
+База генерируется заново во временном файле (bench/datagen.py), фоновые
+задачи приложения отключены, чтобы не мешать замерам.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+_TMP_DIR = tempfile.mkdtemp(prefix="quizogram-load-")
+os.environ.setdefault("QUIZOGRAM_DATABASE_URL", f"sqlite:///{_TMP_DIR}/load.db")
+os.environ["QUIZOGRAM_BACKGROUND_JOBS"] = "0"
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from bench.datagen import SCALES, Dataset, generate  # noqa: E402
+
+Request = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+class SqlCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def build_workloads(data: Dataset, tokens: Dict[str, str]) -> Dict[str, Request]:
+    usernames = data.usernames
+    quiz_ids = list(data.quiz_questions)
+
+    def auth(rnd: random.Random) -> dict:
+        return {"Authorization": f"Bearer {tokens[rnd.choice(usernames)]}"}
+
+    async def feed(client, rnd):
+        return await client.get("/api/v1/social/feed", params={"limit": 20}, headers=auth(rnd))
+
+    async def get_quiz(client, rnd):
+        return await client.get(f"/api/v1/quizzes/{rnd.choice(quiz_ids)}")
+
+    async def attempt(client, rnd):
+        quiz_id = rnd.choice(quiz_ids)
+        answers = [
+            {"question_id": qid, "selected_option_index": rnd.randrange(options)}
+            for qid, options in data.quiz_questions[quiz_id]
+        ]
+        return await client.post(f"/api/v1/attempts/{quiz_id}", json={"answers": answers}, headers=auth(rnd))
+
+    async def attempt_batch(client, rnd):
+        items = []
+        for _ in range(20):
+            quiz_id = rnd.choice(quiz_ids)
+            items.append({"quiz_id": quiz_id, "answers": [
+                {"question_id": qid, "selected_option_index": rnd.randrange(options)}
+                for qid, options in data.quiz_questions[quiz_id]
+            ]})
+        return await client.post("/api/v1/attempts/batch", json={"items": items}, headers=auth(rnd))
+
+    async def leaderboard(client, rnd):
+        return await client.get(f"/api/v1/attempts/leaderboard/{rnd.choice(quiz_ids)}")
+
+    async def profile(client, rnd):
+        return await client.get(f"/api/v1/profile/user/{rnd.choice(usernames)}", headers=auth(rnd))
+
+    async def search(client, rnd):
+        name = rnd.choice(usernames)
+        return await client.get("/api/v1/profile/search_users", params={"q": name[:rnd.randint(5, 8)]},
+                                headers=auth(rnd))
+
+    return {
+        "feed": feed,
+        "get_quiz": get_quiz,
+        "attempt": attempt,
+        "attempt_batch": attempt_batch,  # 20 попыток за запрос
+        "leaderboard": leaderboard,
+        "profile": profile,
+        "search": search,
+    }
+
+
+async def run_workload(client: httpx.AsyncClient, request: Request, counter: SqlCounter,
+                       requests: int, concurrency: int, seed: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        rnd = random.Random(seed * 1000 + worker_id)
+        for _ in queue:
+            t0 = time.perf_counter()
+            r = await request(client, rnd)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if r.status_code >= 400:
+                errors += 1
+
+    sql_before = counter.count
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 3)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 3),
+            "p50": pct(50), "p90": pct(90), "p99": pct(99), "max": round(latencies[-1], 3),
+        },
+        "sql_per_request": round((counter.count - sql_before) / max(len(latencies), 1), 2),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nvs {baseline.get('commit')}:")
+    if (baseline.get("scale"), baseline.get("concurrency")) != (current["scale"], current["concurrency"]):
+        print("  (внимание: другой масштаб данных или параллелизм — сравнение условное)")
+    print(f"{'workload':>12} {'rps':>26} {'p50 ms':>26} {'p99 ms':>26} {'sql/req':>14}")
+    for name, row in current["workloads"].items():
+        old = baseline.get("workloads", {}).get(name)
+        if not old:
+            continue
+
+        def cell(new_v, old_v):
+            delta = (new_v - old_v) / old_v * 100 if old_v else 0.0
+            return f"{old_v} -> {new_v} ({delta:+.0f}%)"
+
+        print(f"{name:>12} {cell(row['throughput_rps'], old['throughput_rps']):>26} "
+              f"{cell(row['latency_ms']['p50'], old['latency_ms']['p50']):>26} "
+              f"{cell(row['latency_ms']['p99'], old['latency_ms']['p99']):>26} "
+              f"{old['sql_per_request']:>6}->{row['sql_per_request']:<6}")
+
+
+async def main_async(args) -> dict:
+    from app.core.security import create_access_token
+    from app.database import engine
+    from app.main import app
+
+    t0 = time.perf_counter()
+    data = generate(SCALES[args.scale], seed=args.seed)
+    seed_s = time.perf_counter() - t0
+
+    tokens = {name: create_access_token(subject=name) for name in data.usernames}
+    workloads = build_workloads(data, tokens)
+    selected = args.workloads.split(",") if args.workloads else list(workloads)
+    counter = SqlCounter(engine)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in selected:
+            await run_workload(client, workloads[name], counter, args.warmup, args.concurrency, args.seed)
+            results[name] = await run_workload(client, workloads[name], counter,
+                                               args.requests, args.concurrency, args.seed)
+            r = results[name]
+            print(f"{name:>12}: {r['throughput_rps']:>8} rps | p50 {r['latency_ms']['p50']:>8} ms | "
+                  f"p99 {r['latency_ms']['p99']:>8} ms | sql/req {r['sql_per_request']:>6} | errors {r['errors']}")
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "scale_params": asdict(SCALES[args.scale]),
+        "seed": args.seed,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seed_s": round(seed_s, 2),
+        "workloads": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон Quizogram через ASGI")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=500, help="запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workloads", default=None, help="через запятую, по умолчанию все")
+    parser.add_argument("--json", dest="json_path", default=None, help="куда сохранить результаты")
+    parser.add_argument("--compare", default=None, help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            compare(result, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Общие фикстуры: временная база SQLite и каталог импортов на весь прогон,
+фоновые задачи выключены. Переменные окружения ставятся до импорта app —
+engine и config читают их при импорте.
+
+Запуск из корня репозитория:
+    python -m pytest -q
+"""
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+_TMP = Path(tempfile.mkdtemp(prefix="quizogram-tests-"))
+os.environ["QUIZOGRAM_DATABASE_URL"] = f"sqlite:///{_TMP / 'test.db'}"
+os.environ["QUIZOGRAM_IMPORT_DIR"] = str(_TMP / "imports")
+os.environ["QUIZOGRAM_BACKGROUND_JOBS"] = "0"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.main import create_app  # noqa: E402
+
+_names = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(create_app(sync_db=True, start_jobs=False)) as c:
+        yield c
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+
+@pytest.fixture
+def db(client):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_user(client):
+    """Регистрирует нового пользователя; возвращает (заголовки авторизации, id)."""
+
+    def make():
+        name = f"user{next(_names)}"
+        r = client.post("/api/v1/auth/register", json={
+            "username": name, "email": f"{name}@example.com", "password": "secret1",
+        })
+        assert r.status_code == 201, r.text
+        token = client.post(
+            "/api/v1/auth/login", data={"username": name, "password": "secret1"},
+        ).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}, r.json()["id"]
+
+    return make
+
+
+@pytest.fixture
+def make_quiz(client):
+    """Квиз из n вопросов по три варианта, верный — correct; возвращает QuizOut."""
+
+    def make(headers, n=3, correct=1, title="Квиз"):
+        r = client.post("/api/v1/quizzes/", headers=headers, json={
+            "title": title,
+            "questions": [
+                {"text": f"Вопрос {i}", "options": [{"text": "a"}, {"text": "b"}, {"text": "c"}],
+                 "correct_option_index": correct}
+                for i in range(n)
+            ],
+        })
+        assert r.status_code == 201, r.text
+        return r.json()
+
+    return make
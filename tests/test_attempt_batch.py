@@ -0,0 +1,70 @@
+import random
+
+from app import models
+
+
+def _answers(quiz, picks):
+    return [
+        {"question_id": q["id"], "selected_option_index": pick}
+        for q, pick in zip(quiz["questions"], picks)
+    ]
+
+
+def test_batch_scores_match_per_attempt_reference(client, db, make_user, make_quiz):
+    owner, _ = make_user()
+    player, player_id = make_user()
+    quizzes = [make_quiz(owner, n=n, correct=c) for n, c in ((3, 1), (5, 0), (8, 2))]
+
+    rng = random.Random(7)
+    items, expected = [], []
+    for _ in range(60):
+        quiz = rng.choice(quizzes)
+        picks = [rng.randrange(3) for _ in quiz["questions"]]
+        correct = quiz["questions"][0]["correct_option_index"]
+        items.append({"quiz_id": quiz["id"], "answers": _answers(quiz, picks)})
+        expected.append((sum(p == correct for p in picks), [p == correct for p in picks]))
+
+    r = client.post("/api/v1/attempts/batch", json={"items": items}, headers=player)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["created"], body["duplicates"], body["errors"]) == (60, 0, 0)
+    for result, (score, flags) in zip(body["results"], expected):
+        assert result["status"] == "created"
+        assert result["attempt"]["score"] == score
+        assert [a["is_correct"] for a in result["attempt"]["answers"]] == flags
+
+    stored = {
+        a.id: a.score
+        for a in db.query(models.Attempt).filter(models.Attempt.user_id == player_id)
+    }
+    assert [stored[res["attempt"]["id"]] for res in body["results"]] == [s for s, _ in expected]
+
+
+def test_batch_reports_bad_items_without_failing_the_rest(client, make_user, make_quiz):
+    owner, _ = make_user()
+    player, _ = make_user()
+    quiz = make_quiz(owner, n=3)
+    other = make_quiz(owner, n=2)
+    q, foreign = quiz["questions"], other["questions"][0]
+
+    items = [
+        {"quiz_id": quiz["id"], "answers": _answers(quiz, [1, 1, 0])},
+        {"quiz_id": quiz["id"], "answers": [{"question_id": foreign["id"], "selected_option_index": 1}]},
+        {"quiz_id": quiz["id"], "answers": [{"question_id": q[0]["id"], "selected_option_index": 3}]},
+        {"quiz_id": quiz["id"], "answers": [{"question_id": q[1]["id"], "selected_option_index": 1}] * 2},
+        {"quiz_id": 10 ** 6, "answers": _answers(quiz, [1])},
+        {"quiz_id": other["id"], "answers": _answers(other, [1, 0]), "idempotency_key": "tablet-1"},
+    ]
+    body = client.post("/api/v1/attempts/batch", json={"items": items}, headers=player).json()
+
+    assert [r["status"] for r in body["results"]] == ["created", "error", "error", "error", "error", "created"]
+    assert body["results"][0]["attempt"]["score"] == 2
+    assert "doesn't belong" in body["results"][1]["error"]
+    assert "out of range" in body["results"][2]["error"]
+    assert "Duplicate answer" in body["results"][3]["error"]
+    assert body["results"][4]["error"] == "Quiz not found"
+    assert body["results"][5]["attempt"]["score"] == 1
+
+    retry = client.post("/api/v1/attempts/batch", json={"items": items[5:]}, headers=player).json()
+    assert retry["duplicates"] == 1 and retry["created"] == 0
+    assert retry["results"][0]["attempt"]["id"] == body["results"][5]["attempt"]["id"]
@@ -0,0 +1,83 @@
+import pytest
+
+from app import models
+from app.database import SessionLocal
+from app.services import attempt_sessions
+
+
+def _start(client, headers, quiz):
+    r = client.post(f"/api/v1/attempts/{quiz['id']}/start", headers=headers)
+    assert r.status_code == 201, r.text
+    return r.json()["session_id"]
+
+
+def _load(session_id, user_id):
+    """Сессия, прочитанная отдельным запросом (своё соединение с базой)."""
+    db = SessionLocal()
+    return db, attempt_sessions.get(db, session_id, user_id)
+
+
+def test_session_flow_records_latencies(client, db, make_user, make_quiz):
+    owner, _ = make_user()
+    player, _ = make_user()
+    quiz = make_quiz(owner, n=2)
+    sid = _start(client, player, quiz)
+
+    for q, pick in zip(quiz["questions"], (1, 0)):
+        r = client.post(f"/api/v1/attempts/sessions/{sid}/answer", headers=player,
+                        json={"question_id": q["id"], "selected_option_index": pick})
+        assert r.status_code == 200, r.text
+    r = client.post(f"/api/v1/attempts/sessions/{sid}/finish", headers=player)
+    assert r.status_code == 201, r.text
+    attempt = r.json()
+    assert attempt["score"] == 1 and attempt["total"] == 2
+    assert attempt["duration_ms"] == sum(a["latency_ms"] for a in attempt["answers"])
+    assert db.get(models.AttemptSession, sid) is None
+
+
+def test_concurrent_answer_loses_optimistic_guard(client, make_user, make_quiz):
+    owner, _ = make_user()
+    player, player_id = make_user()
+    quiz = make_quiz(owner, n=3)
+    q = quiz["questions"]
+    sid = _start(client, player, quiz)
+
+    db1, first = _load(sid, player_id)
+    db2, second = _load(sid, player_id)
+    try:
+        attempt_sessions.answer(db1, first, q[0]["id"], 1)
+        with pytest.raises(attempt_sessions.SessionConflict):
+            attempt_sessions.answer(db2, second, q[1]["id"], 1)
+
+        # перечитавший сессию запрос проходит, и оба ответа на месте
+        db2.expire_all()
+        fresh = attempt_sessions.get(db2, sid, player_id)
+        _, _, answered, total = attempt_sessions.answer(db2, fresh, q[1]["id"], 1)
+        assert (answered, total) == (2, 3)
+        assert attempt_sessions.decode(fresh.answers)["question_id"].tolist() == [q[0]["id"], q[1]["id"]]
+    finally:
+        db1.close()
+        db2.close()
+
+
+def test_double_finish_creates_one_attempt(client, make_user, make_quiz):
+    owner, _ = make_user()
+    player, player_id = make_user()
+    quiz = make_quiz(owner, n=1)
+    sid = _start(client, player, quiz)
+    client.post(f"/api/v1/attempts/sessions/{sid}/answer", headers=player,
+                json={"question_id": quiz["questions"][0]["id"], "selected_option_index": 1})
+
+    db1, first = _load(sid, player_id)
+    db2, second = _load(sid, player_id)
+    try:
+        attempt, _ = attempt_sessions.finish(db1, first)
+        with pytest.raises(attempt_sessions.SessionConflict):
+            attempt_sessions.finish(db2, second)
+        attempts = db2.query(models.Attempt).filter(
+            models.Attempt.user_id == player_id, models.Attempt.quiz_id == quiz["id"],
+        ).all()
+        assert [a.id for a in attempts] == [attempt.id]
+    finally:
+        db1.close()
+        db2.close()
@@ -0,0 +1,30 @@
+import sys
+
+from fastapi.testclient import TestClient
+
+from app.core.deferred import DeferredRouter
+from app.main import create_app
+
+
+def _deferred(app):
+    return [r.module for r in app.router.routes if isinstance(r, DeferredRouter)]
+
+
+def test_deferred_router_loads_on_first_request_in_place(client):
+    app = create_app(sync_db=False, start_jobs=False)
+    stub = next(r for r in app.router.routes if getattr(r, "module", None) == "app.routers.practice")
+    at = app.router.routes.index(stub)
+    after = app.router.routes[at + 1]
+
+    with TestClient(app) as c:  # с lifespan: фоновый прогрев не переживает клиента
+        assert c.get("/api/v1/practice/next").status_code == 401
+        assert "app.routers.practice" not in _deferred(app)
+        # роутер встал на место заглушки, порядок сопоставления прежний
+        assert stub not in app.router.routes and app.router.routes.index(after) > at
+
+        # префикс imports общий с quizzes — ответы quizzes не меняются
+        assert c.delete("/api/v1/quizzes").status_code == 405
+        schema = c.get("/openapi.json").json()
+    assert _deferred(app) == []
+    assert "/api/v1/attempts/{quiz_id}/start" in schema["paths"]
+    assert "app.routers.attempts" in sys.modules
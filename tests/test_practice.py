@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app import models
+from app.services import review_queue
+
+
+def _missed_an_hour_ago(db, user_id, quiz):
+    """Карточки по всем вопросам квиза, уже просроченные."""
+    answered_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    review_queue.record_attempt(db, user_id, quiz["id"], [(q["id"], False) for q in quiz["questions"]], answered_at)
+    db.commit()
+
+
+def _next(client, headers):
+    r = client.get("/api/v1/practice/next", headers=headers)
+    assert r.status_code == 200, r.text
+    return [c["question_id"] for c in r.json()]
+
+
+def test_replacing_questions_prunes_their_cards(client, db, make_user, make_quiz):
+    owner, _ = make_user()
+    player, player_id = make_user()
+    quiz = make_quiz(owner, n=2)
+    kept = make_quiz(owner, n=1, title="Другой")
+    _missed_an_hour_ago(db, player_id, quiz)
+    _missed_an_hour_ago(db, player_id, kept)
+    assert len(_next(client, player)) == 3
+
+    r = client.put(f"/api/v1/quizzes/{quiz['id']}/questions", headers=owner, json={"questions": [
+        {"text": "Новый", "options": [{"text": "a"}, {"text": "b"}], "correct_option_index": 0},
+    ]})
+    assert r.status_code == 200, r.text
+
+    db.expire_all()
+    assert db.get(models.ReviewState, (player_id, quiz["id"])) is None
+    assert _next(client, player) == [kept["questions"][0]["id"]]
+
+
+def test_next_cards_skips_retired_questions_without_writing(client, db, make_user, make_quiz):
+    owner, _ = make_user()
+    player, player_id = make_user()
+    quiz = make_quiz(owner, n=2)
+    _missed_an_hour_ago(db, player_id, quiz)
+    # строка, оставшаяся с тех пор, когда правка карточки не чистила
+    retired = quiz["questions"][0]["id"]
+    db.execute(update(models.Question).where(models.Question.id == retired)
+               .values(retired_at=datetime.now(timezone.utc)))
+    db.commit()
+    before = db.get(models.ReviewState, (player_id, quiz["id"])).cards
+
+    assert _next(client, player) == [quiz["questions"][1]["id"]]
+    db.expire_all()
+    assert db.get(models.ReviewState, (player_id, quiz["id"])).cards == before
@@ -0,0 +1,96 @@
+import io
+import json
+import os
+import time
+
+from app import models
+from app.services import question_import
+
+
+def _upload(client, headers, quiz_id, body, filename="bank.csv", **fields):
+    r = client.post(
+        f"/api/v1/quizzes/{quiz_id}/imports", data=fields,
+        files={"file": (filename, body, "application/octet-stream")}, headers=headers,
+    )
+    assert r.status_code == 202, r.text
+    return r.json()
+
+
+def _wait(client, headers, quiz_id, import_id):
+    for _ in range(400):
+        job = client.get(f"/api/v1/quizzes/{quiz_id}/imports/{import_id}", headers=headers).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.025)
+    raise AssertionError(f"import {import_id} is still {job['status']}")
+
+
+def _live_texts(client, quiz_id):
+    return [q["text"] for q in client.get(f"/api/v1/quizzes/{quiz_id}").json()["questions"]]
+
+
+def test_csv_line_numbers_follow_multiline_records():
+    text = io.StringIO(
+        "text,option1,option2,correct_option_index\n"
+        '"Первая строка\nвторая строка",a,b,0\n'
+        "\n"
+        '"Ещё\nодна\nзапись",a,b,9\n'
+        ",a,b,1\n"
+    )
+    rows = list(question_import._rows_csv(text))
+
+    assert [line for line, _, _ in rows] == [2, 5, 8]
+    assert rows[0][1].text == "Первая строка\nвторая строка" and rows[0][2] is None
+    assert rows[1][2] == "correct_option_index is out of range"
+    assert rows[2][2].startswith("text:")
+
+
+def test_bad_row_rolls_back_whole_import(client, db, make_user, make_quiz, monkeypatch):
+    monkeypatch.setattr(question_import, "IMPORT_CHUNK_ROWS", 2)  # ошибка после нескольких записанных пакетов
+    owner, _ = make_user()
+    quiz = make_quiz(owner, n=2)
+    rows = [f"Вопрос из файла {i},да,нет,0" for i in range(7)] + ["Сломанный,да,нет,x"]
+    body = "text,option1,option2,correct_option_index\n" + "\n".join(rows) + "\n"
+
+    job = _wait(client, owner, quiz["id"], _upload(client, owner, quiz["id"], body)["id"])
+
+    assert job["status"] == "failed" and job["imported"] == 0
+    assert [e["line"] for e in job["errors"]] == [9]
+    assert _live_texts(client, quiz["id"]) == ["Вопрос 0", "Вопрос 1"]
+    assert db.query(models.Question).filter(models.Question.import_id == job["id"]).count() == 0
+    assert not os.listdir(question_import.IMPORT_DIR)
+
+
+def test_replace_mode_swaps_questions_and_publishes_version(client, db, make_user, make_quiz):
+    owner, _ = make_user()
+    quiz = make_quiz(owner, n=3)
+    lines = [
+        json.dumps({"text": f"Новый {i}", "options": [{"text": "x"}, {"text": "y"}], "correct_option_index": 1},
+                   ensure_ascii=False)
+        for i in range(4)
+    ]
+
+    job = _upload(client, owner, quiz["id"], "\n".join(lines) + "\n", "bank.txt", mode="replace", format="jsonl")
+    job = _wait(client, owner, quiz["id"], job["id"])
+
+    assert job["status"] == "done" and job["imported"] == 4
+    assert _live_texts(client, quiz["id"]) == [f"Новый {i}" for i in range(4)]
+    assert job["version_id"] != quiz["current_version_id"]
+    retired = db.query(models.Question).filter(
+        models.Question.quiz_id == quiz["id"], models.Question.retired_at.isnot(None),
+    ).count()
+    assert retired == 3
+
+
+def test_upload_must_be_multipart_with_a_file_part(client, make_user, make_quiz):
+    owner, _ = make_user()
+    quiz = make_quiz(owner, n=1)
+    url = f"/api/v1/quizzes/{quiz['id']}/imports"
+
+    raw = client.post(url, content="text\n", headers={**owner, "Content-Type": "text/csv"})
+    assert raw.status_code == 415
+    no_file = client.post(url, data={"mode": "append"}, files={"bank": ("b.csv", "x")}, headers=owner)
+    assert no_file.status_code == 422
+    bad_mode = client.post(url, data={"mode": "merge"}, files={"file": ("b.csv", "x")}, headers=owner)
+    assert bad_mode.status_code == 422
+    assert not os.listdir(question_import.IMPORT_DIR)
@@ -0,0 +1,47 @@
+import threading
+
+from sqlalchemy import update
+
+from app import models
+from app.database import SessionLocal
+from app.services import quiz_versions
+
+
+def _versions(client, quiz_id):
+    return sorted(v["version"] for v in client.get(f"/api/v1/quizzes/{quiz_id}/versions").json())
+
+
+def _publish(quiz_id, errors):
+    db = SessionLocal()
+    try:
+        quiz_versions.publish(db, db.get(models.Quiz, quiz_id))
+        db.commit()
+    except Exception as e:  # noqa: BLE001 — проверяем, что ни одна публикация не упала
+        errors.append(e)
+    finally:
+        db.close()
+
+
+def test_concurrent_publishes_get_distinct_numbers(client, make_user, make_quiz):
+    owner, _ = make_user()
+    quiz = make_quiz(owner, n=2)
+    errors = []
+    threads = [threading.Thread(target=_publish, args=(quiz["id"], errors)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert _versions(client, quiz["id"]) == list(range(1, 10))
+
+
+def test_numbering_continues_for_quizzes_without_sequence(client, db, make_user, make_quiz):
+    owner, _ = make_user()
+    quiz = make_quiz(owner, n=1)
+    db.execute(update(models.Quiz).where(models.Quiz.id == quiz["id"]).values(version_seq=None))
+    db.commit()
+
+    r = client.patch(f"/api/v1/quizzes/{quiz['id']}", json={"title": "Новое название"}, headers=owner)
+    assert r.status_code == 200, r.text
+    assert _versions(client, quiz["id"]) == [1, 2]
@@ -0,0 +1,42 @@
+from app import models
+from app.database import SessionLocal
+from app.services import recommendations
+from app.services.jobs import get_cursor
+
+
+def _like(client, headers, quiz):
+    assert client.post(f"/api/v1/social/like/{quiz['id']}", headers=headers).status_code == 204
+
+
+def test_event_between_watermark_and_matrix_waits_for_next_pass(client, db, make_user, make_quiz, monkeypatch):
+    owner, _ = make_user()
+    first, _ = make_user()
+    second, second_id = make_user()
+    a, b, c = (make_quiz(owner, n=1, title=t) for t in "ABC")
+    _like(client, first, a)
+    _like(client, first, b)
+    recommendations.refresh(db, full=True)
+
+    _like(client, second, a)
+    watermark = db.query(models.Like.id).order_by(models.Like.id.desc()).first()[0]
+    build = recommendations._build_matrix
+
+    def build_after_concurrent_like(*args):
+        other = SessionLocal()
+        try:
+            other.add(models.Like(user_id=second_id, quiz_id=c["id"]))
+            other.commit()
+        finally:
+            other.close()
+        return build(*args)
+
+    monkeypatch.setattr(recommendations, "_build_matrix", build_after_concurrent_like)
+    assert recommendations.refresh(db) > 0
+    assert get_cursor(db, recommendations.JOB, "likes") == watermark
+
+    monkeypatch.setattr(recommendations, "_build_matrix", build)
+    assert recommendations.refresh(db) > 0
+    neighbors = {
+        n for (n,) in db.query(models.QuizNeighbor.neighbor_id).filter(models.QuizNeighbor.quiz_id == c["id"])
+    }
+    assert a["id"] in neighbors
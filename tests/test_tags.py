@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services import tags as tag_index
+
+PAGE = 20
+
+
+@pytest.fixture
+def tag_db():
+    """Отдельная база только с tags и quiz_tags, как в bench/bench_tags.py."""
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine, tables=[models.Tag.__table__, models.QuizTag.__table__])
+    with Session(engine) as db:
+        yield db
+    engine.dispose()
+
+
+def _seed(db: Session, members: Dict[str, Iterable[int]]) -> Dict[str, models.Tag]:
+    for i, slug in enumerate(members, start=1):
+        db.add(models.Tag(id=i, slug=slug, name=slug, quiz_count=0))
+    db.flush()
+    db.execute(models.QuizTag.__table__.insert(), [
+        {"quiz_id": quiz_id, "tag_id": i}
+        for i, ids in enumerate(members.values(), start=1)
+        for quiz_id in ids
+    ])
+    db.commit()
+    tag_index.recount(db)
+    return {t.slug: t for t in db.query(models.Tag)}
+
+
+def _all_pages(db: Session, tags: List[models.Tag]) -> List[int]:
+    """Листает quiz_ids по keyset-курсору before до пустой страницы."""
+    out: List[int] = []
+    before = None
+    while True:
+        page = tag_index.quiz_ids(db, tags, before, PAGE)
+        assert len(page) <= PAGE
+        assert page == sorted(page, reverse=True)
+        if before is not None:
+            assert all(quiz_id < before for quiz_id in page)
+        out.extend(page)
+        if len(page) < PAGE:
+            return out
+        before = page[-1]
+
+
+def test_intersection_pages_across_chunk_windows(tag_db):
+    n = 5 * tag_index.INTERSECT_CHUNK
+    tags = _seed(tag_db, {
+        "even": range(2, n + 1, 2),
+        "three": range(3, n + 1, 3),
+        "five": range(5, n + 1, 5),
+    })
+    assert tags["three"].quiz_count > tag_index.INTERSECT_CHUNK  # ведущий тег читается несколькими окнами
+
+    assert _all_pages(tag_db, [tags["even"], tags["three"]]) == list(range(n - n % 6, 0, -6))
+    assert _all_pages(tag_db, [tags["even"], tags["three"], tags["five"]]) == list(range(n - n % 30, 0, -30))
+
+
+def test_intersection_skips_windows_without_matches(tag_db):
+    chunk = tag_index.INTERSECT_CHUNK
+    # ведущий (более редкий) тег пересекается со вторым только в самом старом окне
+    lead = range(1, chunk + 201)
+    other = list(range(1, 101)) + list(range(2 * chunk, 3 * chunk + 400))
+    tags = _seed(tag_db, {"lead": lead, "other": other})
+    assert tags["lead"].quiz_count < tags["other"].quiz_count
+
+    assert _all_pages(tag_db, [tags["other"], tags["lead"]]) == list(range(100, 0, -1))
+
+
+def test_rare_tag_probes_frequent_one(tag_db):
+    n = 4 * tag_index.INTERSECT_CHUNK
+    rare = list(range(7, n + 1, 97))
+    tags = _seed(tag_db, {"all-odd": range(1, n + 1, 2), "rare": rare})
+    assert tags["all-odd"].quiz_count > tag_index.PROBE_RATIO * tags["rare"].quiz_count
+
+    expected = sorted((q for q in rare if q % 2), reverse=True)
+    assert _all_pages(tag_db, [tags["all-odd"], tags["rare"]]) == expected
+
+    newest_first = sorted(rare, reverse=True)  # один тег — keyset прямо по индексу
+    assert tag_index.quiz_ids(tag_db, [tags["rare"]], newest_first[2], 2) == newest_first[3:5]